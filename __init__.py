@@ -20,7 +20,13 @@ import os
 import webbrowser
 
 from .api.tree import *
+from .api import node_mapper as _node_mapper
+from .api.schema import load_node_schema
+from .api.arrange import arrange_visible_trees, schedule_deferred_layout
+from .api.profiler import BuildProfile, export_chrome_trace
 from .preferences import GeometryScriptPreferences
+from .watcher import watch_texts, schedule_watch, subscribe_scene_changes, unsubscribe_scene_changes, watcher as _watcher
+from .external import clear_cache as _clear_external_cache
 from .absolute_path import absolute_path
 
 bl_info = {
@@ -34,6 +40,16 @@ bl_info = {
     "category" : "Node"
 }
 
+def __getattr__(name):
+    # Node functions and enum namespaces are registered on first access, see `node_mapper.__getattr__`.
+    # Node functions that haven't been registered yet, such as those bound by `from geometry_script import *`, register when first called.
+    if name == '__all__':
+        return [n for n in globals() if not n.startswith('_')] + _node_mapper.lazy_names()
+    return _node_mapper.lazy_attribute(name)
+
+def __dir__():
+    return sorted(set(globals()) | set(_node_mapper.lazy_names()))
+
 class TEXT_MT_templates_geometryscript(bpy.types.Menu):
     bl_label = "Geometry Script"
 
@@ -53,8 +69,27 @@ class OpenDocumentation(bpy.types.Operator):
         webbrowser.open('file://' + absolute_path('docs/documentation.html'))
         return {'FINISHED'}
 
+class ExportBuildProfile(bpy.types.Operator):
+    bl_idname = "geometry_script.export_build_profile"
+    bl_label = "Export Chrome Trace"
+    bl_description = "Save the latest build of each tree as a Chrome trace, which can be opened in Perfetto or chrome://tracing"
+
+    filepath: bpy.props.StringProperty(subtype='FILE_PATH')
+    filename_ext = ".json"
+
+    def invoke(self, context, event):
+        if not self.filepath:
+            self.filepath = "geometry_script_profile.json"
+        context.window_manager.fileselect_add(self)
+        return {'RUNNING_MODAL'}
+
+    def execute(self, context):
+        export_chrome_trace(self.filepath, build_reports)
+        return {'FINISHED'}
+
 class GeometryScriptSettings(bpy.types.PropertyGroup):
-    auto_resolve: bpy.props.BoolProperty(name="Auto Resolve", default=False, description="If the file is edited externally, automatically accept the changes")
+    auto_resolve: bpy.props.BoolProperty(name="Auto Resolve", default=False, description="If the file is edited externally, automatically accept the changes", update=lambda self, context: schedule_watch())
+    profile: bpy.props.BoolProperty(name="Profile Builds", default=False, description="Time each phase of a tree build and count the nodes created by each line of the script")
 
 class GeometryScriptMenu(bpy.types.Menu):
     bl_idname = "TEXT_MT_geometryscript"
@@ -66,43 +101,103 @@ class GeometryScriptMenu(bpy.types.Menu):
         text = context.space_data.text
         if text and len(text.filepath) > 0:
             layout.prop(context.scene.geometry_script_settings, 'auto_resolve')
+            error = _watcher.errors.get(os.path.normpath(bpy.path.abspath(text.filepath)))
+            if error is not None:
+                layout.label(text=error, icon='ERROR')
+        layout.prop(context.scene.geometry_script_settings, 'profile')
         layout.operator(OpenDocumentation.bl_idname)
 
+class GeometryScriptProfilePanel(bpy.types.Panel):
+    bl_idname = "TEXT_PT_geometryscript_profile"
+    bl_label = "Build Profile"
+    bl_space_type = 'TEXT_EDITOR'
+    bl_region_type = 'UI'
+    bl_category = "Geometry Script"
+
+    def draw(self, context):
+        layout = self.layout
+        layout.prop(context.scene.geometry_script_settings, 'profile')
+        reports = {name: report for name, report in build_reports.items() if 'timer' in report}
+        if len(reports) == 0:
+            layout.label(text="Run a script to profile its trees.")
+            return
+        layout.operator(ExportBuildProfile.bl_idname, icon='EXPORT')
+
+        text = context.space_data.text
+        for name, report in reports.items():
+            timer = report['timer']
+            box = layout.box()
+            box.label(text=f"{name}: {timer.total * 1000:.1f} ms{' (cached)' if report['cached'] else ''}", icon='NODETREE')
+            column = box.column(align=True)
+            for phase, duration in timer.phases.items():
+                row = column.row()
+                row.label(text=phase.title())
+                row.label(text=f"{duration * 1000:.1f} ms")
+            cost = report.get('cost')
+            if cost is not None:
+                column = box.column(align=True)
+                column.label(text=f"Estimated cost {cost.total:g}")
+                for node_cost, node, note in cost.top(5):
+                    row = column.row()
+                    row.label(text=node, icon='ERROR' if note else 'NONE')
+                    row.label(text=f"{node_cost:g}")
+            if not isinstance(timer, BuildProfile) or len(timer.nodes) == 0:
+                continue
+            column = box.column(align=True)
+            column.label(text=f"{sum(timer.nodes.values())} nodes, {sum(timer.links.values())} links")
+            for node_type, count in sorted(timer.nodes.items(), key=lambda x: -x[1])[:5]:
+                row = column.row()
+                row.label(text=node_type)
+                row.label(text=str(count))
+            if text is None:
+                continue
+            lines = {}
+            for filename in {file for file, _ in timer.lines.keys()}:
+                if filename.endswith(text.name) or (text.filepath and filename == bpy.path.abspath(text.filepath)):
+                    lines.update(timer.lines_in(filename))
+            if len(lines) > 0:
+                column = box.column(align=True)
+                column.label(text=f"Nodes by line in {text.name}")
+                for line, count in sorted(lines.items(), key=lambda x: -x[1])[:10]:
+                    row = column.row()
+                    row.label(text=f"Line {line}")
+                    row.label(text=str(count))
+
 def templates_menu_draw(self, context):
     self.layout.menu(TEXT_MT_templates_geometryscript.__name__)
 
 def editor_header_draw(self, context):
     self.layout.menu(GeometryScriptMenu.bl_idname)
 
-def auto_resolve():
-    if bpy.context.scene.geometry_script_settings.auto_resolve:
-        try:
-            for area in bpy.context.screen.areas:
-                for space in area.spaces:
-                    if space.type == 'TEXT_EDITOR':
-                        with bpy.context.temp_override(area=area, space=space):
-                            text = bpy.context.space_data.text
-                            if text and text.is_modified:
-                                bpy.ops.text.resolve_conflict(resolution='RELOAD')
-                                if bpy.context.space_data.use_live_edit:
-                                    bpy.ops.text.run_script()
-        except:
-            pass
-    return 1
-
 def register():
+    load_node_schema()
     bpy.utils.register_class(TEXT_MT_templates_geometryscript)
     bpy.types.TEXT_MT_templates.append(templates_menu_draw)
     bpy.utils.register_class(GeometryScriptSettings)
     bpy.utils.register_class(GeometryScriptPreferences)
     bpy.utils.register_class(OpenDocumentation)
     bpy.utils.register_class(GeometryScriptMenu)
+    bpy.utils.register_class(ExportBuildProfile)
+    bpy.utils.register_class(GeometryScriptProfilePanel)
 
     bpy.types.TEXT_HT_header.append(editor_header_draw)
 
     bpy.types.Scene.geometry_script_settings = bpy.props.PointerProperty(type=GeometryScriptSettings)
 
-    bpy.app.timers.register(auto_resolve, persistent=True)
+    subscribe_scene_changes()
+    schedule_deferred_layout()
+
+    bpy.app.handlers.persistent(subscribe_scene_changes)
+    bpy.app.handlers.load_post.append(subscribe_scene_changes)
+
+    bpy.app.handlers.persistent(schedule_deferred_layout)
+    bpy.app.handlers.load_post.append(schedule_deferred_layout)
+    bpy.app.handlers.persistent(_clear_external_cache)
+    for handlers in _external_cache_handlers():
+        handlers.append(_clear_external_cache)
+
+def _external_cache_handlers():
+    return (bpy.app.handlers.load_post, bpy.app.handlers.undo_post, bpy.app.handlers.redo_post)
 
 def unregister():
     bpy.utils.unregister_class(TEXT_MT_templates_geometryscript)
@@ -111,8 +206,23 @@ def unregister():
     bpy.utils.unregister_class(GeometryScriptPreferences)
     bpy.utils.unregister_class(OpenDocumentation)
     bpy.utils.unregister_class(GeometryScriptMenu)
+    bpy.utils.unregister_class(ExportBuildProfile)
+    bpy.utils.unregister_class(GeometryScriptProfilePanel)
     bpy.types.TEXT_HT_header.remove(editor_header_draw)
+    unsubscribe_scene_changes()
+    if subscribe_scene_changes in bpy.app.handlers.load_post:
+        bpy.app.handlers.load_post.remove(subscribe_scene_changes)
+    try:
+        bpy.app.timers.unregister(watch_texts)
+    except:
+        pass
+    _watcher.close()
+    for handlers in _external_cache_handlers():
+        if _clear_external_cache in handlers:
+            handlers.remove(_clear_external_cache)
+    if schedule_deferred_layout in bpy.app.handlers.load_post:
+        bpy.app.handlers.load_post.remove(schedule_deferred_layout)
     try:
-        bpy.app.timers.unregister(auto_resolve)
+        bpy.app.timers.unregister(arrange_visible_trees)
     except:
         pass
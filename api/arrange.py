@@ -1,69 +1,204 @@
 import bpy
+import enum
 import typing
-from collections import deque, Counter
+from collections import deque
+from .schema import node_properties
 
-def _arrange(node_tree, padding: typing.Tuple[float, float] = (50, 25)):
-    # Organize the nodes into columns based on their links.
-    columns: typing.List[typing.List[typing.Any]] = []
-    
-    def topo_sort(graph):
-        in_degree = {u: 0 for u in graph}
-        for u in graph:
-            for v in graph[u]:
-                in_degree[v] += 1
-        queue = deque([u for u in in_degree if in_degree[u] == 0])
-        topo_order = []
-        while queue:
-            u = queue.popleft()
-            topo_order.append(u)
-            for v in graph[u]:
-                in_degree[v] -= 1
-                if in_degree[v] == 0:
-                    queue.append(v)
-        return topo_order
-    
-    graph = { node:set() for node in node_tree.nodes }
-    node_input_link_count = Counter()
-    for link in node_tree.links:
-        graph[link.from_node].add(link.to_node)
-        node_input_link_count[link.to_socket] += 1
-    sorted_nodes = topo_sort(graph)
+class LayoutMode(enum.Enum):
+    IMMEDIATE = 'IMMEDIATE' # arrange the nodes as soon as the tree is built
+    DEFERRED = 'DEFERRED' # arrange the nodes when a node editor first shows the tree
+    NONE = 'NONE' # leave the nodes where they are
+
+LAYOUT_PENDING_PROPERTY = 'geometry_script_layout_pending'
 
+NODE_HEADER_HEIGHT = 20
+NODE_LINK_HEIGHT = 28
+NODE_PROPERTY_HEIGHT = 28
+NODE_VECTOR_HEIGHT = 84
+
+# The height of a node without its unlinked vector inputs, and the indices of its vector inputs,
+# keyed by node type and which sockets are enabled.
+_node_sizes = {}
+def _node_size(node):
+    enabled_inputs = tuple(i.enabled for i in node.inputs)
+    enabled_outputs = tuple(o.enabled for o in node.outputs)
+    key = (node.bl_idname, enabled_inputs, enabled_outputs)
+    if key not in _node_sizes:
+        height = (
+            NODE_HEADER_HEIGHT
+            + (sum(enabled_outputs) * NODE_LINK_HEIGHT)
+            + (len(node_properties(node.bl_idname)) * NODE_PROPERTY_HEIGHT)
+            + (sum(enabled_inputs) * NODE_LINK_HEIGHT)
+        )
+        vector_inputs = tuple(i for i, node_input in enumerate(node.inputs) if enabled_inputs[i] and node_input.type == 'VECTOR')
+        _node_sizes[key] = (height, vector_inputs)
+    return _node_sizes[key]
+
+def _columns(node_tree):
+    # Place each node one column before the furthest node it links to, in linear time.
+    downstream = { node.name: set() for node in node_tree.nodes }
+    in_degree = { name: 0 for name in downstream }
+    for link in node_tree.links:
+        to_names = downstream[link.from_node.name]
+        if link.to_node.name not in to_names:
+            to_names.add(link.to_node.name)
+            in_degree[link.to_node.name] += 1
+    queue = deque(name for name, degree in in_degree.items() if degree == 0)
+    topo_order = []
+    while queue:
+        name = queue.popleft()
+        topo_order.append(name)
+        for to_name in downstream[name]:
+            in_degree[to_name] -= 1
+            if in_degree[to_name] == 0:
+                queue.append(to_name)
     column_index = {}
-    for node in reversed(sorted_nodes):
-        column_index[node] = max([ column_index[adj_node] for adj_node in graph[node] ], default=-1) + 1
-        if column_index[node] == len(columns):
-            columns.append([node])
+    for name in reversed(topo_order):
+        column_index[name] = max((column_index[to_name] for to_name in downstream[name]), default=-1) + 1
+    columns = [[] for _ in range(max(column_index.values(), default=-1) + 1)]
+    for name in reversed(topo_order):
+        columns[len(columns) - 1 - column_index[name]].append(name)
+    return columns
+
+def _height(node):
+    height, vector_inputs = _node_size(node)
+    unset_vector_count = sum(1 for i in vector_inputs if not node.inputs[i].is_linked)
+    return (height + unset_vector_count * NODE_VECTOR_HEIGHT) * bpy.context.preferences.view.ui_scale
+
+def _place(node_tree, names, padding: typing.Tuple[float, float] = (50, 25)):
+    """
+    Place the named nodes next to the nodes they link to, leaving every other node where it is.
+
+    A node goes to the left of the nodes it links into, or to the right of the nodes linked into it,
+    and is moved down until it doesn't overlap another node. Returns the number of nodes moved.
+    """
+    nodes = { node.name: node for node in node_tree.nodes }
+    pending = [name for column in _columns(node_tree) for name in reversed(column) if name in names]
+    downstream = { name: set() for name in pending }
+    upstream = { name: set() for name in pending }
+    for link in node_tree.links:
+        if link.from_node.name in downstream:
+            downstream[link.from_node.name].add(link.to_node.name)
+        if link.to_node.name in upstream:
+            upstream[link.to_node.name].add(link.from_node.name)
+    placed = [node for name, node in nodes.items() if name not in names]
+    boxes = [(node.location[0], node.location[1], node.width, _height(node)) for node in placed]
+    placed_names = { node.name for node in placed }
+
+    def overlapping(x, y, width, height):
+        return [
+            (bx, by, bw, bh) for bx, by, bw, bh in boxes
+            if x < bx + bw + padding[0] and bx < x + width + padding[0] and y - height - padding[1] < by and by - bh - padding[1] < y
+        ]
+
+    moved = 0
+    while len(pending) > 0:
+        # Nodes next to a node that is already placed go first, starting with the ones closest to the output.
+        name = next((name for name in reversed(pending) if downstream[name] & placed_names), None)
+        if name is None:
+            name = next((name for name in pending if upstream[name] & placed_names), pending[-1])
+        pending.remove(name)
+        node = nodes[name]
+        height = _height(node)
+        to_nodes = [nodes[to_name] for to_name in downstream[name] & placed_names]
+        from_nodes = [nodes[from_name] for from_name in upstream[name] & placed_names]
+        if len(to_nodes) > 0:
+            x = min(to_node.location[0] for to_node in to_nodes) - node.width - padding[0]
+            y = max(to_node.location[1] for to_node in to_nodes)
+        elif len(from_nodes) > 0:
+            x = max(from_node.location[0] + from_node.width for from_node in from_nodes) + padding[0]
+            y = max(from_node.location[1] for from_node in from_nodes)
         else:
-            columns[column_index[node]].append(node)
-    columns = reversed(columns)
-    
-    # Arrange the columns, computing the size of the node manually so arrangement can be done without UI being visible.
-    UI_SCALE = bpy.context.preferences.view.ui_scale
-    NODE_HEADER_HEIGHT = 20
-    NODE_LINK_HEIGHT = 28
-    NODE_PROPERTY_HEIGHT = 28
-    NODE_VECTOR_HEIGHT = 84
+            x = 0
+            y = min((by - bh for _, by, _, bh in boxes), default=0) - padding[1]
+        while len(overlaps := overlapping(x, y, node.width, height)) > 0:
+            y = min(by - bh for _, by, _, bh in overlaps) - padding[1]
+        node.location = (x, y)
+        moved += 1
+        boxes.append((x, y, node.width, height))
+        placed_names.add(name)
+    return moved
+
+def _arrange(node_tree, padding: typing.Tuple[float, float] = (50, 25)):
+    """
+    Organize the nodes into columns based on their links.
+
+    The size of each node is computed manually so arrangement can be done without the UI being visible.
+    Only nodes whose location changed are moved. Returns the number of nodes moved.
+    """
+    nodes = { node.name: node for node in node_tree.nodes }
+    moved = 0
     x = 0
-    for col in columns:
+    for column in _columns(node_tree):
         largest_width = 0
         y = 0
-        for node in col:
-            node.update()
-            input_count = len(list(filter(lambda i: i.enabled, node.inputs)))
-            output_count = len(list(filter(lambda i: i.enabled, node.outputs)))
-            parent_props = [prop.identifier for base in type(node).__bases__ for prop in base.bl_rna.properties]
-            properties_count = len([prop for prop in node.bl_rna.properties if prop.identifier not in parent_props])
-            unset_vector_count = len(list(filter(lambda i: i.enabled and i.type == 'VECTOR' and node_input_link_count[i] == 0, node.inputs)))
-            node_height = (
-                NODE_HEADER_HEIGHT \
-                + (output_count * NODE_LINK_HEIGHT) \
-                + (properties_count * NODE_PROPERTY_HEIGHT) \
-                + (input_count * NODE_LINK_HEIGHT) \
-                + (unset_vector_count * NODE_VECTOR_HEIGHT)
-            ) * UI_SCALE
+        for name in column:
+            node = nodes[name]
+            node_height = _height(node)
             if node.width > largest_width:
                 largest_width = node.width
-            node.location = (x, y)
+            location = node.location
+            if abs(location[0] - x) > 0.5 or abs(location[1] - y) > 0.5:
+                node.location = (x, y)
+                moved += 1
             y -= node_height + padding[1]
-        x += largest_width + padding[0]
\ No newline at end of file
+        x += largest_width + padding[0]
+    return moved
+
+# The names of the nodes waiting to be placed in each deferred tree, or `None` if the whole tree is waiting to be arranged.
+_pending_nodes = {}
+
+def arrange(node_tree, mode=LayoutMode.IMMEDIATE, nodes=None):
+    """
+    Arrange the nodes in a tree now, when it is first shown in a node editor, or not at all.
+
+    Pass the names of the nodes that were added to a tree that was already arranged as `nodes` to only place those nodes,
+    so the other nodes keep their locations.
+    """
+    if mode == LayoutMode.NONE:
+        return
+    pending = _pending_nodes.pop(node_tree.name, None) if node_tree.get(LAYOUT_PENDING_PROPERTY) else set()
+    nodes = None if nodes is None or pending is None else { *pending, *nodes }
+    match mode:
+        case LayoutMode.IMMEDIATE:
+            names = { node.name for node in node_tree.nodes }
+            if nodes is None or len(names - nodes) == 0:
+                _arrange(node_tree)
+            else:
+                _place(node_tree, nodes & names)
+            if LAYOUT_PENDING_PROPERTY in node_tree:
+                del node_tree[LAYOUT_PENDING_PROPERTY]
+        case LayoutMode.DEFERRED:
+            _pending_nodes[node_tree.name] = nodes
+            node_tree[LAYOUT_PENDING_PROPERTY] = True
+            schedule_deferred_layout()
+
+# Seconds between checks of the node editors while trees are waiting to be arranged.
+DEFERRED_LAYOUT_INTERVAL = 0.5
+
+def _has_pending_trees():
+    return any(node_group.get(LAYOUT_PENDING_PROPERTY) for node_group in bpy.data.node_groups)
+
+def schedule_deferred_layout(*args):
+    """
+    Start checking the node editors for deferred trees if there are any. Also registered as a `load_post` handler.
+    """
+    if not bpy.app.timers.is_registered(arrange_visible_trees) and _has_pending_trees():
+        bpy.app.timers.register(arrange_visible_trees, first_interval=DEFERRED_LAYOUT_INTERVAL, persistent=True)
+
+def arrange_visible_trees():
+    """
+    Arrange the deferred trees shown in any node editor. Registered as a timer until no trees are waiting to be arranged.
+    """
+    try:
+        for window in bpy.context.window_manager.windows:
+            for area in window.screen.areas:
+                if area.type != 'NODE_EDITOR':
+                    continue
+                node_tree = area.spaces.active.edit_tree
+                if node_tree is not None and node_tree.get(LAYOUT_PENDING_PROPERTY):
+                    arrange(node_tree, nodes=())
+                    area.tag_redraw()
+    except AttributeError:
+        pass
+    return DEFERRED_LAYOUT_INTERVAL if _has_pending_trees() else None
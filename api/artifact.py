@@ -0,0 +1,295 @@
+import ast
+import bpy
+import gzip
+import hashlib
+import json
+from .graph import Graph
+from .interface import get_node_inputs, get_node_outputs, new_node_input, new_node_output
+from .reconcile import reconcile, _settings_properties, _socket_index
+from .schema import save_node_schema, _json_value, _item_args
+from .fingerprint import FINGERPRINT_PROPERTY
+from .dependencies import record_dependencies
+
+ARTIFACT_FORMAT = 'geometry_script.artifact'
+# Bump when the layout of an artifact changes.
+ARTIFACT_VERSION = 1
+ARTIFACT_HASH_PROPERTY = 'geometry_script_artifact'
+
+# The `bpy.data` collection for each type of data block a node can point to.
+id_collections = {
+    'GeometryNodeTree': 'node_groups',
+    'Object': 'objects',
+    'Collection': 'collections',
+    'Material': 'materials',
+    'Image': 'images',
+    'Texture': 'textures',
+}
+
+# The functions a driver's simple expression can call, which Blender evaluates without running Python.
+simple_expression_functions = {
+    'abs', 'fabs', 'min', 'max', 'floor', 'ceil', 'trunc', 'round', 'int', 'radians', 'degrees',
+    'sin', 'cos', 'tan', 'asin', 'acos', 'atan', 'atan2', 'exp', 'log', 'sqrt', 'pow', 'fmod',
+    'lerp', 'clamp', 'smoothstep',
+}
+_simple_expression_nodes = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.BoolOp, ast.Compare, ast.IfExp, ast.Constant, ast.Name, ast.Load,
+    ast.operator, ast.unaryop, ast.boolop, ast.cmpop,
+)
+
+def is_simple_expression(expression):
+    """
+    Whether a driver expression only uses numbers, variables, operators and the functions in `simple_expression_functions`.
+    """
+    try:
+        tree = ast.parse(expression, mode='eval')
+    except SyntaxError:
+        return False
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Call):
+            if not isinstance(node.func, ast.Name) or node.func.id not in simple_expression_functions or len(node.keywords) > 0:
+                return False
+        elif isinstance(node, ast.Name):
+            if node.id.startswith('_'):
+                return False
+        elif isinstance(node, ast.Constant):
+            if not isinstance(node.value, (int, float, bool)):
+                return False
+        elif not isinstance(node, _simple_expression_nodes):
+            return False
+    return True
+
+def _id_type(value):
+    return getattr(getattr(value, 'bl_rna', None), 'identifier', None) or getattr(value, 'bl_idname', None) or type(value).__name__
+
+def _pointer(value):
+    if value is None:
+        return None
+    id_type = _id_type(value)
+    if id_type not in id_collections:
+        raise Exception(f"A '{id_type}' cannot be stored in an artifact.")
+    return [id_type, value.name]
+
+def _resolve(pointer):
+    if pointer is None:
+        return None
+    id_type, name = pointer
+    value = getattr(bpy.data, id_collections[id_type]).get(name)
+    if value is None:
+        raise Exception(f"The artifact uses the {id_type} '{name}', which is not in this file.")
+    return value
+
+def _socket_defaults(sockets, linked_only):
+    return {
+        str(i): _json_value(socket.default_value)
+        for i, socket in enumerate(sockets)
+        if hasattr(socket, 'default_value') and not (linked_only and socket.is_linked)
+    }
+
+def _export_node(node):
+    settings = {}
+    items = {}
+    curves = {}
+    pointers = {}
+    for prop in _settings_properties(node):
+        identifier = prop['identifier']
+        value = getattr(node, identifier)
+        if prop['type'] == 'COLLECTION':
+            if prop.get('socket_items'):
+                items[identifier] = [_item_args(item) for item in value]
+        elif prop['type'] == 'POINTER':
+            if not prop['is_readonly']:
+                pointers[identifier] = _pointer(value)
+            elif hasattr(value, 'curves'):
+                curves[identifier] = [[[*p.location, p.handle_type] for p in curve.points] for curve in value.curves]
+        elif not prop['is_readonly']:
+            settings[identifier] = sorted(value) if isinstance(value, set) else _json_value(value)
+    entry = { 'name': node.name, 'type': node.bl_idname, 'location': _json_value(node.location) }
+    for key, value in (
+        ('settings', settings),
+        ('items', items),
+        ('curves', curves),
+        ('pointers', pointers),
+        ('inputs', _socket_defaults(node.inputs, linked_only=True)),
+        ('outputs', _socket_defaults(node.outputs, linked_only=False)),
+    ):
+        if len(value) > 0:
+            entry[key] = value
+    paired_output = getattr(node, 'paired_output', None)
+    if paired_output is not None:
+        entry['paired_output'] = paired_output.name
+    return entry
+
+def content_hash(artifact):
+    """
+    A hash of everything in an artifact other than the hash itself.
+    """
+    content = { k: v for k, v in artifact.items() if k != 'hash' }
+    return hashlib.sha256(json.dumps(content, sort_keys=True, separators=(',', ':')).encode()).hexdigest()
+
+def export_artifact(node_tree):
+    """
+    Describe a node tree's interface, nodes, settings, socket values, links and drivers, so it can be loaded without running its script.
+    """
+    drivers = []
+    if node_tree.animation_data is not None:
+        drivers = [[fcurve.data_path, fcurve.driver.expression] for fcurve in node_tree.animation_data.drivers]
+    artifact = {
+        'format': ARTIFACT_FORMAT,
+        'version': ARTIFACT_VERSION,
+        'name': node_tree.name,
+        'blender': list(bpy.app.version),
+        'fingerprint': node_tree.get(FINGERPRINT_PROPERTY),
+        'is_modifier': getattr(node_tree, 'is_modifier', False),
+        'dependencies': sorted({
+            node.node_tree.name for node in node_tree.nodes
+            if node.bl_idname == 'GeometryNodeGroup' and getattr(node, 'node_tree', None) is not None
+        }),
+        'interface': {
+            'inputs': [
+                [socket.bl_socket_idname, socket.name, *([_json_value(socket.default_value)] if hasattr(socket, 'default_value') else [])]
+                for socket in get_node_inputs(node_tree)
+            ],
+            'outputs': [[socket.bl_socket_idname, socket.name] for socket in get_node_outputs(node_tree)],
+        },
+        'nodes': [_export_node(node) for node in node_tree.nodes],
+        'links': [
+            [link.from_node.name, _socket_index(link.from_socket), link.to_node.name, _socket_index(link.to_socket)]
+            for link in node_tree.links
+        ],
+        'drivers': drivers,
+    }
+    artifact['hash'] = content_hash(artifact)
+    return artifact
+
+def save_artifact(node_tree, path):
+    """
+    Write an artifact for a node tree to a JSON file, compressed with gzip if the path ends with `.gz`.
+    """
+    data = json.dumps(export_artifact(node_tree), separators=(',', ':')).encode()
+    with (gzip.open if path.endswith('.gz') else open)(path, 'wb') as file:
+        file.write(data)
+
+def read_artifact(path):
+    with (gzip.open if path.endswith('.gz') else open)(path, 'rb') as file:
+        artifact = json.loads(file.read())
+    _validate(artifact, path)
+    return artifact
+
+def _validate(artifact, source=None):
+    where = f" in '{source}'" if source is not None else ''
+    if artifact.get('format') != ARTIFACT_FORMAT:
+        raise Exception(f"No Geometry Script artifact{where}.")
+    if artifact.get('version') != ARTIFACT_VERSION:
+        raise Exception(f"The artifact{where} has version {artifact.get('version')}, but only version {ARTIFACT_VERSION} can be loaded. Export it again.")
+    if artifact.get('hash') != content_hash(artifact):
+        raise Exception(f"The artifact{where} does not match its hash, it may have been modified or truncated.")
+
+def is_stale(artifact, tree_function):
+    """
+    Whether a tree function has changed since the artifact was exported from the tree it built.
+    """
+    return artifact.get('fingerprint') is None or artifact['fingerprint'] != tree_function.fingerprint
+
+def _build_graph(artifact, name):
+    graph = Graph(name)
+    for socket_type, socket_name, *default in artifact['interface']['inputs']:
+        socket = new_node_input(graph, socket_type, socket_name)
+        if len(default) > 0:
+            socket.default_value = default[0]
+    for socket_type, socket_name in artifact['interface']['outputs']:
+        new_node_output(graph, socket_type, socket_name)
+
+    nodes = {}
+    for entry in artifact['nodes']:
+        node = graph.nodes.new(entry['type'])
+        node.name = entry['name']
+        node.location = tuple(entry['location'])
+        nodes[entry['name']] = node
+        for identifier, value in entry.get('settings', {}).items():
+            setattr(node, identifier, set(value) if isinstance(getattr(node, identifier), set) else value)
+        for identifier, pointer in entry.get('pointers', {}).items():
+            setattr(node, identifier, _resolve(pointer))
+        for identifier, items in entry.get('items', {}).items():
+            collection = getattr(node, identifier)
+            collection.clear()
+            for args in items:
+                collection.new(*args)
+        for identifier, curves in entry.get('curves', {}).items():
+            for curve, points in zip(getattr(node, identifier).curves, curves):
+                curve.points.clear()
+                for x, y, handle_type in points:
+                    curve.points.new(x, y).handle_type = handle_type
+    # Zones must be paired before their sockets are known.
+    for entry in artifact['nodes']:
+        if 'paired_output' in entry:
+            nodes[entry['name']].pair_with_output(nodes[entry['paired_output']])
+    for entry in artifact['nodes']:
+        node = nodes[entry['name']]
+        for i, value in entry.get('inputs', {}).items():
+            node.inputs[int(i)].default_value = value
+        for i, value in entry.get('outputs', {}).items():
+            node.outputs[int(i)].default_value = value
+
+    for from_node, from_index, to_node, to_index in artifact['links']:
+        graph.links.new(nodes[from_node].outputs[from_index], nodes[to_node].inputs[to_index])
+    for data_path, expression in artifact['drivers']:
+        graph.driver_add(data_path).driver.expression = expression
+    return graph
+
+def load_artifact(artifact, name=None, force=False, allow_scripted_drivers=False):
+    """
+    Create or update a node group from an artifact, or the path to one, without running any script.
+
+    The node group is left as it is if it was already loaded from the same artifact, unless `force` is set.
+    Node groups the tree uses must be in the file, or loaded first.
+
+    Drivers whose expressions would run Python are rejected, unless `allow_scripted_drivers` is set.
+    """
+    if isinstance(artifact, str):
+        artifact = read_artifact(artifact)
+    else:
+        _validate(artifact)
+    if not allow_scripted_drivers:
+        for data_path, expression in artifact['drivers']:
+            if not is_simple_expression(expression):
+                raise Exception(f"The artifact has a driver on '{data_path}' with the expression '{expression}', which would run Python. Pass `allow_scripted_drivers=True` to load it anyway.")
+    name = name or artifact['name']
+    node_group = bpy.data.node_groups.get(name)
+    if node_group is None:
+        node_group = bpy.data.node_groups.new(name, 'GeometryNodeTree')
+    if not force and node_group.get(ARTIFACT_HASH_PROPERTY) == artifact['hash'] and len(node_group.nodes) > 0:
+        record_dependencies(node_group)
+        return node_group
+
+    graph = _build_graph(artifact, node_group.name)
+    if artifact['is_modifier'] and hasattr(node_group, 'is_modifier'):
+        node_group.is_modifier = True
+    diff = reconcile(node_group, graph)
+    save_node_schema()
+    # Keep the layout the tree was exported with.
+    for node in graph.nodes:
+        node_group.nodes[diff.node_names[node.name]].location = node.location
+    node_group[ARTIFACT_HASH_PROPERTY] = artifact['hash']
+    # A script that builds the same tree again will find it up to date.
+    if artifact['fingerprint'] is not None:
+        node_group[FINGERPRINT_PROPERTY] = artifact['fingerprint']
+    elif FINGERPRINT_PROPERTY in node_group:
+        del node_group[FINGERPRINT_PROPERTY]
+    record_dependencies(node_group, graph)
+    return node_group
+
+def load_artifacts(*artifacts, allow_scripted_drivers=False):
+    """
+    Load several artifacts, each after the artifacts for the trees it uses. Returns the node groups.
+    """
+    artifacts = [read_artifact(artifact) if isinstance(artifact, str) else artifact for artifact in artifacts]
+    by_name = { artifact['name']: artifact for artifact in artifacts }
+    loaded = []
+    remaining = dict(by_name)
+    while len(remaining) > 0:
+        ready = sorted(name for name, artifact in remaining.items() if not any(d in remaining for d in artifact['dependencies']))
+        if len(ready) == 0:
+            raise Exception(f"Artifacts {', '.join(sorted(remaining.keys()))} depend on each other.")
+        for name in ready:
+            loaded.append(load_artifact(remaining.pop(name), allow_scripted_drivers=allow_scripted_drivers))
+    return loaded
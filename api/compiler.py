@@ -0,0 +1,299 @@
+import ast
+import inspect
+import operator
+import os
+import textwrap
+import types
+import weakref
+from .state import State
+from .types import Type
+from .cse import node_key, lookup, store
+from .fold import fold_math, fold_compare
+
+# The name the lowered expressions call, bound as a closure variable of the compiled builder.
+EVALUATE_NAME = '__geometry_script_evaluate__'
+
+binary_operators = {
+    ast.Add: (operator.add, 'ADD'),
+    ast.Sub: (operator.sub, 'SUBTRACT'),
+    ast.Mult: (operator.mul, 'MULTIPLY'),
+    ast.Div: (operator.truediv, 'DIVIDE'),
+    ast.Mod: (operator.mod, 'MODULO'),
+    ast.Pow: (operator.pow, 'POWER'),
+    ast.FloorDiv: (operator.floordiv, None),
+    ast.MatMult: (operator.matmul, None),
+}
+unary_operators = {
+    ast.USub: operator.neg,
+    ast.UAdd: operator.pos,
+    ast.Invert: operator.invert,
+}
+compare_operators = {
+    ast.Lt: (operator.lt, 'LESS_THAN', 'GREATER_THAN'),
+    ast.LtE: (operator.le, 'LESS_EQUAL', 'GREATER_EQUAL'),
+    ast.Gt: (operator.gt, 'GREATER_THAN', 'LESS_THAN'),
+    ast.GtE: (operator.ge, 'GREATER_EQUAL', 'LESS_EQUAL'),
+    ast.Eq: (operator.eq, 'EQUAL', 'EQUAL'),
+    ast.NotEq: (operator.ne, 'NOT_EQUAL', 'NOT_EQUAL'),
+}
+components = { 'x': 0, 'y': 1, 'z': 2 }
+
+# The operations of *Vector Math* that the operators use, see `Type._math`.
+vector_operations = {'ADD', 'SUBTRACT', 'MULTIPLY', 'DIVIDE', 'MODULO'}
+
+# The same operators keyed by the names used in lowered expressions.
+_binary_operators = { k.__name__: v for k, v in binary_operators.items() }
+_unary_operators = { k.__name__: v for k, v in unary_operators.items() }
+_compare_operators = { k.__name__: v for k, v in compare_operators.items() }
+
+# Expressions with fewer operators than this are left to the `Type` operators.
+MINIMUM_OPERATORS = 2
+
+class _ExpressionLowering(ast.NodeTransformer):
+    """
+    Replaces each arithmetic expression with a single call that receives the shape of the expression and the values of its leaves.
+
+    A shape is a nested tuple: `('leaf', index)`, `('binary', operator, left, right)`, `('unary', operator, operand)`,
+    `('compare', operator, left, right)` or `('component', name, operand)`. Operators are names of `ast` classes.
+    """
+    def _lower(self, node, leaves):
+        if isinstance(node, ast.BinOp) and type(node.op) in binary_operators:
+            return ('binary', type(node.op).__name__, self._lower(node.left, leaves), self._lower(node.right, leaves))
+        if isinstance(node, ast.UnaryOp) and type(node.op) in unary_operators:
+            return ('unary', type(node.op).__name__, self._lower(node.operand, leaves))
+        if isinstance(node, ast.Compare) and len(node.ops) == 1 and type(node.ops[0]) in compare_operators:
+            return ('compare', type(node.ops[0]).__name__, self._lower(node.left, leaves), self._lower(node.comparators[0], leaves))
+        if isinstance(node, ast.Attribute) and node.attr in components and isinstance(node.ctx, ast.Load) and _is_expression(node.value):
+            return ('component', node.attr, self._lower(node.value, leaves))
+        leaves.append(self.visit(node))
+        return ('leaf', len(leaves) - 1)
+
+    def _visit_expression(self, node):
+        if _operator_count(node) < MINIMUM_OPERATORS:
+            return self.generic_visit(node)
+        leaves = []
+        shape = self._lower(node, leaves)
+        call = ast.Call(
+            func=ast.Name(id=EVALUATE_NAME, ctx=ast.Load()),
+            args=[ast.Constant(value=shape), *leaves],
+            keywords=[]
+        )
+        return ast.copy_location(call, node)
+
+    visit_BinOp = _visit_expression
+    visit_UnaryOp = _visit_expression
+    visit_Compare = _visit_expression
+
+def _is_expression(node):
+    return (
+        (isinstance(node, ast.BinOp) and type(node.op) in binary_operators)
+        or (isinstance(node, ast.UnaryOp) and type(node.op) in unary_operators)
+        or (isinstance(node, ast.Compare) and len(node.ops) == 1 and type(node.ops[0]) in compare_operators)
+    )
+
+def _operator_count(node):
+    if isinstance(node, ast.BinOp) and type(node.op) in binary_operators:
+        return 1 + _operator_count(node.left) + _operator_count(node.right)
+    if isinstance(node, ast.UnaryOp) and type(node.op) in unary_operators:
+        return 1 + _operator_count(node.operand)
+    if isinstance(node, ast.Compare) and len(node.ops) == 1 and type(node.ops[0]) in compare_operators:
+        return 1 + _operator_count(node.left) + _operator_count(node.comparators[0])
+    if isinstance(node, ast.Attribute) and node.attr in components and _is_expression(node.value):
+        return 1 + _operator_count(node.value)
+    return 0
+
+def _is_operand(value):
+    return isinstance(value, (Type, int, float, tuple)) and not isinstance(value, bool)
+
+def _key(value):
+    return ('socket', id(value)) if isinstance(value, Type) else (type(value), repr(value))
+
+def _emit(node_type, operation, operands, inputs, cse_key):
+    if lookup(cse_key) is not None:
+        return lookup(cse_key)
+    from .node_mapper import set_or_create_link
+    node = State.current_node_tree.nodes.new(node_type)
+    node.operation = operation
+    for operand, node_input in zip(operands, inputs(node)):
+        set_or_create_link(operand, node_input)
+    return store(cse_key, Type(node.outputs[0]))
+
+def _math_inputs(node):
+    return node.inputs[:2]
+
+def _compare_inputs(node):
+    return [next(node_input for node_input in node.inputs if node_input.enabled and node_input.name == name) for name in ('A', 'B')]
+
+def _emit_math(operation, a, b, vector=False):
+    """
+    Create a *Math* or *Vector Math* node for a binary operator, like `Type._math` does through `math()` and `vector_math()`.
+    """
+    operands = (a, b)
+    folded = fold_math(operation, operands, vector=vector)
+    if folded is not None:
+        return folded if isinstance(folded, Type) else Type(value=folded)
+    if vector:
+        return _emit('ShaderNodeVectorMath', operation, operands, _math_inputs, node_key('ShaderNodeVectorMath', None, operation=operation, vector=operands))
+    return _emit('ShaderNodeMath', operation, operands, _math_inputs, node_key('ShaderNodeMath', None, operation=operation, value=operands))
+
+def _emit_compare(operation, a, b):
+    """
+    Create a *Compare* node between a non-boolean `Type` and another operand, like `Type._compare` does through `compare()`.
+    """
+    folded = fold_compare(operation, a, b)
+    if folded is not None:
+        return Type(value=folded)
+    return _emit('FunctionNodeCompare', operation, (a, b), _compare_inputs, node_key('FunctionNodeCompare', None, operation=operation, a=a, b=b))
+
+def _is_scalar(value):
+    if isinstance(value, Type):
+        return value._socket.type in ('VALUE', 'INT')
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def _is_vector(value):
+    return isinstance(value, Type) and value._socket.type == 'VECTOR'
+
+def _binary(name, a, b):
+    python_operator, operation = _binary_operators[name]
+    # The operand whose operator Python would call decides the kind of node, like `a.__add__(b)` or `b.__radd__(a)`.
+    operand = a if isinstance(a, Type) else b
+    if operation in vector_operations and _is_vector(operand) and (_is_operand(a) and _is_operand(b)):
+        return _emit_math(operation, a, b, vector=True)
+    if operation is not None and _is_scalar(a) and _is_scalar(b):
+        return _emit_math(operation, a, b)
+    return python_operator(a, b)
+
+def _compare(name, a, b):
+    python_operator, operation, reflected_operation = _compare_operators[name]
+    if isinstance(a, Type) and a._socket.type != 'BOOLEAN' and _is_operand(b):
+        return _emit_compare(operation, a, b)
+    if not isinstance(a, Type) and _is_operand(a) and b._socket.type != 'BOOLEAN':
+        # Python calls the reflected operator of the right operand, such as `b.__gt__(a)` for `a < b`.
+        return _emit_compare(reflected_operation, b, a)
+    return python_operator(a, b)
+
+def evaluate(shape, *leaves):
+    """
+    Evaluate a lowered expression. Operators between plain Python values are evaluated by Python,
+    repeated subexpressions on the same values are only evaluated once, and math, vector math,
+    comparisons and components create their nodes directly.
+    """
+    results = {}
+    def visit(shape):
+        kind = shape[0]
+        if kind == 'leaf':
+            return leaves[shape[1]]
+        if kind == 'component':
+            value = visit(shape[2])
+            if _is_vector(value):
+                return value._get_xyz_component(components[shape[1]])
+            return getattr(value, shape[1])
+        if kind == 'unary':
+            value = visit(shape[2])
+            if shape[1] == 'USub' and isinstance(value, Type) and (_is_scalar(value) or _is_vector(value)):
+                # `-x` is `x * -1`, see `Type.__neg__`.
+                return _emit_math('MULTIPLY', value, -1, vector=_is_vector(value))
+            return _unary_operators[shape[1]](value)
+        a = visit(shape[2])
+        b = visit(shape[3])
+        if not isinstance(a, Type) and not isinstance(b, Type):
+            # Plain Python values keep their own semantics.
+            if kind == 'binary':
+                return _binary_operators[shape[1]][0](a, b)
+            return _compare_operators[shape[1]][0](a, b)
+        shareable = _is_operand(a) and _is_operand(b)
+        if shareable:
+            key = (kind, shape[1], _key(a), _key(b))
+            if key in results:
+                return results[key][0]
+        result = _binary(shape[1], a, b) if kind == 'binary' else _compare(shape[1], a, b)
+        if shareable:
+            # Keep the operands alive, so their ids are not reused within the expression.
+            results[key] = (result, a, b)
+        return result
+    return visit(shape)
+
+# The compiled code of each builder, dropped along with the builder when a script runs again.
+_compiled = weakref.WeakKeyDictionary()
+def compile_builder(builder):
+    """
+    Compile a builder so that each arithmetic expression in it is evaluated as a whole, see `evaluate`.
+
+    Returns `None` if the builder's source is unavailable or uses something the compiler does not support,
+    in which case the builder should be run as is.
+    """
+    code = builder.__code__
+    if code not in _compiled:
+        _compiled[code] = _compile_code(builder)
+    compiled_code = _compiled[code]
+    if compiled_code is None:
+        return None
+    cells = dict(zip(code.co_freevars, builder.__closure__ or ()))
+    cells[EVALUATE_NAME] = types.CellType(evaluate)
+    if any(name not in cells for name in compiled_code.co_freevars):
+        return None
+    compiled = types.FunctionType(
+        compiled_code,
+        builder.__globals__,
+        builder.__name__,
+        builder.__defaults__,
+        tuple(cells[name] for name in compiled_code.co_freevars)
+    )
+    compiled.__kwdefaults__ = builder.__kwdefaults__
+    compiled.__annotations__ = builder.__annotations__
+    compiled.__wrapped__ = builder
+    return compiled
+
+def _text_source(builder):
+    """
+    The source of a builder defined in a Blender text block, which `inspect` can't find, or `None` if it wasn't.
+    """
+    import bpy
+    code = builder.__code__
+    for text in getattr(bpy.data, 'texts', ()):
+        # Blender names the file of a text block after the .blend file and the text.
+        if code.co_filename in (text.name, f"{bpy.data.filepath}{os.sep}{text.name}") or (text.filepath and code.co_filename == bpy.path.abspath(text.filepath)):
+            lines = text.as_string().splitlines(keepends=True)
+            return ''.join(inspect.getblock(lines[code.co_firstlineno - 1:]))
+    return None
+
+def _compile_code(builder):
+    try:
+        # `inspect` would look for the source of a text block in the file of `__main__`, so text blocks are checked first.
+        source = _text_source(builder)
+        if source is None:
+            source = inspect.getsource(builder)
+        module = ast.parse(textwrap.dedent(source))
+    except (OSError, TypeError, SyntaxError, IndexError):
+        return None
+    if len(module.body) != 1 or not isinstance(module.body[0], (ast.FunctionDef, ast.AsyncFunctionDef)) or module.body[0].name != builder.__name__:
+        return None
+    function = module.body[0]
+    function.decorator_list = []
+    function = _ExpressionLowering().visit(function)
+
+    # Define the builder inside a function that declares its closure variables, so they stay closure variables when it is compiled.
+    free_names = [*builder.__code__.co_freevars, EVALUATE_NAME]
+    outer = ast.FunctionDef(
+        name='__geometry_script_outer__',
+        args=ast.arguments(posonlyargs=[], args=[], vararg=None, kwonlyargs=[], kw_defaults=[], kwarg=None, defaults=[]),
+        body=[
+            *(ast.Assign(targets=[ast.Name(id=name, ctx=ast.Store())], value=ast.Constant(value=None)) for name in free_names),
+            function,
+        ],
+        decorator_list=[],
+        returns=None,
+        type_comment=None,
+    )
+    module = ast.Module(body=[outer], type_ignores=[])
+    ast.fix_missing_locations(module)
+    ast.increment_lineno(module, builder.__code__.co_firstlineno - 1)
+    try:
+        module_code = compile(module, builder.__code__.co_filename, 'exec')
+    except (SyntaxError, ValueError):
+        return None
+    outer_code = next(const for const in module_code.co_consts if isinstance(const, types.CodeType))
+    for const in outer_code.co_consts:
+        if isinstance(const, types.CodeType) and const.co_name == builder.__name__:
+            return const
+    return None
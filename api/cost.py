@@ -0,0 +1,172 @@
+import enum
+
+class CostClass(enum.Enum):
+    """
+    How the evaluation time of a node grows with the number of elements it processes.
+    """
+    CONSTANT = 'CONSTANT'
+    PER_ELEMENT = 'PER_ELEMENT'
+    PER_ELEMENT_SQUARED = 'PER_ELEMENT_SQUARED'
+    BVH_BUILD = 'BVH_BUILD'
+    REALIZE = 'REALIZE'
+
+# The relative cost of a node of each class, for the same number of elements.
+cost_weights = {
+    CostClass.CONSTANT: 0,
+    CostClass.PER_ELEMENT: 1,
+    CostClass.BVH_BUILD: 10,
+    CostClass.REALIZE: 20,
+    CostClass.PER_ELEMENT_SQUARED: 100,
+}
+
+# Node types that are not `PER_ELEMENT`.
+node_cost_classes = {
+    'NodeGroupInput': CostClass.CONSTANT,
+    'NodeGroupOutput': CostClass.CONSTANT,
+    'NodeFrame': CostClass.CONSTANT,
+    'NodeReroute': CostClass.CONSTANT,
+    'ShaderNodeValue': CostClass.CONSTANT,
+    'FunctionNodeInputInt': CostClass.CONSTANT,
+    'FunctionNodeInputBool': CostClass.CONSTANT,
+    'FunctionNodeInputVector': CostClass.CONSTANT,
+    'FunctionNodeInputString': CostClass.CONSTANT,
+    'GeometryNodeRepeatInput': CostClass.CONSTANT,
+    'GeometryNodeRepeatOutput': CostClass.CONSTANT,
+    'GeometryNodeProximity': CostClass.BVH_BUILD,
+    'GeometryNodeRaycast': CostClass.BVH_BUILD,
+    'GeometryNodeSampleNearest': CostClass.BVH_BUILD,
+    'GeometryNodeSampleNearestSurface': CostClass.BVH_BUILD,
+    'GeometryNodeSampleUVSurface': CostClass.BVH_BUILD,
+    'GeometryNodeIndexOfNearest': CostClass.BVH_BUILD,
+    'GeometryNodeMergeByDistance': CostClass.BVH_BUILD,
+    'GeometryNodeRealizeInstances': CostClass.REALIZE,
+    'GeometryNodeMeshBoolean': CostClass.PER_ELEMENT_SQUARED,
+}
+
+# Nodes whose output grows exponentially with an input, and the name of that input.
+subdivision_node_types = {
+    'GeometryNodeSubdivideMesh': 'Level',
+    'GeometryNodeSubdivisionSurface': 'Level',
+}
+
+# Nodes that instance their `Instance` input, which is much cheaper before it is realized.
+instancing_node_types = {'GeometryNodeInstanceOnPoints'}
+
+# Nodes that are worth pointing out inside a repeat zone, in addition to the expensive classes.
+zone_sensitive_node_types = {'GeometryNodeSampleIndex'}
+
+# Iteration counts assumed for zones whose count isn't a constant.
+DEFAULT_ITERATIONS = 10
+# Subdivision levels assumed when the level isn't a constant.
+DEFAULT_SUBDIVISION_LEVEL = 3
+
+class CostReport:
+    """
+    The estimated evaluation cost of a node tree.
+
+    `nodes` maps the name of each node to `(cost_class, multiplier, cost)`, and `hotspots` lists `(cost, node name, note)`
+    for the most expensive nodes and for patterns that are known to be slow, most expensive first.
+    """
+    def __init__(self, nodes, notes):
+        self.nodes = nodes
+        self.total = sum(cost for _, _, cost in nodes.values())
+        self.node_count = len(nodes)
+        self.hotspots = sorted(
+            ((nodes[name][2], name, notes.get(name)) for name in nodes.keys() if nodes[name][2] > 0),
+            key=lambda hotspot: (hotspot[2] is None, -hotspot[0], hotspot[1])
+        )
+
+    def top(self, count=5):
+        return self.hotspots[:count]
+
+    def __repr__(self):
+        return f"CostReport(total={self.total:g}, nodes={self.node_count}, hotspots={self.top()})"
+
+def _constant_input(node, name):
+    node_input = next((node_input for node_input in node.inputs if node_input.name == name), None)
+    if node_input is None or node_input.is_linked or not hasattr(node_input, 'default_value'):
+        return None
+    return node_input.default_value
+
+def _zones(node_tree, downstream, upstream):
+    """
+    The nodes inside each repeat zone, and the number of times the zone runs, or `None` if it isn't constant.
+    """
+    def reach(start, edges):
+        seen = set()
+        stack = [start]
+        while stack:
+            name = stack.pop()
+            if name not in seen:
+                seen.add(name)
+                stack.extend(edges[name])
+        return seen
+    zones = []
+    for node in node_tree.nodes:
+        paired_output = getattr(node, 'paired_output', None)
+        if node.bl_idname == 'GeometryNodeRepeatInput' and paired_output is not None:
+            members = reach(node.name, downstream) & reach(paired_output.name, upstream)
+            members -= {node.name, paired_output.name}
+            zones.append((members, _constant_input(node, 'Iterations')))
+    return zones
+
+def estimate_cost(node_tree):
+    """
+    Estimate how expensive a node tree is to evaluate, relative to a tree with one node that processes each element once.
+
+    Each node's cost class is weighted by `cost_weights`, and multiplied by the iteration counts of the repeat zones it is in.
+    """
+    upstream = { node.name: [] for node in node_tree.nodes }
+    downstream = { node.name: [] for node in node_tree.nodes }
+    instanced = {}
+    for link in node_tree.links:
+        upstream[link.to_node.name].append(link.from_node.name)
+        downstream[link.from_node.name].append(link.to_node.name)
+        if link.to_node.bl_idname in instancing_node_types and link.to_socket.name == 'Instance':
+            instanced.setdefault(link.to_node.name, []).append(link.from_node.name)
+
+    multipliers = { node.name: 1 for node in node_tree.nodes }
+    notes = {}
+    for members, iterations in _zones(node_tree, downstream, upstream):
+        for name in members:
+            multipliers[name] *= DEFAULT_ITERATIONS if iterations is None else max(int(iterations), 0)
+
+    nodes = {}
+    for node in node_tree.nodes:
+        cost_class = node_cost_classes.get(node.bl_idname, CostClass.PER_ELEMENT)
+        multiplier = multipliers[node.name]
+        if multiplier != 1 and (cost_class in (CostClass.BVH_BUILD, CostClass.REALIZE, CostClass.PER_ELEMENT_SQUARED) or node.bl_idname in zone_sensitive_node_types):
+            notes[node.name] = f"{node.bl_idname} runs {multiplier} times in a repeat zone"
+        if node.bl_idname in subdivision_node_types:
+            level = _constant_input(node, subdivision_node_types[node.bl_idname])
+            if level is None:
+                level = DEFAULT_SUBDIVISION_LEVEL
+                notes[node.name] = f"{node.bl_idname} level is not a constant, assuming {level}"
+            # Each level multiplies the number of faces by 4.
+            multiplier *= 4 ** max(int(level), 0)
+        if node.name in instanced:
+            # Realizing geometry and then instancing it copies the realized geometry for every instance.
+            stack = list(instanced[node.name])
+            seen = set()
+            while stack:
+                name = stack.pop()
+                if name in seen:
+                    continue
+                seen.add(name)
+                if node_tree.nodes[name].bl_idname == 'GeometryNodeRealizeInstances':
+                    notes[name] = f"{name} realizes geometry that is instanced by {node.name}"
+                    break
+                if node_cost_classes.get(node_tree.nodes[name].bl_idname) != CostClass.CONSTANT:
+                    stack.extend(upstream[name])
+        nodes[node.name] = (cost_class, multiplier, cost_weights[cost_class] * multiplier)
+    return CostReport(nodes, notes)
+
+def check_budget(report, name, max_nodes=None, max_cost=None):
+    """
+    Raise if a tree has more nodes or a higher estimated cost than its budget allows.
+    """
+    if max_nodes is not None and report.node_count > max_nodes:
+        raise Exception(f"Tree '{name}' has {report.node_count} nodes, which exceeds its budget of {max_nodes}.")
+    if max_cost is not None and report.total > max_cost:
+        hotspots = ', '.join(f"{node} ({cost:g}{': ' + note if note else ''})" for cost, node, note in report.top(3))
+        raise Exception(f"Tree '{name}' has an estimated cost of {report.total:g}, which exceeds its budget of {max_cost:g}. Most expensive: {hotspots}.")
@@ -0,0 +1,65 @@
+import bpy
+import enum
+from .state import State
+from .schema import node_schema
+from .static.curve import Curve
+
+# Nodes that have effects beyond their outputs, even though they don't take or produce geometry.
+impure_node_types = {'GeometryNodeWarning', 'GeometryNodeViewer'}
+
+def socket_key(socket):
+    return socket.as_pointer()
+
+def value_key(value):
+    """
+    A hashable key for an argument passed to a node, or raises a `TypeError` if the argument can't be compared.
+    """
+    socket = getattr(value, '_socket', None)
+    if socket is not None:
+        return ('socket', socket_key(socket))
+    if isinstance(value, enum.Enum):
+        return value_key(value.value)
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return (type(value), repr(value))
+    if isinstance(value, (tuple, list)):
+        return (type(value), tuple(value_key(x) for x in value))
+    if isinstance(value, Curve):
+        return ('curve', tuple((point.x, point.y, point.handle_type) for point in value.points))
+    if isinstance(value, bpy.types.ID):
+        return ('id', value.as_pointer())
+    raise TypeError(f"'{value}' cannot be compared for common subexpression elimination.")
+
+_pure_node_types = {}
+def is_pure(node_type_name):
+    """
+    Whether a node only computes its outputs from its inputs and settings, without consuming geometry or having side effects.
+    """
+    if node_type_name not in _pure_node_types:
+        from .node_mapper import has_dynamic_sockets
+        schema = node_schema(node_type_name)
+        _pure_node_types[node_type_name] = (
+            'inputs' in schema
+            and node_type_name not in impure_node_types
+            and not has_dynamic_sockets(node_type_name)
+            and all(socket['type'] != 'GEOMETRY' for socket in [*schema['inputs'], *schema['outputs']])
+        )
+    return _pure_node_types[node_type_name]
+
+def node_key(node_type_name, *args, **kwargs):
+    """
+    The key a node with these arguments is stored under, or `None` if it should not be shared.
+    """
+    if State.cse is None or not is_pure(node_type_name):
+        return None
+    try:
+        return (node_type_name, tuple(value_key(x) for x in args), tuple(sorted((k, value_key(v)) for k, v in kwargs.items())))
+    except TypeError:
+        return None
+
+def lookup(key):
+    return State.cse.get(key) if key is not None else None
+
+def store(key, value):
+    if key is not None:
+        State.cse[key] = value
+    return value
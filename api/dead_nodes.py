@@ -0,0 +1,31 @@
+# Nodes that are kept even if nothing they output reaches the Group Output.
+root_node_types = {'NodeGroupOutput', 'GeometryNodeViewer'}
+kept_node_types = {'NodeGroupInput', 'NodeFrame'}
+
+def eliminate_dead_nodes(node_tree):
+    """
+    Remove the nodes whose outputs never reach the Group Output or a Viewer.
+
+    Both nodes of a zone are kept if either one is used. Returns the number of nodes removed.
+    """
+    upstream = { node.name: [] for node in node_tree.nodes }
+    for link in node_tree.links:
+        upstream[link.to_node.name].append(link.from_node.name)
+    # Zones are made of an input node paired with an output node, and each needs the other.
+    for node in node_tree.nodes:
+        paired_output = getattr(node, 'paired_output', None)
+        if paired_output is not None:
+            upstream[node.name].append(paired_output.name)
+            upstream[paired_output.name].append(node.name)
+    reachable = set()
+    stack = [node.name for node in node_tree.nodes if node.bl_idname in root_node_types]
+    while stack:
+        name = stack.pop()
+        if name in reachable:
+            continue
+        reachable.add(name)
+        stack.extend(upstream[name])
+    dead = [node for node in node_tree.nodes if node.name not in reachable and node.bl_idname not in kept_node_types]
+    for node in dead:
+        node_tree.nodes.remove(node)
+    return len(dead)
@@ -0,0 +1,87 @@
+import bpy
+
+DEPENDENCIES_PROPERTY = 'geometry_script_dependencies'
+
+# The node groups each tree uses through group nodes, keyed by tree name.
+dependency_graph = {}
+# A function that builds each tree again, keyed by tree name.
+_rebuilders = {}
+
+def _group_node_trees(node_tree):
+    return {
+        node.node_tree.name
+        for node in node_tree.nodes
+        if node.bl_idname == 'GeometryNodeGroup' and getattr(node, 'node_tree', None) is not None
+    }
+
+def record_dependencies(node_group, graph=None):
+    """
+    Record the node groups used by a tree, from the group nodes in `graph` if it was just built, otherwise from the last build.
+    """
+    if graph is not None:
+        dependencies = _group_node_trees(graph)
+        node_group[DEPENDENCIES_PROPERTY] = sorted(dependencies)
+    elif DEPENDENCIES_PROPERTY in node_group:
+        dependencies = set(node_group[DEPENDENCIES_PROPERTY])
+    else:
+        dependencies = _group_node_trees(node_group)
+    dependency_graph[node_group.name] = dependencies
+
+def register_rebuild(name, rebuild):
+    _rebuilders[name] = rebuild
+
+def scan_dependencies():
+    """
+    Add every geometry node group in the file to the dependency graph, including ones not built by a script this session.
+    """
+    for node_group in bpy.data.node_groups:
+        if node_group.name not in dependency_graph and getattr(node_group, 'bl_idname', 'GeometryNodeTree') == 'GeometryNodeTree':
+            record_dependencies(node_group)
+    return dependency_graph
+
+def dependencies_of(name):
+    return set(dependency_graph.get(name, ()))
+
+def dependents_of(name):
+    return {tree for tree, dependencies in dependency_graph.items() if name in dependencies}
+
+def blast_radius(*names):
+    """
+    The trees that need to be rebuilt when the given trees change: the trees themselves and everything that uses them, directly or indirectly.
+    Each tree comes after the trees it uses.
+    """
+    affected = set()
+    stack = list(names)
+    while len(stack) > 0:
+        name = stack.pop()
+        if name not in affected:
+            affected.add(name)
+            stack.extend(dependents_of(name))
+    order = []
+    remaining = { name: dependencies_of(name) & affected for name in affected }
+    while len(remaining) > 0:
+        ready = sorted(name for name, dependencies in remaining.items() if len(dependencies) == 0)
+        if len(ready) == 0:
+            raise Exception(f"Trees {', '.join(sorted(remaining.keys()))} depend on each other.")
+        for name in ready:
+            order.append(name)
+            del remaining[name]
+        for dependencies in remaining.values():
+            dependencies.difference_update(ready)
+    return order
+
+def rebuild(*names):
+    """
+    Rebuild the given trees and every tree that uses them, in dependency order. Returns the names of the trees that were rebuilt.
+
+    Only trees built by a script this session can be rebuilt. Dependents built in a previous session are skipped.
+    """
+    missing = [name for name in names if name not in _rebuilders]
+    if len(missing) > 0:
+        raise Exception(f"Trees {', '.join(missing)} have not been built this session, so they cannot be rebuilt. Run the script that defines them instead.")
+    rebuilt = []
+    for name in blast_radius(*names):
+        if name in _rebuilders:
+            _rebuilders[name]()
+            rebuilt.append(name)
+    return rebuilt
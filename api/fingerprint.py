@@ -0,0 +1,213 @@
+import bpy
+import dis
+import enum
+import hashlib
+import os
+import site
+import sys
+import types
+from .node_mapper import LazyNodeFunction
+
+FINGERPRINT_PROPERTY = 'geometry_script_fingerprint'
+
+_library_module = __name__.split('.')[0]
+
+_missing = object()
+
+class _Uncacheable(Exception):
+    """
+    Raised for a value whose contents can't be hashed reliably, so the tree that uses it is always rebuilt.
+    """
+
+def _is_library(value):
+    return getattr(value, '__module__', None) is not None and value.__module__.split('.')[0] == _library_module
+
+def _library_paths():
+    paths = [sys.prefix, sys.base_prefix, *site.getsitepackages(), site.getusersitepackages()]
+    resource_path = getattr(getattr(bpy, 'utils', None), 'resource_path', None)
+    if resource_path is not None:
+        paths.extend(resource_path(kind) for kind in ('SYSTEM', 'LOCAL'))
+    return tuple(os.path.join(os.path.realpath(path), '') for path in paths if path)
+
+_library_path_prefixes = None
+
+def _is_library_module(module):
+    """
+    Whether a module is part of Geometry Script, Python, Blender or an installed package, so it can be hashed by name.
+    """
+    global _library_path_prefixes
+    root = module.__name__.split('.')[0]
+    if root == _library_module or root in sys.builtin_module_names or root in getattr(sys, 'stdlib_module_names', ()):
+        return True
+    filepath = getattr(module, '__file__', None)
+    if filepath is None:
+        return False
+    if _library_path_prefixes is None:
+        _library_path_prefixes = _library_paths()
+    return os.path.realpath(filepath).startswith(_library_path_prefixes)
+
+def _attribute_loads(code):
+    """
+    The chains of attributes the code loads from each global, such as `('helper',)` for `lib.helper(x)`,
+    and the names of the modules it imports.
+    A global that is used as it is has an empty chain.
+    """
+    loads = {}
+    imports = set()
+    name, chain = None, ()
+    for instruction in dis.get_instructions(code):
+        if name is not None and instruction.opname in ('LOAD_ATTR', 'LOAD_METHOD'):
+            chain += (instruction.argval,)
+            continue
+        if name is not None:
+            loads.setdefault(name, set()).add(chain)
+        name, chain = (instruction.argval, ()) if instruction.opname in ('LOAD_GLOBAL', 'LOAD_NAME') else (None, ())
+        if instruction.opname == 'IMPORT_NAME':
+            imports.add(instruction.argval)
+    if name is not None:
+        loads.setdefault(name, set()).add(chain)
+    return loads, imports
+
+def _user_module(value):
+    return isinstance(value, types.ModuleType) and not _is_library_module(value)
+
+def _update_module(h, module, chains, seen):
+    """
+    Hash the attributes loaded from a module that isn't a library, such as one loaded with `external.load(..., module=True)`.
+    """
+    h.update(module.__name__.encode())
+    for chain in sorted(chains):
+        if len(chain) == 0:
+            # The module itself is passed around, so there's no telling which of its attributes are used.
+            raise _Uncacheable()
+        value = module
+        for i, attribute in enumerate(chain):
+            h.update(attribute.encode())
+            value = getattr(value, attribute, _missing)
+            if value is _missing:
+                h.update(b'<missing>')
+                break
+            if not _user_module(value):
+                _update(h, value, seen)
+                break
+            if i == len(chain) - 1:
+                raise _Uncacheable()
+
+def _update_code(h, code, namespace, seen):
+    h.update(code.co_code)
+    h.update(repr((code.co_names, code.co_varnames, code.co_freevars)).encode())
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            _update_code(h, const, namespace, seen)
+        else:
+            _update(h, const, seen)
+    # Include any globals the code refers to, such as helper functions, constants and other trees.
+    # Modules that aren't libraries are hashed by the attributes the code loads from them.
+    attribute_loads = None
+    if any(_user_module(namespace.get(name)) or _user_module(sys.modules.get(name)) for name in code.co_names):
+        attribute_loads, imports = _attribute_loads(code)
+        if any(_user_module(sys.modules.get(name)) for name in imports):
+            raise _Uncacheable()
+    for name in code.co_names:
+        if name not in namespace:
+            continue
+        value = namespace[name]
+        h.update(name.encode())
+        if _user_module(value):
+            # Names that are only used as attributes of something else aren't loaded from the module.
+            if name in attribute_loads:
+                _update_module(h, value, attribute_loads[name], seen)
+        else:
+            _update(h, value, seen)
+
+def _update(h, value, seen):
+    if value is None or isinstance(value, (bool, int, float, complex, str, bytes, enum.Enum)):
+        h.update(repr(value).encode())
+    elif isinstance(value, (tuple, list)):
+        h.update(type(value).__name__.encode())
+        for x in value:
+            _update(h, x, seen)
+    elif isinstance(value, (set, frozenset)):
+        _update(h, sorted(value, key=repr), seen)
+    elif isinstance(value, dict):
+        for k, v in value.items():
+            _update(h, k, seen)
+            _update(h, v, seen)
+    elif id(value) in seen:
+        h.update(b'<seen>')
+    else:
+        seen.add(id(value))
+        fingerprint = getattr(value, 'fingerprint', _missing) if isinstance(value, types.FunctionType) else _missing
+        if isinstance(fingerprint, str):
+            # A `group_reference` returned by another `@tree`.
+            h.update(fingerprint.encode())
+        elif fingerprint is None:
+            raise _Uncacheable()
+        elif isinstance(value, LazyNodeFunction):
+            h.update(value._name.encode())
+        elif isinstance(value, types.ModuleType):
+            if not _is_library_module(value):
+                # Reached as a value rather than a global, so there's no telling which of its attributes are used.
+                raise _Uncacheable()
+            h.update(value.__name__.encode())
+        elif (_is_library(value) and isinstance(value, (type, types.FunctionType, types.BuiltinFunctionType))):
+            h.update(getattr(value, '__qualname__', getattr(value, '__name__', type(value).__name__)).encode())
+        elif isinstance(value, types.FunctionType):
+            _update_code(h, value.__code__, value.__globals__, seen)
+            _update(h, value.__defaults__, seen)
+            _update(h, value.__kwdefaults__, seen)
+            _update(h, value.__annotations__, seen)
+            for cell in value.__closure__ or ():
+                try:
+                    _update(h, cell.cell_contents, seen)
+                except ValueError:
+                    pass # empty cell
+        elif isinstance(value, type):
+            h.update(value.__qualname__.encode())
+            for base in value.__bases__:
+                _update(h, base, seen)
+            _update(h, { k: v for k, v in vars(value).items() if not k.startswith('__') or k == '__annotations__' }, seen)
+        elif isinstance(value, bpy.types.ID):
+            h.update(f"{type(value).__name__}:{value.name}".encode())
+        elif hasattr(value, '__dict__') or hasattr(type(value), '__slots__'):
+            _update(h, type(value), seen)
+            state = dict(vars(value)) if hasattr(value, '__dict__') else {}
+            for cls in type(value).__mro__:
+                slots = cls.__dict__.get('__slots__', ())
+                for slot in ([slots] if isinstance(slots, str) else slots):
+                    if slot not in ('__dict__', '__weakref__') and hasattr(value, slot):
+                        state[slot] = getattr(value, slot)
+            _update(h, state, seen)
+        else:
+            # Values without a `__dict__`, such as arrays, are hashed by what they pickle to.
+            h.update(type(value).__qualname__.encode())
+            try:
+                reduced = value.__reduce_ex__(4)
+            except Exception:
+                reduced = None
+            # The default reduction of an object without state only names its type.
+            if isinstance(reduced, tuple) and not (reduced[1:2] == ((type(value),),) and all(x is None for x in reduced[2:])):
+                _update(h, reduced[1:], seen)
+                return
+            text = repr(value)
+            if ' at 0x' in text:
+                raise _Uncacheable()
+            h.update(text.encode())
+
+def builder_fingerprint(builder, *extra):
+    """
+    Compute a hash of everything that determines the tree a builder produces:
+    its code, defaults, annotations, closure values, referenced globals and the fingerprints of any sub-trees it uses.
+
+    Returns `None` if the builder uses a value that can't be hashed reliably, in which case the tree should always be rebuilt.
+    """
+    import geometry_script
+    h = hashlib.sha1()
+    seen = set()
+    _update(h, (tuple(bpy.app.version), geometry_script.bl_info['version']), seen)
+    _update(h, extra, seen)
+    try:
+        _update(h, builder, seen)
+    except _Uncacheable:
+        return None
+    return h.hexdigest()
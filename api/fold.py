@@ -0,0 +1,191 @@
+import math
+import struct
+from .state import State
+
+# Operations are evaluated the way Blender does, including its "safe" variants that return 0 instead of failing.
+def _safe_divide(a, b):
+    return a / b if b != 0 else 0.0
+
+def _safe_modulo(a, b):
+    return math.fmod(a, b) if b != 0 else 0.0
+
+def _safe_power(a, b):
+    return 0.0 if a < 0 and b != int(b) else a ** b
+
+def _componentwise(f):
+    return lambda *vectors: tuple(f(*components) for components in zip(*vectors))
+
+math_operations = {
+    'ADD': lambda a, b: a + b,
+    'SUBTRACT': lambda a, b: a - b,
+    'MULTIPLY': lambda a, b: a * b,
+    'DIVIDE': _safe_divide,
+    'MULTIPLY_ADD': lambda a, b, c: a * b + c,
+    'POWER': _safe_power,
+    'MODULO': _safe_modulo,
+    'MINIMUM': min,
+    'MAXIMUM': max,
+    'LESS_THAN': lambda a, b: float(a < b),
+    'GREATER_THAN': lambda a, b: float(a > b),
+    'ABSOLUTE': abs,
+    'SQRT': lambda a: math.sqrt(a) if a > 0 else 0.0,
+    'SIGN': lambda a: float((a > 0) - (a < 0)),
+    'ROUND': lambda a: math.floor(a + 0.5),
+    'FLOOR': math.floor,
+    'CEIL': math.ceil,
+    'TRUNCATE': math.trunc,
+    'FRACT': lambda a: a - math.floor(a),
+    'EXPONENT': math.exp,
+    'SINE': math.sin,
+    'COSINE': math.cos,
+    'TANGENT': math.tan,
+}
+
+vector_math_operations = {
+    'ADD': _componentwise(lambda a, b: a + b),
+    'SUBTRACT': _componentwise(lambda a, b: a - b),
+    'MULTIPLY': _componentwise(lambda a, b: a * b),
+    'DIVIDE': _componentwise(_safe_divide),
+    'MODULO': _componentwise(_safe_modulo),
+    'MINIMUM': _componentwise(min),
+    'MAXIMUM': _componentwise(max),
+    'ABSOLUTE': _componentwise(abs),
+    'FLOOR': _componentwise(math.floor),
+    'CEIL': _componentwise(math.ceil),
+    'FRACTION': _componentwise(lambda a: a - math.floor(a)),
+    'DOT_PRODUCT': lambda a, b: sum(x * y for x, y in zip(a, b)),
+}
+
+compare_operations = {
+    'LESS_THAN': lambda a, b: a < b,
+    'LESS_EQUAL': lambda a, b: a <= b,
+    'GREATER_THAN': lambda a, b: a > b,
+    'GREATER_EQUAL': lambda a, b: a >= b,
+    # The default epsilon of the Compare node.
+    'EQUAL': lambda a, b: abs(a - b) <= 0.001,
+    'NOT_EQUAL': lambda a, b: abs(a - b) > 0.001,
+}
+
+boolean_math_operations = {
+    'AND': lambda a, b: a and b,
+    'OR': lambda a, b: a or b,
+    'NOT': lambda a: not a,
+    'NAND': lambda a, b: not (a and b),
+    'NOR': lambda a, b: not (a or b),
+    'XNOR': lambda a, b: a == b,
+    'XOR': lambda a, b: a != b,
+    'IMPLY': lambda a, b: (not a) or b,
+    'NIMPLY': lambda a, b: a and not b,
+}
+
+# Operations that return one operand unchanged when the other is this value, by the position of the constant.
+math_identities = {
+    'ADD': { 0: 0, 1: 0 },
+    'SUBTRACT': { 1: 0 },
+    'MULTIPLY': { 0: 1, 1: 1 },
+    'DIVIDE': { 1: 1 },
+    'POWER': { 1: 1 },
+}
+
+def _float32(x):
+    if isinstance(x, tuple):
+        return tuple(_float32(i) for i in x)
+    return struct.unpack('f', struct.pack('f', x))[0]
+
+def constant_value(x):
+    """
+    The Python value of an operand if it is known while building the tree, otherwise `None`.
+    """
+    if isinstance(x, (bool, int, float)):
+        return x
+    if isinstance(x, tuple):
+        return x if len(x) == 3 and all(isinstance(i, (bool, int, float)) for i in x) else None
+    value = getattr(x, '_constant', None)
+    return value if isinstance(value, (bool, int, float, tuple)) else None
+
+def _socket_type(x):
+    socket = getattr(x, '_socket', None)
+    return None if socket is None else socket.type
+
+def _evaluate(f, values):
+    try:
+        return _float32(f(*_float32(tuple(values))))
+    except (TypeError, ValueError, ZeroDivisionError, OverflowError):
+        return None
+
+def fold_math(operation, operands, vector=False):
+    """
+    Fold a Math or Vector Math operation.
+
+    Returns the constant result if every operand is constant, the operand itself for identities such as `x * 1`,
+    or `None` if a node is needed.
+    """
+    if not State.fold:
+        return None
+    values = [constant_value(x) for x in operands]
+    if all(v is not None for v in values):
+        if vector:
+            # Scalars are implicitly converted to vectors with equal components.
+            values = [tuple(map(float, v)) if isinstance(v, tuple) else (float(v),) * 3 for v in values]
+            f = vector_math_operations.get(operation)
+        else:
+            if any(isinstance(v, tuple) for v in values):
+                return None
+            values = [float(v) for v in values]
+            f = math_operations.get(operation)
+        if f is None:
+            return None
+        return _evaluate(f, values)
+    if len(operands) == 2:
+        for position, identity in math_identities.get(operation, {}).items():
+            value = values[position]
+            operand = operands[1 - position]
+            if value is None or _socket_type(operand) != ('VECTOR' if vector else 'VALUE'):
+                continue
+            if (all(i == identity for i in value) if isinstance(value, tuple) else value == identity):
+                return operand
+    return None
+
+def fold_compare(operation, a, b):
+    """
+    Fold a Compare operation on two constant scalars, or return `None` if a node is needed.
+    """
+    if not State.fold:
+        return None
+    values = [constant_value(a), constant_value(b)]
+    if operation not in compare_operations or any(v is None or isinstance(v, tuple) for v in values):
+        return None
+    try:
+        values = _float32(tuple(float(v) for v in values))
+    except OverflowError:
+        return None
+    return bool(compare_operations[operation](*values))
+
+def fold_boolean_math(operation, operands):
+    """
+    Fold a Boolean Math operation.
+
+    An unknown operand is tried with both `True` and `False`, so the result is constant when it doesn't matter
+    (such as `x & False`) and is the operand itself when it passes through unchanged (such as `x | False`).
+    Returns `None` if a node is needed.
+    """
+    if not State.fold or operation not in boolean_math_operations:
+        return None
+    f = boolean_math_operations[operation]
+    values = [constant_value(x) for x in operands]
+    if any(v is not None and not isinstance(v, bool) for v in values):
+        return None
+    unknown = [i for i, v in enumerate(values) if v is None]
+    if len(unknown) > 1:
+        return None
+    if len(unknown) == 0:
+        return bool(f(*values))
+    results = []
+    for guess in (False, True):
+        values[unknown[0]] = guess
+        results.append(bool(f(*values)))
+    if results[0] == results[1]:
+        return results[0]
+    if results == [False, True] and _socket_type(operands[unknown[0]]) == 'BOOLEAN':
+        return operands[unknown[0]]
+    return None
@@ -0,0 +1,620 @@
+import struct
+from .schema import node_schema, node_properties, probe_sockets, interface_socket_default
+
+# Node attributes that are not settings, and are stored on the node directly.
+_node_attributes = {'name', 'location', 'width', 'parent', 'hide', 'mute', 'select', 'paired_output'}
+
+_no_value = object()
+
+def _float32(x):
+    return struct.unpack('f', struct.pack('f', x))[0]
+
+def _coerce(current, value):
+    # Convert a value the way Blender would when assigning it over `current`, raising a `TypeError` if it can't be.
+    if isinstance(current, bool):
+        if isinstance(value, bool) or (isinstance(value, int) and value in (0, 1)):
+            return bool(value)
+    elif isinstance(current, int):
+        if isinstance(value, int):
+            return int(value)
+    elif isinstance(current, float):
+        if isinstance(value, (int, float)):
+            return _float32(value)
+    elif isinstance(current, str):
+        if isinstance(value, str):
+            return value
+    elif isinstance(current, (tuple, list)):
+        if not isinstance(value, str) and hasattr(value, '__len__') and len(value) == len(current):
+            return tuple(_coerce(c, v) for c, v in zip(current, value))
+    else:
+        return value
+    raise TypeError(f"'{value}' cannot be assigned to a value of type '{type(current).__name__}'")
+
+def _from_json(value):
+    return tuple(value) if isinstance(value, list) else value
+
+def socket_type_of(socket_type):
+    """
+    The `type` of a socket from its class name, such as `'VALUE'` for `'NodeSocketFloat'`.
+    """
+    name = socket_type.removeprefix('NodeSocket')
+    for prefix, t in (('Float', 'VALUE'), ('Int', 'INT'), ('Bool', 'BOOLEAN'), ('Color', 'RGBA'), ('Virtual', 'CUSTOM')):
+        if name.startswith(prefix):
+            return t
+    for prefix in ('Vector', 'Rotation', 'Matrix', 'String', 'Menu', 'Geometry', 'Object', 'Collection', 'Image', 'Material', 'Texture', 'Shader'):
+        if name.startswith(prefix):
+            return prefix.upper()
+    return 'CUSTOM'
+
+class GraphSocket:
+    """
+    A socket on a `GraphNode`. Subclasses are named after the socket class they stand in for, such as `NodeSocketFloat`.
+    """
+
+    def __init__(self, node, schema, is_output):
+        self.node = node
+        self.is_output = is_output
+        self.identifier = schema['identifier']
+        self._links = []
+        self._update(schema)
+        self._default = _from_json(schema['default']) if 'default' in schema else _no_value
+
+    def _update(self, schema):
+        self.name = schema['name']
+        self.type = schema['type']
+        self.enabled = schema['enabled']
+        self.hide_value = schema['hide_value']
+        self.is_multi_input = schema['is_multi_input']
+
+    @property
+    def bl_idname(self):
+        return type(self).__name__
+
+    @property
+    def is_linked(self):
+        return len(self._links) > 0
+
+    @property
+    def links(self):
+        return list(self._links)
+
+    @property
+    def default_value(self):
+        if self._default is _no_value:
+            raise AttributeError(f"'{type(self).__name__}' object has no attribute 'default_value'")
+        return self._default
+
+    @default_value.setter
+    def default_value(self, value):
+        if self._default is _no_value:
+            raise AttributeError(f"'{type(self).__name__}' object has no attribute 'default_value'")
+        self._default = _coerce(self._default, value)
+
+    def as_pointer(self):
+        return id(self)
+
+    def driver_add(self, path, index=-1):
+        sockets = self.node.outputs if self.is_output else self.node.inputs
+        socket_index = next(i for i, socket in enumerate(sockets) if socket is self)
+        return self.node.graph._driver_add(f'nodes["{self.node.name}"].{"outputs" if self.is_output else "inputs"}[{socket_index}].{path}')
+
+_socket_classes = {}
+def _socket_class(socket_type):
+    if socket_type not in _socket_classes:
+        _socket_classes[socket_type] = type(socket_type, (GraphSocket,), {})
+    return _socket_classes[socket_type]
+
+class GraphSockets(list):
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            for socket in self:
+                if socket.name == key or socket.identifier == key:
+                    return socket
+            raise KeyError(f"bpy_prop_collection[key]: key \"{key}\" not found")
+        return super().__getitem__(key)
+
+class GraphItem:
+    def __init__(self, *args):
+        self.args = args
+        self.socket_type = args[0] if len(args) > 1 else None
+        self.name = args[-1] if len(args) > 0 else ''
+
+class GraphItems:
+    """
+    A collection of items on a node, such as the state items of a zone.
+    """
+
+    def __init__(self, node, items):
+        self._node = node
+        self._items = [GraphItem(*args) for args in items]
+
+    def __iter__(self):
+        return iter(list(self._items))
+
+    def __len__(self):
+        return len(self._items)
+
+    def __getitem__(self, i):
+        return self._items[i]
+
+    def new(self, *args):
+        item = GraphItem(*args)
+        self._items.append(item)
+        return item
+
+    def remove(self, item):
+        self._items.remove(item)
+
+    def clear(self):
+        self._items.clear()
+
+class GraphCurvePoint:
+    def __init__(self, x, y, handle_type='AUTO'):
+        self.location = (x, y)
+        self.handle_type = handle_type
+
+class GraphCurvePoints(list):
+    def new(self, x, y):
+        point = GraphCurvePoint(x, y)
+        self.append(point)
+        return point
+
+class GraphCurve:
+    def __init__(self, points):
+        self.points = GraphCurvePoints(GraphCurvePoint(*point) for point in points)
+
+class GraphCurveMapping:
+    def __init__(self, curves):
+        self.curves = [GraphCurve(points) for points in curves]
+
+    def update(self):
+        pass
+
+_property_schemas = {}
+def _properties(node_type_name):
+    if node_type_name not in _property_schemas:
+        _property_schemas[node_type_name] = { prop['identifier']: prop for prop in node_properties(node_type_name, include_parent=True) }
+    return _property_schemas[node_type_name]
+
+def _affects_sockets(prop):
+    # Enum and boolean settings choose which sockets are available, such as the operation of a Math node.
+    return prop['type'] in {'ENUM', 'BOOLEAN'}
+
+def _pointer_key(value):
+    if value is None:
+        return None
+    if hasattr(value, 'interface') or hasattr(value, 'inputs'):
+        from .interface import get_node_inputs, get_node_outputs
+        return (value.name, tuple((socket.bl_socket_idname, socket.name) for socket in [*get_node_inputs(value), *get_node_outputs(value)]))
+    return getattr(value, 'name', id(value))
+
+# Probed sockets, keyed by node type and configuration.
+_probes = {}
+
+class GraphNode:
+    """
+    A node in a `Graph`, which records its settings and links like a `bpy.types.Node`.
+    """
+
+    def __init__(self, graph, bl_idname, name):
+        schema = node_schema(bl_idname)
+        object.__setattr__(self, 'graph', graph)
+        object.__setattr__(self, 'bl_idname', bl_idname)
+        object.__setattr__(self, 'name', name)
+        object.__setattr__(self, 'location', (0, 0))
+        object.__setattr__(self, 'width', schema.get('width', 140))
+        object.__setattr__(self, 'parent', None)
+        object.__setattr__(self, 'hide', False)
+        object.__setattr__(self, 'mute', False)
+        object.__setattr__(self, 'select', False)
+        object.__setattr__(self, 'paired_output', None)
+        object.__setattr__(self, '_schema', schema)
+        object.__setattr__(self, '_values', {})
+        object.__setattr__(self, '_pointers', {})
+        object.__setattr__(self, '_items', {})
+        object.__setattr__(self, '_curves', {})
+        object.__setattr__(self, '_sockets_key', None)
+        object.__setattr__(self, '_inputs', GraphSockets())
+        object.__setattr__(self, '_outputs', GraphSockets())
+
+    def __repr__(self):
+        return f"<GraphNode '{self.name}' ({self.bl_idname})>"
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        prop = _properties(self.bl_idname).get(name)
+        if prop is None:
+            raise AttributeError(f"'{self.bl_idname}' object has no attribute '{name}'")
+        if prop['type'] == 'COLLECTION':
+            if name not in self._items:
+                self._items[name] = GraphItems(self, self._schema.get('items', {}).get(name, []))
+            return self._items[name]
+        if prop['type'] == 'POINTER':
+            if name in self._pointers:
+                return self._pointers[name]
+            if name in self._schema.get('curves', {}):
+                if name not in self._curves:
+                    self._curves[name] = GraphCurveMapping(self._schema['curves'][name])
+                return self._curves[name]
+            return None
+        if name in self._values:
+            return self._values[name]
+        value = _from_json(self._schema.get('defaults', {}).get(name))
+        return set(value) if prop.get('is_enum_flag') else value
+
+    def __setattr__(self, name, value):
+        if name in _node_attributes:
+            if name == 'name' and value != self.name:
+                value = self.graph.nodes._rename(self, value)
+            object.__setattr__(self, name, value)
+            return
+        prop = _properties(self.bl_idname).get(name)
+        if prop is None:
+            raise AttributeError(f"'{self.bl_idname}' object has no attribute '{name}'")
+        if prop['is_readonly']:
+            raise AttributeError(f"bpy_struct: attribute \"{name}\" from \"{self.bl_idname}\" is read-only")
+        if prop['type'] == 'POINTER':
+            self._pointers[name] = value
+        elif prop['type'] == 'ENUM' and prop.get('is_enum_flag'):
+            self._values[name] = set(value)
+        elif prop['type'] == 'ENUM':
+            if len(prop['enum_items']) > 0 and value not in prop['enum_items']:
+                raise TypeError(f"bpy_struct: item.attr = val: enum \"{value}\" not found in {tuple(prop['enum_items'])}")
+            self._values[name] = value
+        else:
+            current = getattr(self, name)
+            self._values[name] = value if current is None else _coerce(current, value)
+
+    def pair_with_output(self, output):
+        self.paired_output = output
+        return True
+
+    def update(self):
+        pass
+
+    def _configuration(self):
+        # The settings, items and pointers that determine the sockets of this node.
+        properties = _properties(self.bl_idname)
+        return (
+            tuple((k, v) for k, v in self._values.items() if _affects_sockets(properties[k])),
+            tuple((k, tuple(item.args for item in items)) for k, items in self._items.items()),
+            tuple(self._pointers.items()),
+        )
+
+    def _probe(self):
+        if self.bl_idname in {'NodeGroupInput', 'NodeGroupOutput'}:
+            return self.graph.interface._node_sockets(self.bl_idname == 'NodeGroupInput')
+        properties, items, pointers = self._configuration()
+        paired = None
+        if self.paired_output is not None:
+            paired = (self.paired_output.bl_idname, *self.paired_output._configuration())
+        if len(properties) == 0 and len(items) == 0 and len(pointers) == 0 and paired is None:
+            if self.bl_idname not in _probes:
+                _probes[self.bl_idname] = (self._schema['inputs'], self._schema['outputs'])
+            return _probes[self.bl_idname]
+        key = (
+            self.bl_idname,
+            tuple((k, tuple(sorted(v)) if isinstance(v, set) else v) for k, v in properties),
+            items,
+            tuple((k, _pointer_key(v)) for k, v in pointers),
+            None if paired is None else (paired[0], paired[1], paired[2], tuple((k, _pointer_key(v)) for k, v in paired[3])),
+        )
+        if key not in _probes:
+            sockets = probe_sockets(self.bl_idname, properties, items, pointers, paired)
+            if sockets is None:
+                # Without Blender, use the sockets of the referenced group or the default configuration.
+                node_tree = dict(pointers).get('node_tree')
+                if isinstance(getattr(node_tree, 'interface', None), GraphInterface):
+                    sockets = node_tree.interface._group_node_sockets()
+                else:
+                    sockets = (self._schema['inputs'], self._schema['outputs'])
+            _probes[key] = sockets
+        return _probes[key]
+
+    def _refresh(self):
+        schemas = self._probe()
+        if schemas is self._sockets_key:
+            return
+        object.__setattr__(self, '_sockets_key', schemas)
+        object.__setattr__(self, '_inputs', self._merge_sockets(self._inputs, schemas[0], False))
+        object.__setattr__(self, '_outputs', self._merge_sockets(self._outputs, schemas[1], True))
+
+    def _merge_sockets(self, existing, schemas, is_output):
+        # Keep the sockets that are still present so existing links and values are preserved.
+        by_identifier = { socket.identifier: socket for socket in existing }
+        sockets = GraphSockets()
+        for schema in schemas:
+            socket = by_identifier.pop(schema['identifier'], None)
+            if socket is None:
+                socket = _socket_class(schema['idname'])(self, schema, is_output)
+            else:
+                if type(socket).__name__ != schema['idname']:
+                    socket.__class__ = _socket_class(schema['idname'])
+                    socket._default = _from_json(schema['default']) if 'default' in schema else _no_value
+                socket._update(schema)
+            sockets.append(socket)
+        for socket in by_identifier.values():
+            for link in socket.links:
+                self.graph.links.remove(link)
+        return sockets
+
+    @property
+    def inputs(self):
+        self._refresh()
+        return self._inputs
+
+    @property
+    def outputs(self):
+        self._refresh()
+        return self._outputs
+
+class GraphNodes:
+    def __init__(self, graph):
+        self._graph = graph
+        self._nodes = {}
+        self._name_counts = {}
+
+    def __iter__(self):
+        return iter(list(self._nodes.values()))
+
+    def __len__(self):
+        return len(self._nodes)
+
+    def __contains__(self, name):
+        return name in self._nodes
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self._nodes[key]
+        return list(self._nodes.values())[key]
+
+    def get(self, name, default=None):
+        return self._nodes.get(name, default)
+
+    def new(self, type):
+        try:
+            schema = node_schema(type)
+        except (AttributeError, KeyError):
+            schema = {}
+        if 'inputs' not in schema:
+            raise RuntimeError(f"Error: Node type {type} undefined")
+        node = GraphNode(self._graph, type, self._unique_name(schema['name']))
+        self._nodes[node.name] = node
+        return node
+
+    def _unique_name(self, base):
+        count = self._name_counts.get(base, 0)
+        name = base
+        while name in self._nodes:
+            count += 1
+            name = f"{base}.{count:03}"
+        self._name_counts[base] = count
+        return name
+
+    def _rename(self, node, name):
+        del self._nodes[node.name]
+        name = self._unique_name(name)
+        self._nodes[name] = node
+        return name
+
+    def remove(self, node):
+        for socket in [*node._inputs, *node._outputs]:
+            for link in socket.links:
+                self._graph.links.remove(link)
+        for other in self._nodes.values():
+            if other.paired_output is node:
+                other.paired_output = None
+        del self._nodes[node.name]
+
+class GraphLink:
+    def __init__(self, from_socket, to_socket):
+        self.from_socket = from_socket
+        self.to_socket = to_socket
+        self.is_valid = True
+        self.is_muted = False
+
+    @property
+    def from_node(self):
+        return self.from_socket.node
+
+    @property
+    def to_node(self):
+        return self.to_socket.node
+
+class GraphLinks:
+    def __init__(self):
+        self._links = {}
+
+    def __iter__(self):
+        return iter(list(self._links))
+
+    def __len__(self):
+        return len(self._links)
+
+    def new(self, input, output, verify_limits=True):
+        from_socket, to_socket = (input, output) if input.is_output else (output, input)
+        if not to_socket.is_multi_input:
+            for link in to_socket.links:
+                self.remove(link)
+        link = GraphLink(from_socket, to_socket)
+        from_socket._links.append(link)
+        to_socket._links.append(link)
+        self._links[link] = None
+        return link
+
+    def remove(self, link):
+        link.from_socket._links.remove(link)
+        link.to_socket._links.remove(link)
+        del self._links[link]
+
+class GraphInterfaceSocket:
+    def __init__(self, identifier, in_out, socket_type, name):
+        self.item_type = 'SOCKET'
+        self.identifier = identifier
+        self.in_out = in_out
+        self.bl_socket_idname = socket_type
+        self.socket_type = socket_type
+        self.name = name
+        self.description = ''
+        default = interface_socket_default(socket_type) if in_out == 'INPUT' else None
+        self._default = _no_value if default is None else _from_json(default)
+
+    @property
+    def default_value(self):
+        if self._default is _no_value:
+            raise AttributeError(f"'{self.bl_socket_idname}' interface socket has no attribute 'default_value'")
+        return self._default
+
+    @default_value.setter
+    def default_value(self, value):
+        if self._default is _no_value:
+            raise AttributeError(f"'{self.bl_socket_idname}' interface socket has no attribute 'default_value'")
+        self._default = _coerce(self._default, value)
+
+class GraphInterfaceSockets:
+    # The inputs or outputs of a `Graph` in the style of Blender 3's `NodeTree.inputs` and `NodeTree.outputs`.
+    def __init__(self, interface, in_out):
+        self._interface = interface
+        self._in_out = in_out
+
+    def _sockets(self):
+        return [item for item in self._interface.items_tree if item.in_out == self._in_out]
+
+    def __iter__(self):
+        return iter(self._sockets())
+
+    def __len__(self):
+        return len(self._sockets())
+
+    def __getitem__(self, i):
+        return self._sockets()[i]
+
+    def new(self, type, name):
+        return self._interface.new_socket(name, in_out=self._in_out, socket_type=type)
+
+    def remove(self, socket):
+        self._interface.remove(socket)
+
+class GraphInterface:
+    def __init__(self):
+        self.items_tree = []
+        self._identifiers = 0
+
+    def new_socket(self, name, description='', in_out='INPUT', socket_type='NodeSocketFloat', parent=None):
+        socket = GraphInterfaceSocket(f"Socket_{self._identifiers}", in_out, socket_type, name)
+        socket.description = description
+        self._identifiers += 1
+        self.items_tree.append(socket)
+        return socket
+
+    def remove(self, item):
+        self.items_tree.remove(item)
+
+    def _group_node_sockets(self):
+        # A group node takes the interface inputs and outputs the interface outputs.
+        def socket(item):
+            schema = {
+                'name': item.name,
+                'identifier': item.identifier,
+                'type': socket_type_of(item.bl_socket_idname),
+                'idname': item.bl_socket_idname,
+                'is_multi_input': False,
+                'hide_value': False,
+                'enabled': True,
+            }
+            if item._default is not _no_value:
+                schema['default'] = item._default
+            return schema
+        return (
+            [socket(item) for item in self.items_tree if item.in_out == 'INPUT'],
+            [socket(item) for item in self.items_tree if item.in_out == 'OUTPUT'],
+        )
+
+    def _node_sockets(self, is_group_input):
+        # The Group Input node outputs the interface inputs, and the Group Output node takes the interface outputs.
+        sockets = [
+            {
+                'name': item.name,
+                'identifier': item.identifier,
+                'type': socket_type_of(item.bl_socket_idname),
+                'idname': item.bl_socket_idname,
+                'is_multi_input': False,
+                'hide_value': False,
+                'enabled': True,
+            }
+            for item in self.items_tree if item.in_out == ('INPUT' if is_group_input else 'OUTPUT')
+        ]
+        sockets.append({ 'name': '', 'identifier': '__extend__', 'type': 'CUSTOM', 'idname': 'NodeSocketVirtual', 'is_multi_input': False, 'hide_value': False, 'enabled': True })
+        key = tuple((s['identifier'], s['idname'], s['name']) for s in sockets)
+        if key not in _probes:
+            _probes[key] = ([], sockets) if is_group_input else (sockets, [])
+        return _probes[key]
+
+class GraphDriver:
+    def __init__(self):
+        self.type = 'SCRIPTED'
+        self.expression = ''
+
+class GraphFCurve:
+    def __init__(self, data_path):
+        self.data_path = data_path
+        self.driver = GraphDriver()
+
+class GraphAnimationData:
+    def __init__(self):
+        self.drivers = []
+
+class Graph:
+    """
+    A node tree recorded in memory while a tree function runs.
+
+    It stands in for a `bpy.types.GeometryNodeTree`, so builders, optimization passes and `reconcile` work on it unchanged.
+    The recorded graph is materialized into a real node group in a single pass with `reconcile(node_group, graph)`.
+    Sockets are looked up from the node schema, and probed once per configuration for nodes whose settings change them.
+    """
+
+    bl_idname = 'GeometryNodeTree'
+
+    def __init__(self, name):
+        self.name = name
+        self.nodes = GraphNodes(self)
+        self.links = GraphLinks()
+        self.interface = GraphInterface()
+        self.inputs = GraphInterfaceSockets(self.interface, 'INPUT')
+        self.outputs = GraphInterfaceSockets(self.interface, 'OUTPUT')
+        self.animation_data = None
+        self.is_modifier = False
+        self._id_properties = {}
+
+    def __repr__(self):
+        return f"<Graph '{self.name}' nodes: {len(self.nodes)}, links: {len(self.links)}>"
+
+    # Custom properties, like those of a `bpy.types.ID`.
+    def __getitem__(self, key):
+        return self._id_properties[key]
+
+    def __setitem__(self, key, value):
+        self._id_properties[key] = value
+
+    def __delitem__(self, key):
+        del self._id_properties[key]
+
+    def __contains__(self, key):
+        return key in self._id_properties
+
+    def get(self, key, default=None):
+        return self._id_properties.get(key, default)
+
+    def driver_add(self, data_path, index=-1):
+        return self._driver_add(data_path)
+
+    def _driver_add(self, data_path):
+        if self.animation_data is None:
+            self.animation_data = GraphAnimationData()
+        for fcurve in self.animation_data.drivers:
+            if fcurve.data_path == data_path:
+                return fcurve
+        fcurve = GraphFCurve(data_path)
+        self.animation_data.drivers.append(fcurve)
+        return fcurve
@@ -0,0 +1,36 @@
+import bpy
+
+IS_BLENDER_4 = bpy.app.version[0] >= 4
+
+def get_node_inputs(x):
+    if IS_BLENDER_4:
+        return [i for i in x.interface.items_tree if i.item_type == 'SOCKET' and i.in_out == 'INPUT']
+    else:
+        return x.inputs
+def get_node_outputs(x):
+    if IS_BLENDER_4:
+        return [i for i in x.interface.items_tree if i.item_type == 'SOCKET' and i.in_out == 'OUTPUT']
+    else:
+        return x.outputs
+
+def new_node_input(x, socket_type, name):
+    if IS_BLENDER_4:
+        return x.interface.new_socket(socket_type=socket_type, name=name, in_out='INPUT')
+    else:
+        return x.inputs.new(socket_type, name)
+def new_node_output(x, socket_type, name):
+    if IS_BLENDER_4:
+        return x.interface.new_socket(socket_type=socket_type, name=name, in_out='OUTPUT')
+    else:
+        return x.outputs.new(socket_type, name)
+
+def remove_node_input(x, socket):
+    if IS_BLENDER_4:
+        x.interface.remove(socket)
+    else:
+        x.inputs.remove(socket)
+def remove_node_output(x, socket):
+    if IS_BLENDER_4:
+        x.interface.remove(socket)
+    else:
+        x.outputs.remove(socket)
@@ -3,10 +3,15 @@ import itertools
 import enum
 import re
 import os
+import json
+import hashlib
+import ast
 from .state import State
 from .types import *
 from .static.input_group import InputGroup
 from .static.curve import Curve
+from .schema import node_schemas, node_schema, node_properties
+from .cse import node_key, lookup, store
 from ..absolute_path import absolute_path
 
 class OutputsList(dict):
@@ -29,6 +34,73 @@ def set_or_create_link(x, node_input):
             except:
                 link_constant()
 
+_property_bindings = {}
+def property_bindings(node_type_name):
+    """
+    The argument name and identifier of each property on a node type, including inherited ones.
+    """
+    if node_type_name not in _property_bindings:
+        _property_bindings[node_type_name] = [
+            (prop['identifier'].lower().replace(' ', '_'), prop['identifier'])
+            for prop in node_properties(node_type_name, include_parent=True)
+        ]
+    return _property_bindings[node_type_name]
+
+_dynamic_sockets = {}
+def has_dynamic_sockets(node_type_name):
+    """
+    Whether the sockets of a node type depend on more than its own settings, such as the node tree of a group node or the items of a zone.
+    """
+    if node_type_name not in _dynamic_sockets:
+        _dynamic_sockets[node_type_name] = any(
+            prop['type'] == 'COLLECTION' or (prop['type'] == 'POINTER' and not prop['is_readonly'])
+            for prop in node_properties(node_type_name)
+        )
+    return _dynamic_sockets[node_type_name]
+
+class BindingPlan:
+    """
+    How the arguments of a node function bind to the sockets of a node in a particular configuration.
+
+    `inputs` is a list of `(argname, is_multi_input, socket_indices)`, one entry per group of same-named inputs
+    with at least one enabled socket. `outputs` maps the name of each enabled output to its index.
+    """
+
+    def __init__(self, node, skip_first_input):
+        groups = {}
+        for i, node_input in enumerate(node.inputs):
+            if skip_first_input and i == 0:
+                continue
+            groups.setdefault((node_input.name.lower().replace(' ', '_'), node_input.type), []).append(i)
+        self.inputs = []
+        bound = set()
+        for i, node_input in enumerate(node.inputs):
+            if (skip_first_input and i == 0) or not node_input.enabled:
+                continue
+            group = (node_input.name.lower().replace(' ', '_'), node_input.type)
+            if group not in bound:
+                bound.add(group)
+                self.inputs.append((group[0], node_input.is_multi_input, groups[group]))
+        self.outputs = {}
+        for i, node_output in enumerate(node.outputs):
+            if node_output.enabled:
+                self.outputs[node_output.name.lower().replace(' ', '_')] = i
+
+_binding_plans = {}
+def binding_plan(node, skip_first_input, configuration):
+    """
+    Get the `BindingPlan` for a node, compiling it from the node the first time a configuration is seen.
+
+    `configuration` is a tuple of the `(identifier, value)` pairs of the properties set on the node,
+    which determine the sockets that are enabled.
+    """
+    if has_dynamic_sockets(node.bl_idname):
+        return BindingPlan(node, skip_first_input)
+    key = (node.bl_idname, skip_first_input, configuration)
+    if key not in _binding_plans:
+        _binding_plans[key] = BindingPlan(node, skip_first_input)
+    return _binding_plans[key]
+
 def build_node(node_type):
     def build(_primary_arg=None, **kwargs):
         for k, v in kwargs.copy().items():
@@ -37,36 +109,38 @@ def build_node(node_type):
                 del kwargs[k]
             if v is None:
                 del kwargs[k]
+        # Reuse an identical pure node if common subexpression elimination is enabled.
+        cse_key = node_key(node_type.__name__, _primary_arg, **kwargs)
+        if lookup(cse_key) is not None:
+            result = lookup(cse_key)
+            return OutputsList(result) if isinstance(result, OutputsList) else result
         node = State.current_node_tree.nodes.new(node_type.__name__)
         if _primary_arg is not None:
             State.current_node_tree.links.new(_primary_arg._socket, node.inputs[0])
-        for prop in node.bl_rna.properties:
-            argname = prop.identifier.lower().replace(' ', '_')
+        configuration = []
+        for argname, identifier in property_bindings(node_type.__name__):
             if argname in kwargs:
                 value = kwargs[argname]
                 if isinstance(value, list) and len(value) > 0 and isinstance(value[0], Curve):
                     for i, curve in enumerate(value):
-                        curve.apply(getattr(node, prop.identifier).curves[i])
+                        curve.apply(getattr(node, identifier).curves[i])
                     continue
                 if isinstance(value, Curve):
-                    value.apply(getattr(node, prop.identifier).curves[0])
+                    value.apply(getattr(node, identifier).curves[0])
                     continue
                 if isinstance(value, enum.Enum):
                     value = value.value
-                setattr(node, prop.identifier, value)
-        for node_input in (node.inputs[1:] if _primary_arg is not None else node.inputs):
-            if not node_input.enabled:
-                continue
-            argname = node_input.name.lower().replace(' ', '_')
-            all_with_name = []
-            for node_input2 in (node.inputs[1:] if _primary_arg is not None else node.inputs):
-                if node_input2.name.lower().replace(' ', '_') == argname and node_input2.type == node_input.type:
-                    all_with_name.append(node_input2)
+                setattr(node, identifier, value)
+                if isinstance(value, (str, int, float, bool)):
+                    configuration.append((identifier, value))
+        plan = binding_plan(node, _primary_arg is not None, tuple(configuration))
+        for argname, is_multi_input, socket_indices in plan.inputs:
             if argname in kwargs:
                 value = kwargs[argname]
+                all_with_name = [node.inputs[i] for i in socket_indices]
                 if isinstance(value, enum.Enum):
                     value = value.value
-                if node_input.is_multi_input and hasattr(value, '__iter__') and len(value) > 0 and issubclass(type(next(iter(value))), Type):
+                if is_multi_input and hasattr(value, '__iter__') and len(value) > 0 and issubclass(type(next(iter(value))), Type):
                     for x in value:
                         for node_input in all_with_name:
                             State.current_node_tree.links.new(x._socket, node_input)
@@ -76,26 +150,87 @@ def build_node(node_type):
                 else:
                     for node_input in all_with_name:
                         set_or_create_link(value, node_input)
-        outputs = {}
-        for node_output in node.outputs:
-            if not node_output.enabled:
-                continue
-            outputs[node_output.name.lower().replace(' ', '_')] = Type(node_output)
+        outputs = { argname: Type(node.outputs[i]) for argname, i in plan.outputs.items() }
         if len(outputs) == 1:
-            return list(outputs.values())[0]
+            return store(cse_key, list(outputs.values())[0])
         else:
-            return OutputsList(outputs)
+            return OutputsList(store(cse_key, OutputsList(outputs)))
     return build
 
 documentation = {}
 registered_nodes = set()
+
+def _snake_case_name(node_name):
+    return node_name.lower().replace(' ', '_')
+
+def _namespace_name(snake_case_name):
+    return snake_case_name.replace('_', ' ').title().replace(' ', '')
+
+def _enum_properties(node_type_name):
+    return [prop for prop in node_properties(node_type_name) if prop['type'] == 'ENUM']
+
+def _register_enums(namespace, node_type_name):
+    for prop in _enum_properties(node_type_name):
+        enum_type_name = prop['identifier'].replace('_', ' ').title().replace(' ', '')
+        enum_type = enum.Enum(enum_type_name, { map_case_name(i): i for i in prop['enum_items'] })
+        setattr(namespace, enum_type_name, enum_type)
+
+class _NodeNamespaceMeta(type):
+    """
+    Builds the enum types of a node namespace (such as `DeleteGeometry.Domain`) on first access.
+    """
+    def __getattr__(cls, name):
+        if name.startswith('__') or len(cls._pending_node_types) == 0:
+            raise AttributeError(f"type object '{cls.__name__}' has no attribute '{name}'")
+        pending_node_types = cls._pending_node_types
+        cls._pending_node_types = []
+        for node_type_name in pending_node_types:
+            _register_enums(cls, node_type_name)
+        return getattr(cls, name)
+
+def _add_to_namespace(node_namespace_name, node_type_name):
+    if node_namespace_name not in globals():
+        globals()[node_namespace_name] = _NodeNamespaceMeta(node_namespace_name, (), { '_pending_node_types': [], '_node_types': set() })
+    namespace = globals()[node_namespace_name]
+    if not isinstance(namespace, _NodeNamespaceMeta):
+        _register_enums(namespace, node_type_name)
+    elif node_type_name not in namespace._node_types:
+        namespace._node_types.add(node_type_name)
+        namespace._pending_node_types.append(node_type_name)
+
+# Keywords in a node type name and the category of the Blender manual they belong to, checked in order.
+category_keywords = [
+    ('Curve', 'curve'),
+    ('Spline', 'curve'),
+    ('Mesh', 'mesh'),
+    ('Point', 'point'),
+    ('Instance', 'instances'),
+    ('Volume', 'volume'),
+    ('Material', 'material'),
+    ('Tex', 'texture'),
+    ('String', 'utilities/text'),
+    ('Attribute', 'attribute'),
+    ('Sample', 'geometry/sample'),
+    ('Input', 'input'),
+    ('Simulation', 'simulation'),
+]
+
+def _category_path(node_type):
+    name = node_type.__name__
+    for keyword, category_path in category_keywords:
+        if keyword in name:
+            return category_path
+    return 'geometry' if name.startswith('GeometryNode') else 'utilities'
+
 def register_node(node_type, category_path=None):
     if node_type in registered_nodes:
         return
-    snake_case_name = node_type.bl_rna.name.lower().replace(' ', '_')
-    node_namespace_name = snake_case_name.replace('_', ' ').title().replace(' ', '')
+    snake_case_name = _snake_case_name(node_type.bl_rna.name)
+    node_namespace_name = _namespace_name(snake_case_name)
     globals()[snake_case_name] = build_node(node_type)
-    globals()[snake_case_name].bl_category_path = category_path
+    # Named like the function, so it is fingerprinted the same as the `LazyNodeFunction` that stood in for it.
+    globals()[snake_case_name].__qualname__ = snake_case_name
+    globals()[snake_case_name].bl_category_path = category_path or _category_path(node_type)
     globals()[snake_case_name].bl_node_type = node_type
     documentation[snake_case_name] = globals()[snake_case_name]
     def build_node_method(node_type):
@@ -103,32 +238,93 @@ def register_node(node_type, category_path=None):
             return build_node(node_type)(self, *args, **kwargs)
         return build
     setattr(Type, snake_case_name, build_node_method(node_type))
-    parent_props = [prop.identifier for base in node_type.__bases__ for prop in base.bl_rna.properties]
-    for prop in node_type.bl_rna.properties:
-        if not prop.identifier in parent_props and prop.type == 'ENUM':
-            if node_namespace_name not in globals():
-                class NodeNamespace: pass
-                NodeNamespace.__name__ = node_namespace_name
-                globals()[node_namespace_name] = NodeNamespace
-            enum_type_name = prop.identifier.replace('_', ' ').title().replace(' ', '')
-            enum_type = enum.Enum(enum_type_name, { map_case_name(i): i.identifier for i in prop.enum_items })
-            setattr(globals()[node_namespace_name], enum_type_name, enum_type)
+    if node_type.__name__ in node_index()[2]:
+        _add_to_namespace(node_namespace_name, node_type.__name__)
     registered_nodes.add(node_type)
 
-denylist = {'filter'} # some nodes should be excluded.
-class_denylist = {'CompositorNodeMath', 'TextureNodeMath'}
-node_types_to_register = []
-for node_type_name in dir(bpy.types):
-    node_type = getattr(bpy.types, node_type_name)
-    if isinstance(node_type, type) and issubclass(node_type, bpy.types.Node):
-        if node_type.is_registered_node_type() and node_type.bl_rna.name.lower() not in denylist and node_type.__name__ not in class_denylist:
-            node_types_to_register.append(node_type)
-node_types_to_register.sort(key=lambda node_type: node_type.__name__.startswith("GeometryNode"))
-for node_type in node_types_to_register:
-    register_node(node_type)
+_node_index = None
+def node_index():
+    """
+    The names of the node types behind each node function and enum namespace name, in registration order.
+
+    Returns a tuple of `(functions, namespaces, enum_node_types)`. Built once on first use from the cached node schema.
+    """
+    global _node_index
+    if _node_index is None:
+        functions = {}
+        namespaces = {}
+        enum_node_types = set()
+        for node_type_name, schema in node_schemas().items():
+            snake_case_name = _snake_case_name(schema['name'])
+            functions.setdefault(snake_case_name, []).append(node_type_name)
+            if any(prop['type'] == 'ENUM' for prop in schema['properties']):
+                namespaces.setdefault(_namespace_name(snake_case_name), []).append(node_type_name)
+                enum_node_types.add(node_type_name)
+        _node_index = (functions, namespaces, enum_node_types)
+    return _node_index
+
+def lazy_names():
+    """
+    The names of every node function and enum namespace, whether or not they have been registered yet.
+    """
+    functions, namespaces, _ = node_index()
+    return [*functions.keys(), *namespaces.keys()]
+
+def __getattr__(name):
+    # Node functions and enum namespaces are registered on first access.
+    if not name.startswith('__'):
+        functions, namespaces, _ = node_index()
+        if name in functions:
+            for node_type_name in functions[name]:
+                register_node(getattr(bpy.types, node_type_name))
+            return globals()[name]
+        if name in namespaces:
+            for node_type_name in namespaces[name]:
+                _add_to_namespace(name, node_type_name)
+            return globals()[name]
+    raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
+
+class LazyNodeFunction:
+    """
+    Stands in for a node function that hasn't been registered yet, and registers it when it is first called.
+
+    `from geometry_script import *` binds these, so a script only registers the node functions it calls.
+    """
+    __slots__ = ('_name',)
+
+    def __init__(self, name):
+        self._name = name
+
+    def _function(self):
+        function = globals().get(self._name)
+        return function if function is not None else __getattr__(self._name)
+
+    def __call__(self, *args, **kwargs):
+        return self._function()(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._function(), name)
+
+    def __repr__(self):
+        return f"<node function '{self._name}'>"
+
+def lazy_attribute(name):
+    """
+    A node function, or a `LazyNodeFunction` for one that hasn't been registered yet. Other names are resolved by `__getattr__`.
+    """
+    if name in globals():
+        return globals()[name]
+    if name in node_index()[0]:
+        return LazyNodeFunction(name)
+    return __getattr__(name)
+
+def register_all_nodes():
+    for name in lazy_names():
+        if name not in globals():
+            __getattr__(name)
 
 def create_documentation():
-    temp_node_group = bpy.data.node_groups.new('temp_node_group', 'GeometryNodeTree')
+    register_all_nodes()
     color_mappings = {
         'INT': '#598C5C',
         'FLOAT': '#A1A1A1',
@@ -147,38 +343,42 @@ def create_documentation():
     docstrings = []
     symbols = []
     enums = {}
+    # The typeshed module each node function and enum namespace is written to.
+    modules = {}
     skipped_nodes = []
     for func in sorted(documentation.keys()):
         try:
             method = documentation[func]
+            module = method.bl_category_path.replace('/', '_')
+            modules[func.replace('_', ' ').title().replace(' ', '')] = module
             link = f"https://docs.blender.org/manual/en/latest/modeling/geometry_nodes/{method.bl_category_path}/{func}.html"
             image = f"https://docs.blender.org/manual/en/latest/_images/node-types_{method.bl_node_type.__name__}"
-            node_instance = temp_node_group.nodes.new(method.bl_node_type.__name__)
+            schema = node_schema(method.bl_node_type.__name__)
+            if 'inputs' not in schema:
+                raise Exception(f"'{method.bl_node_type.__name__}' is not available in geometry node trees.")
             props_inputs = {}
             symbol_inputs = {}
-            parent_props = [prop.identifier for base in method.bl_node_type.__bases__ for prop in base.bl_rna.properties]
             node_namespace_name = func.replace('_', ' ').title().replace(' ', '')
-            for prop in method.bl_node_type.bl_rna.properties:
-                if not prop.identifier in parent_props:
-                    if prop.type == 'ENUM':
-                        enum_name = prop.identifier.replace('_', ' ').title().replace(' ', '')
-                        enum_cases = '\n    '.join(map(lambda i: f"{map_case_name(i)} = '{i.identifier}'", prop.enum_items))
-                        if node_namespace_name not in enums:
-                            enums[node_namespace_name] = []
-                        enums[node_namespace_name].append(f"""  class {enum_name}(enum.Enum):
+            for prop in schema['properties']:
+                if prop['type'] == 'ENUM':
+                    enum_name = prop['identifier'].replace('_', ' ').title().replace(' ', '')
+                    enum_cases = '\n    '.join(map(lambda i: f"{map_case_name(i)} = '{i}'", prop['enum_items']))
+                    if node_namespace_name not in enums:
+                        enums[node_namespace_name] = []
+                    enums[node_namespace_name].append(f"""  class {enum_name}(enum.Enum):
     {enum_cases}""")
-                        props_inputs[prop.identifier] = {f"<span style=\"color: {color_mappings['STRING']};\">{node_namespace_name}.{enum_name}</span>":1}
-                        symbol_inputs[prop.identifier] = {f"{node_namespace_name}.{enum_name}": 1}
-                    else:
-                        props_inputs[prop.identifier] = {f"<span style=\"color: {color_mappings.get(prop.type, default_color)};\">{prop.type.title()}</span>":1}
-                        symbol_inputs[prop.identifier] = {prop.type.title(): 1}
+                    props_inputs[prop['identifier']] = {f"<span style=\"color: {color_mappings['STRING']};\">{node_namespace_name}.{enum_name}</span>":1}
+                    symbol_inputs[prop['identifier']] = {f"{node_namespace_name}.{enum_name}": 1}
+                else:
+                    props_inputs[prop['identifier']] = {f"<span style=\"color: {color_mappings.get(prop['type'], default_color)};\">{prop['type'].title()}</span>":1}
+                    symbol_inputs[prop['identifier']] = {prop['type'].title(): 1}
             primary_arg = None
-            for node_input in node_instance.inputs:
-                name = node_input.name.lower().replace(' ', '_')
-                typename = type(node_input).__name__.replace('NodeSocket', '')
-                if node_input.is_multi_input:
+            for node_input in schema['inputs']:
+                name = node_input['argname']
+                typename = node_input['idname'].replace('NodeSocket', '')
+                if node_input['is_multi_input']:
                     typename = f"List[{typename}]"
-                type_str = f"<span style=\"color: {color_mappings.get(node_input.type, default_color)};\">{typename}</span>"
+                type_str = f"<span style=\"color: {color_mappings.get(node_input['type'], default_color)};\">{typename}</span>"
                 if name in props_inputs:
                     if type_str in props_inputs[name]:
                         props_inputs[name][type_str] += 1
@@ -213,10 +413,10 @@ def create_documentation():
                 symbol_args.append(f"{name}: {symbol_inputs[name]} | None = None")
             outputs = {}
             symbol_outputs = {}
-            for node_output in node_instance.outputs:
-                output_name = node_output.name.lower().replace(' ', '_')
-                output_type = type(node_output).__name__.replace('NodeSocket', '')
-                outputs[output_name] = f"<span style=\"color: {color_mappings.get(node_output.type, default_color)};\">{output_type}</span>"
+            for node_output in schema['outputs']:
+                output_name = node_output['argname']
+                output_type = node_output['idname'].replace('NodeSocket', '')
+                outputs[output_name] = f"<span style=\"color: {color_mappings.get(node_output['type'], default_color)};\">{output_type}</span>"
                 symbol_outputs[output_name] = output_type
             output_docs = []
             output_symbols = []
@@ -253,11 +453,11 @@ def create_documentation():
                 enums[node_namespace_name].append(f"""  class Result:
     {output_symbol_separator.join(output_symbols)}""")
             return_type_hint = list(symbol_outputs.values())[0] if len(output_symbols) == 1 else f"{node_namespace_name}.Result"
-            symbols.append(f"""def {func}({', '.join(symbol_args)}) -> {return_type_hint}: \"\"\"![]({image}.webp)\"\"\"""")
+            modules[func] = module
+            symbols.append((func, f"""def {func}({', '.join(symbol_args)}) -> {return_type_hint}: \"\"\"![]({image}.webp)\"\"\""""))
         except:
             skipped_nodes.append(documentation[func].bl_node_type.__name__)
             continue
-    bpy.data.node_groups.remove(temp_node_group)
     html = f"""
     <html>
     <head>
@@ -289,26 +489,46 @@ def create_documentation():
     </body>
     </html>
     """
-    with open(absolute_path('docs/documentation.html'), 'w') as f:
-        f.write(html)
-    with open(absolute_path('typeshed/geometry_script.pyi'), 'w') as fpyi, open(absolute_path('typeshed/geometry_script.py'), 'w') as fpy:
-        newline = '\n'
-        def type_symbol(t):
-            return f"class {t.__name__}(Type): pass"
-        def enum_namespace(k):
-            return f"""class {k}:
-{newline.join(enums[k])}"""
-        def add_self_arg(x):
-            return re.sub('\(', '(self, ', x, 1)
-        contents = f"""from typing import *
+    _write_if_changed(absolute_path('docs/documentation.html'), html)
+    _write_typeshed(symbols, enums, modules)
+
+    if len(skipped_nodes) > 0:
+        pass # This could be reported later.
+
+TYPESHED_PATH = absolute_path('typeshed/geometry_script')
+DOCUMENTATION_STAMP_PATH = absolute_path('cache/documentation_stamp.json')
+DOCUMENTATION_PATHS = [absolute_path('docs/documentation.html'), os.path.join(TYPESHED_PATH, '__init__.pyi')]
+
+def _write_typeshed(symbols, enums, modules):
+    """
+    Write the typeshed as a package with a module per node category, so editors only analyze the categories a script uses.
+
+    `Type` and its subclasses are in `_types`, the node functions as `Type` methods are in `_methods`, and the static API is in `_static`.
+    Every module is written as a `.pyi` stub and a `.py` copy, and only modules whose contents changed are rewritten.
+    """
+    newline = '\n'
+    header = """from __future__ import annotations
+from typing import *
 import enum
+"""
+    categories = sorted(set(modules.values()))
+    category_imports = ''.join(f"    from .{category} import *{newline}" for category in categories)
+    files = {}
+    exports = {}
+
+    type_names = [t.__name__ for t in Type.__subclasses__()]
+    files['_types'] = f"""{header}if TYPE_CHECKING:
+    from ._methods import _NodeMethods
+    from ._static import *
+{category_imports}else:
+    _NodeMethods = object
 def tree(builder):
   \"\"\"
   Marks a function as a node tree.
   \"\"\"
   pass
 _SomeType = TypeVar('_SomeType', bound='Type')
-class Type:
+class Type(_NodeMethods):
   def __add__(self, other) -> Type: return self
   def __radd__(self, other) -> Type: return self
   def __sub__(self, other) -> Type: return self
@@ -330,30 +550,118 @@ class Type:
     self,
     subscript: _SomeType | slice | Tuple[_SomeType | slice, SampleMode]
   ) -> Type: return self
-  x = Type()
-  y = Type()
-  z = Type()
-  def capture(self, attribute: Type, **kwargs) -> (Geometry, Type): return Geometry(), Type()
-  def transfer(self, attribute: Type, **kwargs) -> Type: return Type()
-  {(newline + '  ').join(map(add_self_arg, filter(lambda x: x.startswith('def'), symbols)))}
-  
-{newline.join(map(type_symbol, Type.__subclasses__()))}
-{newline.join(map(enum_namespace, enums.keys()))}
-{newline.join(symbols)}"""
-
-        static_path = absolute_path('api/static')
-        for path in os.listdir(static_path):
-            if os.path.splitext(path)[-1] != '.py':
-                continue
-            with open(os.path.join(static_path, path), 'r') as static_api:
-                contents += f"\n\n# {path}\n{static_api.read()}"
+  x: Type
+  y: Type
+  z: Type
+  def capture(self, attribute: Type, **kwargs) -> Tuple[Geometry, Type]: ...
+  def transfer(self, attribute: Type, **kwargs) -> Type: ...
+{newline.join(f"class {name}(Type): pass" for name in type_names)}
+"""
+    for name in ['tree', 'Type', *type_names]:
+        exports[name] = '_types'
 
-        fpyi.write(contents)
-        fpy.write(contents)
+    def method(symbol):
+        return re.sub(r'\(', '(self, ', symbol, 1)
+    files['_methods'] = f"""{header}if TYPE_CHECKING:
+    from ._types import *
+{category_imports}class _NodeMethods:
+  {(newline + '  ').join(method(symbol) for _, symbol in symbols)}
+"""
 
-    if len(skipped_nodes) > 0:
-        pass # This could be reported later.
+    for category in categories:
+        namespaces = [k for k in enums.keys() if modules.get(k) == category]
+        functions = [(func, symbol) for func, symbol in symbols if modules[func] == category]
+        files[category] = f"""{header}if TYPE_CHECKING:
+    from ._types import *
+    from ._static import *
+{newline.join(f"class {k}:{newline}{newline.join(enums[k])}" for k in namespaces)}
+{newline.join(symbol for _, symbol in functions)}
+"""
+        for name in [*namespaces, *(func for func, _ in functions)]:
+            exports[name] = category
+
+    static = header
+    static_path = absolute_path('api/static')
+    for path in sorted(os.listdir(static_path)):
+        if os.path.splitext(path)[-1] != '.py':
+            continue
+        with open(os.path.join(static_path, path), 'r') as static_api:
+            source = static_api.read()
+        static += f"\n\n# {path}\n{source}"
+        for statement in ast.parse(source).body:
+            if isinstance(statement, (ast.FunctionDef, ast.ClassDef)) and not statement.name.startswith('_'):
+                exports[statement.name] = '_static'
+    files['_static'] = static
+
+    # The stub index re-exports every module, and the runtime index imports a module the first time one of its names is used.
+    files_pyi = { name: contents for name, contents in files.items() }
+    files_pyi['__init__'] = ''.join(f"from .{module} import *{newline}" for module in ['_types', '_static', *categories])
+    files_py = { name: contents for name, contents in files.items() }
+    files_py['__init__'] = f"""import importlib
+_exports = {json.dumps(exports, indent=2, sort_keys=True)}
+__all__ = list(_exports.keys())
+def __getattr__(name):
+  if name in _exports:
+    value = getattr(importlib.import_module(f".{{_exports[name]}}", __name__), name)
+    globals()[name] = value
+    return value
+  raise AttributeError(f"module {{__name__!r}} has no attribute {{name!r}}")
+def __dir__():
+  return __all__
+"""
+
+    written = set()
+    for extension, contents in (('.pyi', files_pyi), ('.py', files_py)):
+        for name, source in contents.items():
+            path = os.path.join(TYPESHED_PATH, name + extension)
+            _write_if_changed(path, source)
+            written.add(path)
+    # Remove categories that no longer exist, and the single-file typeshed written by earlier versions.
+    for path in os.listdir(TYPESHED_PATH):
+        path = os.path.join(TYPESHED_PATH, path)
+        if os.path.splitext(path)[-1] in ('.py', '.pyi') and path not in written:
+            os.remove(path)
+    for path in (absolute_path('typeshed/geometry_script.pyi'), absolute_path('typeshed/geometry_script.py')):
+        if os.path.exists(path):
+            os.remove(path)
+
+def _write_if_changed(path, contents):
+    """
+    Atomically replace a file, unless it already has these contents.
+    """
+    try:
+        with open(path, 'r') as f:
+            if f.read() == contents:
+                return False
+    except OSError:
+        pass
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w') as f:
+        f.write(contents)
+    os.replace(temp_path, path)
+    return True
+
+def _documentation_key():
+    # The generated files depend on the node schema, and on the code that generates them and is copied into the typeshed.
+    import geometry_script
+    h = hashlib.sha1()
+    h.update(json.dumps(node_schemas(), sort_keys=True).encode())
+    static_path = absolute_path('api/static')
+    for path in [__file__, absolute_path('api/types.py'), *(os.path.join(static_path, p) for p in sorted(os.listdir(static_path)) if p.endswith('.py'))]:
+        with open(path, 'rb') as f:
+            h.update(f.read())
+    return { 'blender': list(bpy.app.version), 'addon': list(geometry_script.bl_info['version']), 'schema': h.hexdigest() }
 
 def create_docs():
-    create_documentation()
+    # Only regenerate the documentation and typeshed when they would change.
+    key = _documentation_key()
+    try:
+        with open(DOCUMENTATION_STAMP_PATH, 'r') as f:
+            up_to_date = json.load(f) == key and all(map(os.path.exists, DOCUMENTATION_PATHS))
+    except (OSError, ValueError):
+        up_to_date = False
+    if not up_to_date:
+        create_documentation()
+        _write_if_changed(DOCUMENTATION_STAMP_PATH, json.dumps(key))
 bpy.app.timers.register(create_docs)
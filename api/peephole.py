@@ -0,0 +1,296 @@
+import math
+
+# The rewrite rules to try on each node type, as `(name, rule)` pairs.
+# A rule takes the node tree and a node, rewrites the tree and returns `True` if it applies, otherwise it returns `False`.
+rewrite_rules = {}
+# Rules that can change the result of float math, such as by reassociating it, which are only applied with `fast_math`.
+fast_math_rules = {}
+
+def rewrite_rule(*node_types, fast_math=False):
+    """
+    Register a rewrite rule for nodes of the given types. The rule is named after the function.
+    Pass `fast_math=True` for a rule that can change the result of float math.
+    """
+    rules = fast_math_rules if fast_math else rewrite_rules
+    def register(rule):
+        for node_type in node_types:
+            rules.setdefault(node_type, []).append((rule.__name__, rule))
+        return rule
+    return register
+
+def rewrite(node_tree, fast_math=False):
+    """
+    Apply the rewrite rules, and the fast math rules if `fast_math` is set, until none apply.
+    Returns the number of times each rule was applied, keyed by rule name.
+    """
+    counts = {}
+    changed = True
+    while changed:
+        changed = False
+        for node in node_tree.nodes:
+            rules = rewrite_rules.get(node.bl_idname, [])
+            if fast_math:
+                rules = rules + fast_math_rules.get(node.bl_idname, [])
+            for name, rule in rules:
+                if node.name in node_tree.nodes and node_tree.nodes[node.name] is node and rule(node_tree, node):
+                    counts[name] = counts.get(name, 0) + 1
+                    changed = True
+    return counts
+
+def _source(node_input):
+    """
+    The node linked to an input and the socket it is linked from, or `(None, None)`.
+    """
+    if not node_input.is_linked:
+        return None, None
+    from_socket = node_input.links[0].from_socket
+    return from_socket.node, from_socket
+
+def _only_consumer(node, consumer):
+    """
+    Whether every link from `node` goes into `consumer`, so it can be removed once `consumer` no longer needs it.
+    """
+    links = [link for output in node.outputs for link in output.links]
+    return len(links) > 0 and all(link.to_node is consumer for link in links)
+
+def _constant(node_input):
+    if node_input.is_linked:
+        return None
+    return node_input.default_value
+
+def _copy_input(node_tree, source, target):
+    """
+    Make `target` take the same value as `source`, whether it is linked or not.
+    """
+    if source.is_linked:
+        node_tree.links.new(source.links[0].from_socket, target)
+        return
+    for link in target.links:
+        node_tree.links.remove(link)
+    target.default_value = source.default_value
+
+def _redirect(node_tree, output, socket):
+    """
+    Link everything linked from `output` from `socket` instead.
+    """
+    for link in output.links:
+        node_tree.links.new(socket, link.to_socket)
+
+def _add(a, b):
+    return tuple(x + y for x, y in zip(a, b)) if isinstance(a, tuple) else a + b
+
+def _multiply(a, b):
+    return tuple(x * y for x, y in zip(a, b)) if isinstance(a, tuple) else a * b
+
+_combine_constants = { 'ADD': _add, 'MULTIPLY': _multiply }
+
+# The identifier of the third operand of each math node, which is only used by some operations.
+_third_operands = { 'ShaderNodeMath': 'Value_002', 'ShaderNodeVectorMath': 'Vector_002' }
+
+def _unclamped(node):
+    return not getattr(node, 'use_clamp', False)
+
+@rewrite_rule('ShaderNodeMath', 'ShaderNodeVectorMath')
+def fuse_multiply_add(node_tree, node):
+    """
+    `a * b + c` becomes a single *Multiply Add*.
+    """
+    if node.operation != 'ADD' or not _unclamped(node):
+        return False
+    for i in (0, 1):
+        multiply, _ = _source(node.inputs[i])
+        if (
+            multiply is not None and multiply.bl_idname == node.bl_idname
+            and multiply.operation == 'MULTIPLY' and _unclamped(multiply)
+            and _only_consumer(multiply, node) and _source(node.inputs[1 - i])[0] is not multiply
+        ):
+            third = next(node_input for node_input in node.inputs if node_input.identifier == _third_operands[node.bl_idname])
+            _copy_input(node_tree, node.inputs[1 - i], third)
+            node.operation = 'MULTIPLY_ADD'
+            _copy_input(node_tree, multiply.inputs[0], node.inputs[0])
+            _copy_input(node_tree, multiply.inputs[1], node.inputs[1])
+            node_tree.nodes.remove(multiply)
+            return True
+    return False
+
+@rewrite_rule('ShaderNodeMath', 'ShaderNodeVectorMath', fast_math=True)
+def combine_constant_operands(node_tree, node):
+    """
+    `(x + a) + b` becomes `x + (a + b)` when `a` and `b` are constants, and the same for *Multiply*.
+    This can round differently, and `(x * 1e30) * 1e-30` becomes `x` where it would overflow, so it is a fast math rule.
+    """
+    combine = _combine_constants.get(node.operation)
+    if combine is None or not _unclamped(node):
+        return False
+    for i in (0, 1):
+        inner, _ = _source(node.inputs[i])
+        outer_constant = _constant(node.inputs[1 - i])
+        if (
+            inner is None or outer_constant is None or inner.bl_idname != node.bl_idname
+            or inner.operation != node.operation or not _unclamped(inner) or not _only_consumer(inner, node)
+        ):
+            continue
+        for j in (0, 1):
+            inner_constant = _constant(inner.inputs[1 - j])
+            if inner_constant is not None and inner.inputs[j].is_linked:
+                _copy_input(node_tree, inner.inputs[j], node.inputs[i])
+                node.inputs[1 - i].default_value = combine(inner_constant, outer_constant)
+                node_tree.nodes.remove(inner)
+                return True
+    return False
+
+_inverted_boolean_operations = {
+    'AND': 'NAND',
+    'NAND': 'AND',
+    'OR': 'NOR',
+    'NOR': 'OR',
+    'XOR': 'XNOR',
+    'XNOR': 'XOR',
+    'IMPLY': 'NIMPLY',
+    'NIMPLY': 'IMPLY',
+}
+
+@rewrite_rule('FunctionNodeBooleanMath')
+def fuse_boolean_not(node_tree, node):
+    """
+    `not (a and b)` becomes a single *Nand*, and the same for the other operations with an inverse. `not not x` becomes `x`.
+    """
+    if node.operation != 'NOT':
+        return False
+    inner, _ = _source(node.inputs[0])
+    if inner is None or inner.bl_idname != node.bl_idname or not _only_consumer(inner, node):
+        return False
+    if inner.operation == 'NOT':
+        source_node, source = _source(inner.inputs[0])
+        if source is None:
+            return False
+        _redirect(node_tree, node.outputs[0], source)
+        node_tree.nodes.remove(node)
+        node_tree.nodes.remove(inner)
+        return True
+    if inner.operation not in _inverted_boolean_operations:
+        return False
+    node.operation = _inverted_boolean_operations[inner.operation]
+    _copy_input(node_tree, inner.inputs[0], node.inputs[0])
+    _copy_input(node_tree, inner.inputs[1], node.inputs[1])
+    node_tree.nodes.remove(inner)
+    return True
+
+_inverted_compare_operations = {
+    'LESS_THAN': 'GREATER_EQUAL',
+    'GREATER_EQUAL': 'LESS_THAN',
+    'LESS_EQUAL': 'GREATER_THAN',
+    'GREATER_THAN': 'LESS_EQUAL',
+    'EQUAL': 'NOT_EQUAL',
+    'NOT_EQUAL': 'EQUAL',
+}
+
+@rewrite_rule('FunctionNodeBooleanMath')
+def invert_compare(node_tree, node):
+    """
+    `not (a < b)` becomes `a >= b`.
+    """
+    if node.operation != 'NOT':
+        return False
+    compare, _ = _source(node.inputs[0])
+    if (
+        compare is None or compare.bl_idname != 'FunctionNodeCompare'
+        or compare.data_type not in ('FLOAT', 'INT') or getattr(compare, 'mode', 'ELEMENT') != 'ELEMENT'
+        or compare.operation not in _inverted_compare_operations or not _only_consumer(compare, node)
+    ):
+        return False
+    compare.operation = _inverted_compare_operations[compare.operation]
+    _redirect(node_tree, node.outputs[0], next(output for output in compare.outputs if output.enabled))
+    node_tree.nodes.remove(node)
+    return True
+
+@rewrite_rule('ShaderNodeCombineXYZ')
+def remove_separate_combine(node_tree, node):
+    """
+    `combine_xyz(x=v.x, y=v.y, z=v.z)` becomes `v`.
+    """
+    separate = None
+    for i, node_input in enumerate(node.inputs[:3]):
+        source_node, source = _source(node_input)
+        if source_node is None or source_node.bl_idname != 'ShaderNodeSeparateXYZ' or source is not source_node.outputs[i]:
+            return False
+        if separate is not None and source_node is not separate:
+            return False
+        separate = source_node
+    _, vector = _source(separate.inputs[0])
+    if vector is None:
+        return False
+    _redirect(node_tree, node.outputs[0], vector)
+    node_tree.nodes.remove(node)
+    if not any(output.is_linked for output in separate.outputs):
+        node_tree.nodes.remove(separate)
+    return True
+
+def _rotate(v, euler):
+    # Rotate by an XYZ euler, which applies the X rotation first.
+    x, y, z = v
+    for axis, angle in enumerate(euler):
+        c, s = math.cos(angle), math.sin(angle)
+        if axis == 0:
+            y, z = c * y - s * z, s * y + c * z
+        elif axis == 1:
+            x, z = c * x + s * z, -s * x + c * z
+        else:
+            x, y = c * x - s * y, s * x + c * y
+    return (x, y, z)
+
+def _transform_constants(node):
+    if getattr(node, 'mode', 'COMPONENTS') != 'COMPONENTS':
+        return None
+    values = tuple(_constant(node.inputs[name]) for name in ('Translation', 'Rotation', 'Scale'))
+    return None if any(value is None for value in values) else tuple(tuple(value) for value in values)
+
+@rewrite_rule('GeometryNodeTransform')
+def fuse_transforms(node_tree, node):
+    """
+    Two *Transform Geometry* nodes in a row become one, when the combined transform can be written as a single
+    translation, rotation and scale: when either one only translates, or neither one rotates.
+    """
+    inner, _ = _source(node.inputs['Geometry'])
+    if inner is None or inner.bl_idname != node.bl_idname or not _only_consumer(inner, node):
+        return False
+    outer_constants = _transform_constants(node)
+    inner_constants = _transform_constants(inner)
+    if outer_constants is None or inner_constants is None:
+        return False
+    (t1, r1, s1), (t2, r2, s2) = inner_constants, outer_constants
+    identity_rotation = (0.0, 0.0, 0.0)
+    if r2 == identity_rotation and s2 == (1.0, 1.0, 1.0):
+        transform = (_add(t1, t2), r1, s1)
+    elif r1 == identity_rotation and s1 == (1.0, 1.0, 1.0):
+        transform = (_add(_rotate(_multiply(t1, s2), r2), t2), r2, s2)
+    elif r1 == identity_rotation and r2 == identity_rotation:
+        transform = (_add(_multiply(t1, s2), t2), identity_rotation, _multiply(s1, s2))
+    else:
+        return False
+    _copy_input(node_tree, inner.inputs['Geometry'], node.inputs['Geometry'])
+    for name, value in zip(('Translation', 'Rotation', 'Scale'), transform):
+        node.inputs[name].default_value = value
+    node_tree.nodes.remove(inner)
+    return True
+
+@rewrite_rule('GeometryNodeSetPosition')
+def fuse_set_position_offsets(node_tree, node):
+    """
+    Two *Set Position* nodes in a row that only offset every point by a constant become one.
+    """
+    inner, _ = _source(node.inputs['Geometry'])
+    if inner is None or inner.bl_idname != node.bl_idname or not _only_consumer(inner, node):
+        return False
+    offsets = []
+    for set_position in (inner, node):
+        if (
+            set_position.inputs['Position'].is_linked or _constant(set_position.inputs['Selection']) != True
+            or _constant(set_position.inputs['Offset']) is None
+        ):
+            return False
+        offsets.append(tuple(set_position.inputs['Offset'].default_value))
+    _copy_input(node_tree, inner.inputs['Geometry'], node.inputs['Geometry'])
+    node.inputs['Offset'].default_value = _add(*offsets)
+    node_tree.nodes.remove(inner)
+    return True
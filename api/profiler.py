@@ -0,0 +1,122 @@
+import contextlib
+import json
+import os
+import sys
+import time
+
+# Set to a non-empty value other than `0` to profile every build, regardless of the scene settings.
+PROFILE_ENVIRONMENT_VARIABLE = 'GEOMETRY_SCRIPT_PROFILE'
+
+API_PATH = os.path.dirname(os.path.realpath(__file__))
+ADDON_INIT_PATH = os.path.join(os.path.dirname(API_PATH), '__init__.py')
+
+def profiling_enabled():
+    if os.environ.get(PROFILE_ENVIRONMENT_VARIABLE, '0') not in ('', '0'):
+        return True
+    try:
+        import bpy
+        return bpy.context.scene.geometry_script_settings.profile
+    except AttributeError:
+        return False
+
+class BuildTimer:
+    """
+    Records the wall time spent in each phase of a tree build, in seconds.
+    """
+    def __init__(self):
+        self.phases = {}
+        self.events = []
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+            self.phases[name] = self.phases.get(name, 0) + duration
+            self.events.append((name, start, duration))
+
+    @property
+    def total(self):
+        return sum(self.phases.values())
+
+def _source_line():
+    # The innermost frame outside of Geometry Script is the line in the script that created the node.
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if not filename.startswith(API_PATH) and filename != ADDON_INIT_PATH:
+            return (filename, frame.f_lineno)
+        frame = frame.f_back
+    return None
+
+class BuildProfile(BuildTimer):
+    """
+    A `BuildTimer` that also counts the nodes and links created by the builder, by node type and by the source line that created them.
+    """
+    def __init__(self):
+        super().__init__()
+        self.nodes = {}
+        self.links = {}
+        self.lines = {}
+
+    def instrument(self, node_tree):
+        new_node = node_tree.nodes.new
+        new_link = node_tree.links.new
+        def nodes_new(type):
+            node = new_node(type)
+            self.nodes[type] = self.nodes.get(type, 0) + 1
+            line = _source_line()
+            if line is not None:
+                counts = self.lines.setdefault(line, {})
+                counts[type] = counts.get(type, 0) + 1
+            return node
+        def links_new(input, output, verify_limits=True):
+            link = new_link(input, output, verify_limits)
+            type = link.to_node.bl_idname
+            self.links[type] = self.links.get(type, 0) + 1
+            return link
+        node_tree.nodes.new = nodes_new
+        node_tree.links.new = links_new
+
+    def lines_in(self, filename):
+        """
+        The number of nodes created by each line of a file, keyed by line number.
+        """
+        return { line: sum(counts.values()) for (file, line), counts in self.lines.items() if file == filename }
+
+    def to_dict(self):
+        return {
+            'phases': self.phases,
+            'nodes': self.nodes,
+            'links': self.links,
+            'lines': [{ 'file': file, 'line': line, 'nodes': counts } for (file, line), counts in self.lines.items()],
+        }
+
+def chrome_trace(reports):
+    """
+    Convert build reports to the Chrome trace event format, which can be opened in `chrome://tracing` or Perfetto.
+    """
+    events = []
+    for thread, (name, report) in enumerate(reports.items()):
+        timer = report.get('timer')
+        if timer is None:
+            continue
+        events.append({ 'name': 'thread_name', 'ph': 'M', 'pid': 0, 'tid': thread, 'args': { 'name': name } })
+        if len(timer.events) > 0:
+            start = min(event[1] for event in timer.events)
+            end = max(event[1] + event[2] for event in timer.events)
+            args = { 'cached': report['cached'] }
+            if isinstance(timer, BuildProfile):
+                args.update({ 'nodes': timer.nodes, 'links': timer.links })
+            events.append({ 'name': name, 'cat': 'tree', 'ph': 'X', 'pid': 0, 'tid': thread, 'ts': start * 1e6, 'dur': (end - start) * 1e6, 'args': args })
+        for phase, start, duration in timer.events:
+            events.append({ 'name': phase, 'cat': 'phase', 'ph': 'X', 'pid': 0, 'tid': thread, 'ts': start * 1e6, 'dur': duration * 1e6 })
+    return { 'traceEvents': events, 'displayTimeUnit': 'ms' }
+
+def export_chrome_trace(path, reports=None):
+    if reports is None:
+        from .tree import build_reports as reports
+    with open(path, 'w') as f:
+        json.dump(chrome_trace(reports), f)
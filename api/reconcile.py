@@ -0,0 +1,339 @@
+import re
+from collections import deque
+from .interface import *
+from .schema import node_properties
+
+class ReconcileDiff:
+    """
+    The changes made to a node tree by `reconcile`.
+    """
+
+    def __init__(self):
+        self.nodes_added = 0
+        self.nodes_removed = 0
+        self.nodes_updated = 0
+        self.links_added = 0
+        self.links_removed = 0
+        self.sockets_changed = 0
+        # The name of the target node for each source node, and the names of the nodes that were added.
+        self.node_names = {}
+        self.added_nodes = set()
+
+    @property
+    def size(self):
+        return self.nodes_added + self.nodes_removed + self.nodes_updated + self.links_added + self.links_removed + self.sockets_changed
+
+    def __repr__(self):
+        return f"<ReconcileDiff nodes: +{self.nodes_added} -{self.nodes_removed} ~{self.nodes_updated}, links: +{self.links_added} -{self.links_removed}, sockets: ~{self.sockets_changed}>"
+
+def _value(x):
+    if hasattr(x, '__len__') and not isinstance(x, (str, set)):
+        return tuple(x)
+    return x
+
+def _socket_index(socket):
+    sockets = socket.node.outputs if socket.is_output else socket.node.inputs
+    for i, s in enumerate(sockets):
+        if s == socket:
+            return i
+
+def _link_position(link):
+    # The position of a link among the links into a multi-input socket, which sets the order of the inputs, such as joined geometry.
+    sort_id = getattr(link, 'multi_input_sort_id', None)
+    if sort_id is not None:
+        return sort_id
+    return next(i for i, l in enumerate(link.to_socket.links) if l == link)
+
+def _node_links(node_tree):
+    """
+    The links into each input and out of each output of every node, keyed by node name and socket index.
+    """
+    inputs = { node.name: {} for node in node_tree.nodes }
+    outputs = { node.name: {} for node in node_tree.nodes }
+    for link in node_tree.links:
+        from_index, to_index = _socket_index(link.from_socket), _socket_index(link.to_socket)
+        position = _link_position(link) if link.to_socket.is_multi_input else 0
+        inputs[link.to_node.name].setdefault(to_index, []).append((position, link.from_node.name, from_index))
+        outputs[link.from_node.name].setdefault(from_index, []).append((to_index, link.to_node.name))
+    for sockets in inputs.values():
+        for links in sockets.values():
+            links.sort()
+    return inputs, outputs
+
+def _enum_settings(node):
+    return tuple(getattr(node, prop['identifier']) for prop in _settings_properties(node) if prop['type'] == 'ENUM')
+
+def match_nodes(target, source):
+    """
+    Match the nodes of `source` to nodes of the same type in `target`. Returns the name of the matching target node
+    for each source node that has one.
+
+    Nodes of a type there is only one of are matched first, and the match is spread along the links of matched nodes,
+    first to nodes with the same settings, such as the same operation, then to any node of the same type.
+    This way inserting or removing a node only affects the nodes linked to it.
+    The nodes left over are matched by name, which follows the order nodes of each type were built in, and then by type.
+    """
+    source_nodes = { node.name: node.bl_idname for node in source.nodes }
+    target_nodes = { node.name: node.bl_idname for node in target.nodes }
+    source_settings = { node.name: _enum_settings(node) for node in source.nodes }
+    target_settings = { node.name: _enum_settings(node) for node in target.nodes }
+    source_inputs, source_outputs = _node_links(source)
+    target_inputs, target_outputs = _node_links(target)
+    matches = {}
+    matched = set()
+    pending = deque()
+
+    strict = True
+
+    def match(source_name, target_name):
+        if source_name in matches or target_name in matched or source_nodes[source_name] != target_nodes[target_name]:
+            return
+        if strict and source_settings[source_name] != target_settings[target_name]:
+            return
+        matches[source_name] = target_name
+        matched.add(target_name)
+        pending.append((source_name, target_name))
+
+    def spread():
+        while pending:
+            source_name, target_name = pending.popleft()
+            # Nodes linked into the same input, in the same position and from the same output.
+            target_links = target_inputs[target_name]
+            for index, links in source_inputs[source_name].items():
+                if len(links) == len(target_links.get(index, ())):
+                    for (_, from_name, from_index), (_, target_from_name, target_from_index) in zip(links, target_links[index]):
+                        if from_index == target_from_index:
+                            match(from_name, target_from_name)
+            # Nodes linked from the same output into the same input, if there is only one such node of each type.
+            target_links = target_outputs[target_name]
+            for index, links in source_outputs[source_name].items():
+                candidates = {}
+                for to_index, to_name in links:
+                    candidates.setdefault((to_index, source_nodes[to_name]), []).append(to_name)
+                target_candidates = {}
+                for to_index, to_name in target_links.get(index, ()):
+                    target_candidates.setdefault((to_index, target_nodes[to_name]), []).append(to_name)
+                for key, names in candidates.items():
+                    if len(names) == 1 and len(target_candidates.get(key, ())) == 1:
+                        match(names[0], target_candidates[key][0])
+
+    by_type = {}
+    for name, bl_idname in source_nodes.items():
+        by_type.setdefault(bl_idname, ([], []))[0].append(name)
+    for name, bl_idname in target_nodes.items():
+        by_type.setdefault(bl_idname, ([], []))[1].append(name)
+    for source_names, target_names in by_type.values():
+        if len(source_names) == 1 and len(target_names) == 1:
+            match(source_names[0], target_names[0])
+    spread()
+    strict = False
+    pending.extend(matches.items())
+    spread()
+    for name in source_nodes:
+        if name in target_nodes:
+            match(name, name)
+            spread()
+    for source_names, target_names in by_type.values():
+        target_names = [name for name in target_names if name not in matched]
+        for name in source_names:
+            if name not in matches and len(target_names) > 0:
+                match(name, target_names.pop(0))
+                spread()
+    return matches
+
+_settings_cache = {}
+def _settings_properties(node):
+    if node.bl_idname not in _settings_cache:
+        _settings_cache[node.bl_idname] = [
+            prop for prop in node_properties(node.bl_idname, include_parent=True)
+            if prop['identifier'] == 'label' or prop in node_properties(node.bl_idname)
+        ]
+    return _settings_cache[node.bl_idname]
+
+def _copy_curve_mapping(target, source):
+    changed = False
+    for target_curve, source_curve in zip(target.curves, source.curves):
+        points = [(tuple(p.location), p.handle_type) for p in source_curve.points]
+        if points == [(tuple(p.location), p.handle_type) for p in target_curve.points]:
+            continue
+        changed = True
+        while len(target_curve.points) > len(points):
+            target_curve.points.remove(target_curve.points[-1])
+        for i, (location, handle_type) in enumerate(points):
+            if i < len(target_curve.points):
+                point = target_curve.points[i]
+                point.location = location
+            else:
+                point = target_curve.points.new(*location)
+            point.handle_type = handle_type
+    if changed:
+        target.update()
+    return changed
+
+def _copy_items(target, source):
+    items = [(item.socket_type, item.name) for item in source]
+    if items == [(item.socket_type, item.name) for item in target]:
+        return False
+    target.clear()
+    for socket_type, name in items:
+        target.new(socket_type, name)
+    return True
+
+def _copy_settings(target, source):
+    changed = False
+    for prop in _settings_properties(source):
+        value = getattr(source, prop['identifier'])
+        if prop['type'] == 'COLLECTION':
+            if prop.get('socket_items'):
+                changed = _copy_items(getattr(target, prop['identifier']), value) or changed
+        elif prop['type'] == 'POINTER' and prop['is_readonly']:
+            if hasattr(value, 'curves'):
+                changed = _copy_curve_mapping(getattr(target, prop['identifier']), value) or changed
+        elif not prop['is_readonly'] and _value(getattr(target, prop['identifier'])) != _value(value):
+            setattr(target, prop['identifier'], value)
+            changed = True
+    return changed
+
+def _copy_defaults(target_sockets, source_sockets, linked_only=True):
+    changed = False
+    for target_socket, source_socket in zip(target_sockets, source_sockets):
+        if (linked_only and source_socket.is_linked) or not hasattr(source_socket, 'default_value'):
+            continue
+        if _value(target_socket.default_value) != _value(source_socket.default_value):
+            target_socket.default_value = source_socket.default_value
+            changed = True
+    return changed
+
+def _reconcile_interface(target, source, get_sockets, new_socket, remove_socket, diff):
+    source_sockets = get_sockets(source)
+    target_sockets = get_sockets(target)
+    keep = 0
+    while keep < min(len(source_sockets), len(target_sockets)) and target_sockets[keep].bl_socket_idname == source_sockets[keep].bl_socket_idname:
+        keep += 1
+    for socket in list(target_sockets)[keep:]:
+        remove_socket(target, socket)
+        diff.sockets_changed += 1
+    for socket in list(source_sockets)[keep:]:
+        new_socket(target, socket.bl_socket_idname, socket.name)
+        diff.sockets_changed += 1
+    for target_socket, source_socket in zip(get_sockets(target), source_sockets):
+        if target_socket.name != source_socket.name:
+            target_socket.name = source_socket.name
+            diff.sockets_changed += 1
+    if _copy_defaults(get_sockets(target), source_sockets, linked_only=False):
+        diff.sockets_changed += 1
+
+def _link_keys(node_tree, key_of):
+    return {
+        (key_of[link.from_node.name], _socket_index(link.from_socket), key_of[link.to_node.name], _socket_index(link.to_socket)): link
+        for link in node_tree.links
+    }
+
+def _multi_input_links(node_tree, key_of):
+    # The links into each multi-input socket, in order.
+    sockets = {}
+    for link in node_tree.links:
+        if link.to_socket.is_multi_input:
+            sockets.setdefault((key_of[link.to_node.name], _socket_index(link.to_socket)), []).append(
+                (_link_position(link), key_of[link.from_node.name], _socket_index(link.from_socket))
+            )
+    return { socket: [link[1:] for link in sorted(links)] for socket, links in sockets.items() }
+
+def _reconcile_drivers(target, source, keys):
+    drivers = {}
+    if source.animation_data is not None:
+        for fcurve in source.animation_data.drivers:
+            match = re.match(r'nodes\["(.*?)"\](.*)', fcurve.data_path)
+            if match is not None and match.group(1) in keys:
+                drivers[f'nodes["{keys[match.group(1)]}"]{match.group(2)}'] = fcurve.driver.expression
+    existing = {}
+    if target.animation_data is not None:
+        for fcurve in list(target.animation_data.drivers):
+            if fcurve.data_path in drivers:
+                existing[fcurve.data_path] = fcurve
+            elif fcurve.data_path.startswith('nodes['):
+                target.animation_data.drivers.remove(fcurve)
+    for data_path, expression in drivers.items():
+        fcurve = existing[data_path] if data_path in existing else target.driver_add(data_path)
+        if fcurve.driver.expression != expression:
+            fcurve.driver.expression = expression
+
+def reconcile(target, source):
+    """
+    Update the `target` node tree in place so it matches the `source` node tree.
+
+    Nodes are matched to the existing nodes (see `match_nodes`), so only the nodes, links and
+    interface sockets that actually changed are added, removed or updated.
+    Returns a `ReconcileDiff` describing the changes.
+    """
+    diff = ReconcileDiff()
+
+    # Interface
+    _reconcile_interface(target, source, get_node_inputs, new_node_input, remove_node_input, diff)
+    _reconcile_interface(target, source, get_node_outputs, new_node_output, remove_node_output, diff)
+
+    # Nodes
+    matches = match_nodes(target, source)
+    matched = set(matches.values())
+    for node in list(target.nodes):
+        if node.name not in matched:
+            target.nodes.remove(node)
+            diff.nodes_removed += 1
+    source_nodes = { node.name: node for node in source.nodes }
+    nodes = {}
+    for name, source_node in source_nodes.items():
+        if name in matches:
+            nodes[name] = target.nodes[matches[name]]
+        else:
+            nodes[name] = target.nodes.new(source_node.bl_idname)
+            diff.added_nodes.add(nodes[name].name)
+        diff.node_names[name] = nodes[name].name
+    diff.nodes_added = len(diff.added_nodes)
+    keys = diff.node_names
+
+    # Zones must be paired before their items can be synced.
+    for key, source_node in source_nodes.items():
+        paired_output = getattr(source_node, 'paired_output', None)
+        if paired_output is not None and getattr(nodes[key].paired_output, 'name', None) != keys[paired_output.name]:
+            nodes[key].pair_with_output(nodes[paired_output.name])
+
+    # Settings and unlinked socket values
+    for key, source_node in source_nodes.items():
+        node = nodes[key]
+        changed = _copy_settings(node, source_node)
+        changed = _copy_defaults(node.inputs, source_node.inputs) or changed
+        changed = _copy_defaults(node.outputs, source_node.outputs) or changed
+        if changed and node.name not in diff.added_nodes:
+            diff.nodes_updated += 1
+
+    # Links
+    target_nodes = { node.name: node for node in nodes.values() }
+    names = { name: name for name in target_nodes }
+    source_links = _link_keys(source, keys)
+    target_links = _link_keys(target, names)
+    added = [k for k in source_links if k not in target_links]
+    removed = [k for k in target_links if k not in source_links]
+    # Multi-input sockets whose links changed or were reordered are relinked in order.
+    source_multi_inputs = _multi_input_links(source, keys)
+    target_multi_inputs = _multi_input_links(target, names)
+    dirty_multi_inputs = { (k[2], k[3]) for k in added + removed if k[2] in target_nodes and target_nodes[k[2]].inputs[k[3]].is_multi_input }
+    dirty_multi_inputs.update(
+        socket for socket in source_multi_inputs.keys() | target_multi_inputs.keys()
+        if socket[0] in target_nodes and source_multi_inputs.get(socket) != target_multi_inputs.get(socket)
+    )
+    for k, link in target_links.items():
+        if k not in source_links or (k[2], k[3]) in dirty_multi_inputs:
+            target.links.remove(link)
+            diff.links_removed += 1
+    for k in source_links:
+        if k not in target_links and (k[2], k[3]) not in dirty_multi_inputs:
+            target.links.new(target_nodes[k[0]].outputs[k[1]], target_nodes[k[2]].inputs[k[3]])
+            diff.links_added += 1
+    for to_key, to_index in dirty_multi_inputs:
+        for from_key, from_index in source_multi_inputs.get((to_key, to_index), []):
+            target.links.new(target_nodes[from_key].outputs[from_index], target_nodes[to_key].inputs[to_index])
+            diff.links_added += 1
+
+    _reconcile_drivers(target, source, keys)
+
+    return diff
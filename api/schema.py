@@ -0,0 +1,289 @@
+import bpy
+import json
+import os
+from .interface import new_node_input, remove_node_input
+from ..absolute_path import absolute_path
+
+# Bump when the layout of the cached schema changes.
+SCHEMA_FORMAT = 3
+SCHEMA_CACHE_PATH = os.environ.get('GEOMETRY_SCRIPT_SCHEMA') or absolute_path('cache/node_schema.json')
+
+# Whether `bpy` is the pure-Python stand-in from `headless/`, which can't create real nodes to inspect.
+STAND_IN = getattr(bpy, 'stand_in', False)
+
+denylist = {'filter'} # some nodes should be excluded.
+class_denylist = {'CompositorNodeMath', 'TextureNodeMath'}
+
+_schema = None
+_schema_complete = False
+_schema_modified = False
+
+def _node_types_to_register():
+    node_types_to_register = []
+    for node_type_name in dir(bpy.types):
+        node_type = getattr(bpy.types, node_type_name)
+        if isinstance(node_type, type) and issubclass(node_type, bpy.types.Node):
+            if node_type.is_registered_node_type() and node_type.bl_rna.name.lower() not in denylist and node_type.__name__ not in class_denylist:
+                node_types_to_register.append(node_type)
+    node_types_to_register.sort(key=lambda node_type: node_type.__name__.startswith("GeometryNode"))
+    return node_types_to_register
+
+def _cache_key():
+    import geometry_script
+    return { 'format': SCHEMA_FORMAT, 'blender': list(bpy.app.version), 'addon': list(geometry_script.bl_info['version']) }
+
+def _json_value(x):
+    if x is None or isinstance(x, (bool, int, float, str)):
+        return x
+    try:
+        return [_json_value(i) for i in x]
+    except TypeError:
+        return None
+
+def _property_schema(prop):
+    schema = { 'identifier': prop.identifier, 'type': prop.type, 'is_readonly': prop.is_readonly }
+    if prop.type == 'ENUM':
+        schema['enum_items'] = [i.identifier for i in prop.enum_items]
+        schema['is_enum_flag'] = prop.is_enum_flag
+    elif prop.type in {'POINTER', 'COLLECTION'}:
+        schema['fixed_type'] = prop.fixed_type.identifier
+        if prop.type == 'COLLECTION':
+            # Items that create sockets, such as the state items of a zone.
+            schema['socket_items'] = prop.fixed_type.properties.get('socket_type') is not None
+    return schema
+
+def _socket_schema(socket):
+    schema = {
+        'name': socket.name,
+        'identifier': socket.identifier,
+        'argname': socket.name.lower().replace(' ', '_'),
+        'type': socket.type,
+        'idname': type(socket).__name__,
+        'is_multi_input': socket.is_multi_input,
+        'hide_value': socket.hide_value,
+        'enabled': socket.enabled,
+    }
+    if hasattr(socket, 'default_value'):
+        schema['default'] = _json_value(socket.default_value)
+    return schema
+
+def _item_args(item):
+    # The arguments that recreate a collection item with `new(*args)`.
+    return [x for x in (getattr(item, 'socket_type', None), getattr(item, 'name', None)) if x is not None]
+
+def _node_defaults(node, properties):
+    # The initial value of each setting of a new node, its collection items and the points of its curves.
+    defaults = { 'label': node.label }
+    items = {}
+    curves = {}
+    for prop in properties:
+        value = getattr(node, prop['identifier'])
+        if prop['type'] == 'COLLECTION':
+            items[prop['identifier']] = [_item_args(item) for item in value]
+        elif prop['type'] == 'POINTER':
+            if prop['is_readonly'] and hasattr(value, 'curves'):
+                curves[prop['identifier']] = [[[*p.location, p.handle_type] for p in curve.points] for curve in value.curves]
+        else:
+            defaults[prop['identifier']] = _json_value(value)
+    return defaults, items, curves
+
+def _node_schema(node_type, node, bases):
+    for base in node_type.__bases__:
+        if base.__name__ not in bases:
+            bases[base.__name__] = [_property_schema(prop) for prop in base.bl_rna.properties]
+    parent_props = { prop['identifier'] for base in node_type.__bases__ for prop in bases[base.__name__] }
+    schema = {
+        'name': node_type.bl_rna.name,
+        'bases': [base.__name__ for base in node_type.__bases__],
+        'properties': [_property_schema(prop) for prop in node_type.bl_rna.properties if prop.identifier not in parent_props],
+    }
+    if node is not None:
+        schema['inputs'] = [_socket_schema(socket) for socket in node.inputs]
+        schema['outputs'] = [_socket_schema(socket) for socket in node.outputs]
+        schema['width'] = node.width
+        schema['defaults'], schema['items'], schema['curves'] = _node_defaults(node, schema['properties'])
+    return schema
+
+def _build_schema(node_types, record_interface=True):
+    """
+    Record the schema of each node type, instantiating the nodes in a temporary tree to read their sockets.
+
+    Returns the schema and whether socket information could be recorded for it.
+    """
+    bases = {}
+    nodes = {}
+    interface = {}
+    try:
+        temp_node_group = bpy.data.node_groups.new('.geometry_script_schema', 'GeometryNodeTree')
+    except AttributeError:
+        # `bpy.data` is restricted while add-ons are being registered.
+        temp_node_group = None
+    try:
+        for node_type in node_types:
+            node = None
+            if temp_node_group is not None:
+                try:
+                    node = temp_node_group.nodes.new(node_type.__name__)
+                except RuntimeError:
+                    pass # not available in geometry node trees
+            nodes[node_type.__name__] = _node_schema(node_type, node, bases)
+            if node is not None:
+                temp_node_group.nodes.remove(node)
+        if temp_node_group is not None and record_interface:
+            for socket_type in dir(bpy.types):
+                if socket_type.startswith('NodeSocket'):
+                    interface[socket_type] = _interface_socket_default(temp_node_group, socket_type)
+    finally:
+        if temp_node_group is not None:
+            bpy.data.node_groups.remove(temp_node_group)
+    return { 'key': _cache_key(), 'bases': bases, 'nodes': nodes, 'interface': interface, 'probes': {} }, temp_node_group is not None
+
+def _write(path, schema):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump(schema, f, separators=(',', ':'))
+    os.replace(temp_path, path)
+
+def load_node_schema(path=SCHEMA_CACHE_PATH):
+    """
+    Load the cached schema from disk if it was recorded for this Blender and add-on version.
+    """
+    global _schema, _schema_complete
+    if not _schema_complete and os.path.exists(path):
+        try:
+            with open(path, 'r') as f:
+                schema = json.load(f)
+            if schema.get('key') == _cache_key():
+                _schema = schema
+                _schema_complete = True
+        except (OSError, ValueError):
+            pass
+    return _schema if _schema_complete else None
+
+def save_node_schema(path=SCHEMA_CACHE_PATH):
+    """
+    Write the schema to disk if sockets were probed or node types were added since it was loaded.
+    """
+    global _schema_modified
+    if _schema_modified and _schema_complete:
+        _write(path, _schema)
+        _schema_modified = False
+
+def _get_schema():
+    global _schema, _schema_complete
+    if load_node_schema() is None:
+        if STAND_IN:
+            raise Exception(f"No node schema for Blender {'.'.join(map(str, bpy.app.version))} at '{SCHEMA_CACHE_PATH}'. Run Blender with Geometry Script enabled to record it.")
+        # Either there is no cache for this version, or it was built while `bpy.data` was unavailable.
+        _schema, _schema_complete = _build_schema(_node_types_to_register())
+        if _schema_complete:
+            _write(SCHEMA_CACHE_PATH, _schema)
+    return _schema
+
+def node_schemas():
+    """
+    The schema of every registered node type, keyed by node type name in registration order.
+    """
+    return _get_schema()['nodes']
+
+def node_schema(node_type_name):
+    """
+    The schema of a single node type: its properties, input and output sockets and default width.
+    """
+    schema = _get_schema()
+    if node_type_name not in schema['nodes']:
+        # Record node types missing from the cache, such as ones registered by other add-ons.
+        node_type = getattr(bpy.types, node_type_name)
+        entry, complete = _build_schema([node_type], record_interface=False)
+        schema['bases'].update(entry['bases'])
+        schema['nodes'][node_type_name] = entry['nodes'][node_type_name]
+        if complete:
+            _write(SCHEMA_CACHE_PATH, schema)
+    return schema['nodes'][node_type_name]
+
+def node_properties(node_type_name, include_parent=False):
+    """
+    The properties of a node type, optionally including the ones inherited from its base classes.
+    """
+    node = node_schema(node_type_name)
+    if not include_parent:
+        return node['properties']
+    parent_properties = {}
+    for base in node['bases']:
+        parent_properties.update({ prop['identifier']: prop for prop in _schema['bases'][base] })
+    return [*parent_properties.values(), *node['properties']]
+
+def _interface_socket_default(node_group, socket_type):
+    try:
+        socket = new_node_input(node_group, socket_type, 'Value')
+    except (TypeError, RuntimeError):
+        return None # not a socket type group inputs can use
+    default = _json_value(getattr(socket, 'default_value', None))
+    remove_node_input(node_group, socket)
+    return default
+
+def interface_socket_default(socket_type):
+    """
+    The default value of a new group input socket of a type, or `None` if it has no value.
+    """
+    global _schema_modified
+    schema = _get_schema()
+    if socket_type not in schema['interface'] and not STAND_IN:
+        temp_node_group = bpy.data.node_groups.new('.geometry_script_schema', 'GeometryNodeTree')
+        try:
+            schema['interface'][socket_type] = _interface_socket_default(temp_node_group, socket_type)
+        finally:
+            bpy.data.node_groups.remove(temp_node_group)
+        _schema_modified = True
+    return schema['interface'].get(socket_type)
+
+def _configure(node, properties, items, pointers):
+    for identifier, value in pointers:
+        setattr(node, identifier, value)
+    for identifier, value in properties:
+        setattr(node, identifier, value)
+    for identifier, args in items:
+        collection = getattr(node, identifier)
+        collection.clear()
+        for x in args:
+            collection.new(*x)
+
+def _probe_key(node_type_name, properties, items, paired):
+    def configuration(properties, items):
+        return [[[k, sorted(v) if isinstance(v, set) else v] for k, v in properties], [[k, [list(x) for x in args]] for k, args in items]]
+    return json.dumps([node_type_name, configuration(properties, items), None if paired is None else [paired[0], configuration(*paired[1:3])]])
+
+def probe_sockets(node_type_name, properties=(), items=(), pointers=(), paired=None):
+    """
+    Record the input and output sockets of a node in a particular configuration by creating one in a temporary tree.
+
+    `properties` and `pointers` are `(identifier, value)` pairs, and `items` are `(identifier, [args, ...])` pairs
+    recreated with `new(*args)`. `paired` is the `(node_type_name, properties, items, pointers)` of a zone output node.
+
+    Configurations without pointers are saved with the schema, so they can be looked up without Blender.
+    Returns `None` if the configuration was never recorded and can't be probed.
+    """
+    global _schema_modified
+    schema = _get_schema()
+    persist = len(pointers) == 0 and (paired is None or len(paired[3]) == 0)
+    key = _probe_key(node_type_name, properties, items, paired) if persist else None
+    if persist and key in schema['probes']:
+        return schema['probes'][key]
+    if STAND_IN:
+        return None
+    temp_node_group = bpy.data.node_groups.new('.geometry_script_schema', 'GeometryNodeTree')
+    try:
+        node = temp_node_group.nodes.new(node_type_name)
+        if paired is not None:
+            paired_output = temp_node_group.nodes.new(paired[0])
+            _configure(paired_output, *paired[1:])
+            node.pair_with_output(paired_output)
+        _configure(node, properties, items, pointers)
+        sockets = [[_socket_schema(socket) for socket in node.inputs], [_socket_schema(socket) for socket in node.outputs]]
+    finally:
+        bpy.data.node_groups.remove(temp_node_group)
+    if persist:
+        schema['probes'][key] = sockets
+        _schema_modified = True
+    return sockets
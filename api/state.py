@@ -1,3 +1,9 @@
 # Tree generation state
 class State:
-    current_node_tree = None
\ No newline at end of file
+    current_node_tree = None
+    # The input node sockets created for Python constants in the current tree, keyed by type and value.
+    constants = {}
+    # Nodes available for reuse when common subexpression elimination is enabled, otherwise `None`.
+    cse = None
+    # Whether operators on constants and identity operations are evaluated while building instead of creating nodes.
+    fold = True
\ No newline at end of file
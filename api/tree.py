@@ -7,6 +7,7 @@ except:
 from .state import State
 from .types import *
 from .node_mapper import *
+from . import node_mapper
 from .static.attribute import *
 from .static.curve import *
 from .static.expression import *
@@ -14,9 +15,21 @@ from .static.input_group import *
 from .static.repeat import *
 from .static.sample_mode import *
 from .static.simulation import *
-from .arrange import _arrange
+from .arrange import LayoutMode, LAYOUT_PENDING_PROPERTY, arrange as _arrange_tree
+from .interface import *
+from .reconcile import reconcile
+from .fingerprint import FINGERPRINT_PROPERTY, builder_fingerprint
+from .dead_nodes import eliminate_dead_nodes
+from .peephole import rewrite
+from .graph import Graph
+from .schema import save_node_schema
+from .profiler import BuildTimer, BuildProfile, profiling_enabled
+from .dependencies import record_dependencies, register_rebuild
+from .compiler import compile_builder
+from .cost import estimate_cost, check_budget
 
-IS_BLENDER_4 = bpy.app.version[0] >= 4
+# The latest build report for each tree, keyed by node group name.
+build_reports = {}
 
 def _as_iterable(x):
     if isinstance(x, Type):
@@ -26,146 +39,158 @@ def _as_iterable(x):
     except TypeError:
         return [x,]
 
-def get_node_inputs(x):
-    if IS_BLENDER_4:
-        return [i for i in x.interface.items_tree if i.item_type == 'SOCKET' and i.in_out == 'INPUT']
-    else:
-        return x.inputs
-def get_node_outputs(x):
-    if IS_BLENDER_4:
-        return [i for i in x.interface.items_tree if i.item_type == 'SOCKET' and i.in_out == 'OUTPUT']
-    else:
-        return x.outputs
-
-def tree(name):
-    tree_name = name
-    def build_tree(builder):
+def tree(name=None, cache=True, cse=False, fold=True, prune=True, layout=None, compile=False, peephole=True, fast_math=False, max_nodes=None, max_cost=None):
+    def build_tree(builder, force=False):
+        tree_name = name if isinstance(name, str) else builder.__name__
         signature = inspect.signature(builder)
 
         # Locate or create the node group
         node_group = None
-        if tree_name in bpy.data.node_groups:
+        created = tree_name not in bpy.data.node_groups
+        if not created:
             node_group = bpy.data.node_groups[tree_name]
         else:
             node_group = bpy.data.node_groups.new(tree_name, 'GeometryNodeTree')
 
-        if IS_BLENDER_4:
-            node_group.is_modifier = True
+        def build_graph(node_group, timer):
+            # Setup the group inputs
+            group_input_node = node_group.nodes.new('NodeGroupInput')
+            group_output_node = node_group.nodes.new('NodeGroupOutput')
 
-        # Clear the node group before building
-        for node in node_group.nodes:
-            node_group.nodes.remove(node)
-
-        node_inputs = get_node_inputs(node_group)
-        input_count = sum(map(lambda p: len(p.annotation.__annotations__) if issubclass(p.annotation, InputGroup) else 1, list(signature.parameters.values())))
-        for node_input in node_inputs[input_count:]:
-            if IS_BLENDER_4:
-                node_group.interface.remove(node_input)
-            else:
-                node_group.inputs.remove(node_input)
-
-        for group_output in get_node_outputs(node_group):
-            if IS_BLENDER_4:
-                node_group.interface.remove(group_output)
-            else:
-                node_group.outputs.remove(group_output)
-        
-        # Setup the group inputs
-        group_input_node = node_group.nodes.new('NodeGroupInput')
-        group_output_node = node_group.nodes.new('NodeGroupOutput')
-
-        # Collect the inputs
-        inputs = {}
-        def validate_param(param):
-            if param.annotation == inspect.Parameter.empty:
-                raise Exception(f"Tree input '{param.name}' has no type specified. Please annotate with a valid node input type.")
-            if not issubclass(param.annotation, Type):
-                raise Exception(f"Type of tree input '{param.name}' is not a valid 'Type' subclass.")
-        for param in signature.parameters.values():
-            if issubclass(param.annotation, InputGroup):
-                instance = param.annotation()
-                prefix = (param.annotation.prefix + "_") if hasattr(param.annotation, "prefix") else ""
-                for group_param, annotation in param.annotation.__annotations__.items():
-                    default = getattr(instance, group_param, None)
-                    inputs[prefix + group_param] = (annotation, inspect.Parameter.empty if default is None else default, param.name, prefix)
-            else:
-                validate_param(param)
-                inputs[param.name] = (param.annotation, param.default, None, None)
+            with timer.phase('inputs'):
+                # Collect the inputs
+                inputs = {}
+                def validate_param(param):
+                    if param.annotation == inspect.Parameter.empty:
+                        raise Exception(f"Tree input '{param.name}' has no type specified. Please annotate with a valid node input type.")
+                    if not issubclass(param.annotation, Type):
+                        raise Exception(f"Type of tree input '{param.name}' is not a valid 'Type' subclass.")
+                for param in signature.parameters.values():
+                    if issubclass(param.annotation, InputGroup):
+                        instance = param.annotation()
+                        prefix = (param.annotation.prefix + "_") if hasattr(param.annotation, "prefix") else ""
+                        for group_param, annotation in param.annotation.__annotations__.items():
+                            default = getattr(instance, group_param, None)
+                            inputs[prefix + group_param] = (annotation, inspect.Parameter.empty if default is None else default, param.name, prefix)
+                    else:
+                        validate_param(param)
+                        inputs[param.name] = (param.annotation, param.default, None, None)
 
-        # Create the input sockets and collect input values.
-        node_inputs = get_node_inputs(node_group)
-        for i, node_input in enumerate(node_inputs):
-            if node_input.bl_socket_idname != list(inputs.values())[i][0].socket_type:
-                for ni in node_inputs:
-                    if IS_BLENDER_4:
-                        node_group.interface.remove(ni)
+                # Create the input sockets and collect input values.
+                builder_inputs = {}
+                for i, arg in enumerate(inputs.items()):
+                    input_name = arg[0].replace('_', ' ').title()
+                    node_input = new_node_input(node_group, arg[1][0].socket_type, input_name)
+                    if arg[1][1] != inspect.Parameter.empty:
+                        node_input.default_value = arg[1][1]
+                    if arg[1][2] is not None:
+                        if arg[1][2] not in builder_inputs:
+                            builder_inputs[arg[1][2]] = signature.parameters[arg[1][2]].annotation()
+                        setattr(builder_inputs[arg[1][2]], arg[0].replace(arg[1][3], ''), arg[1][0](group_input_node.outputs[i]))
                     else:
-                        node_group.inputs.remove(ni)
-                break
-        builder_inputs = {}
+                        builder_inputs[arg[0]] = arg[1][0](group_input_node.outputs[i])
 
-        node_inputs = get_node_inputs(node_group)
-        for i, arg in enumerate(inputs.items()):
-            input_name = arg[0].replace('_', ' ').title()
-            if len(node_inputs) > i:
-                node_inputs[i].name = input_name
-                node_input = node_inputs[i]
-            else:
-                if IS_BLENDER_4:
-                    node_input = node_group.interface.new_socket(socket_type=arg[1][0].socket_type, name=input_name, in_out='INPUT')
+            # Run the builder function
+            with timer.phase('builder'):
+                State.current_node_tree = node_group
+                State.constants = {}
+                State.cse = {} if cse else None
+                State.fold = fold
+                run = compiled or builder
+                if inspect.isgeneratorfunction(builder):
+                    generated_outputs = [*run(**builder_inputs)]
+                    if all(map(lambda x: issubclass(type(x), Type) and x._socket.type == 'GEOMETRY', generated_outputs)):
+                        outputs = node_mapper.join_geometry(geometry=generated_outputs)
+                    else:
+                        outputs = generated_outputs
                 else:
-                    node_input = node_group.inputs.new(arg[1][0].socket_type, input_name)
-            if arg[1][1] != inspect.Parameter.empty:
-                node_input.default_value = arg[1][1]
-            if arg[1][2] is not None:
-                if arg[1][2] not in builder_inputs:
-                    builder_inputs[arg[1][2]] = signature.parameters[arg[1][2]].annotation()
-                setattr(builder_inputs[arg[1][2]], arg[0].replace(arg[1][3], ''), arg[1][0](group_input_node.outputs[i]))
-            else:
-                builder_inputs[arg[0]] = arg[1][0](group_input_node.outputs[i])
+                    outputs = run(**builder_inputs)
 
-        # Run the builder function
-        State.current_node_tree = node_group
-        if inspect.isgeneratorfunction(builder):
-            generated_outputs = [*builder(**builder_inputs)]
-            if all(map(lambda x: issubclass(type(x), Type) and x._socket.type == 'GEOMETRY', generated_outputs)):
-                outputs = join_geometry(geometry=generated_outputs)
-            else:
-                outputs = generated_outputs
+            # Create the output sockets
+            with timer.phase('outputs'):
+                if isinstance(outputs, dict):
+                    # Use a dict to name each return value
+                    for i, (k, v) in enumerate(outputs.items()):
+                        if not issubclass(type(v), Type):
+                            v = Type(value=v)
+                        new_node_output(node_group, v.socket_type, k)
+                        node_group.links.new(v._socket, group_output_node.inputs[i])
+                else: 
+                    for i, result in enumerate(_as_iterable(outputs)):
+                        if not issubclass(type(result), Type):
+                            result = Type(value=result)
+                            # raise Exception(f"Return value '{result}' is not a valid 'Type' subclass.")
+                        new_node_output(node_group, result.socket_type, 'Result')
+                        node_group.links.new(result._socket, group_output_node.inputs[i])
+
+        # Skip the build entirely if nothing that affects the tree has changed since it was last built.
+        timer = BuildProfile() if profiling_enabled() else BuildTimer()
+        with timer.phase('fingerprint'):
+            fingerprint = builder_fingerprint(builder, tree_name, cse, fold, prune, compile, peephole, fast_math, max_nodes, max_cost)
+        if cache and not force and fingerprint is not None and node_group.get(FINGERPRINT_PROPERTY) == fingerprint and len(node_group.nodes) > 0:
+            build_reports[node_group.name] = { 'cached': True, 'phases': timer.phases, 'timer': timer }
+            record_dependencies(node_group)
+            if IS_BLENDER_4:
+                node_group.is_modifier = True
         else:
-            outputs = builder(**builder_inputs)
+            # Record the tree into an in-memory graph, then materialize it by reconciling the existing tree with the result.
+            # This only touches the nodes, links and sockets that changed since the last build.
+            # Nothing about the node group changes until the graph is complete and within its budget,
+            # and a node group created for a build that fails is removed.
+            try:
+                # Fall back to running the builder as written if it can't be compiled, such as when its source isn't available.
+                compiled = None
+                if compile:
+                    with timer.phase('compile'):
+                        compiled = compile_builder(builder)
+                    if compiled is None:
+                        print(f"Geometry Script: '{tree_name}' could not be compiled, so it runs as written.")
+                graph = Graph(node_group.name)
+                if isinstance(timer, BuildProfile):
+                    timer.instrument(graph)
+                build_graph(graph, timer)
+                with timer.phase('peephole'):
+                    rewrites = rewrite(graph, fast_math) if peephole else {}
+                with timer.phase('prune'):
+                    dead_nodes = eliminate_dead_nodes(graph) if prune else 0
+                cost = None
+                if max_nodes is not None or max_cost is not None or isinstance(timer, BuildProfile):
+                    with timer.phase('cost'):
+                        cost = estimate_cost(graph)
+                    check_budget(cost, node_group.name, max_nodes, max_cost)
+            except:
+                if created:
+                    bpy.data.node_groups.remove(node_group)
+                raise
+            record_dependencies(node_group, graph)
+            if IS_BLENDER_4:
+                node_group.is_modifier = True
+            with timer.phase('reconcile'):
+                diff = reconcile(node_group, graph)
+                save_node_schema()
+            build_reports[node_group.name] = { 'cached': False, 'diff': diff, 'dead_nodes': dead_nodes, 'rewrites': rewrites, 'cost': cost, 'compiled': compiled is not None, 'phases': timer.phases, 'timer': timer }
 
-        # Create the output sockets
-        if isinstance(outputs, dict):
-            # Use a dict to name each return value
-            for i, (k, v) in enumerate(outputs.items()):
-                if not issubclass(type(v), Type):
-                    v = Type(value=v)
-                if IS_BLENDER_4:
-                    node_group.interface.new_socket(socket_type=v.socket_type, name=k, in_out='OUTPUT')
-                else:
-                    node_group.outputs.new(v.socket_type, k)
-                node_group.links.new(v._socket, group_output_node.inputs[i])
-        else: 
-            for i, result in enumerate(_as_iterable(outputs)):
-                if not issubclass(type(result), Type):
-                    result = Type(value=result)
-                    # raise Exception(f"Return value '{result}' is not a valid 'Type' subclass.")
-                if IS_BLENDER_4:
-                    node_group.interface.new_socket(socket_type=result.socket_type, name='Result', in_out='OUTPUT')
-                else:
-                    node_group.outputs.new(result.socket_type, 'Result')
-                node_group.links.new(result._socket, group_output_node.inputs[i])
-        
-        _arrange(node_group)
+            # Keep the existing layout if nothing changed, and skip it until the tree is shown when running in the background.
+            with timer.phase('layout'):
+                if diff.size > 0 or node_group.get(LAYOUT_PENDING_PROPERTY):
+                    if layout is not None:
+                        layout_mode = layout
+                    else:
+                        layout_mode = LayoutMode.DEFERRED if bpy.app.background else LayoutMode.IMMEDIATE
+                    _arrange_tree(node_group, layout_mode, diff.added_nodes)
+            if fingerprint is not None:
+                node_group[FINGERPRINT_PROPERTY] = fingerprint
+            elif FINGERPRINT_PROPERTY in node_group:
+                del node_group[FINGERPRINT_PROPERTY]
+        register_rebuild(node_group.name, lambda: build_tree(builder, force=True))
 
         # Return a function that creates a NodeGroup node in the tree.
         # This lets @trees be used in other @trees via simple function calls.
         def group_reference(*args, **kwargs):
             if IS_BLENDER_4:
-                result = geometrynodegroup(node_tree=node_group, *args, **kwargs)
+                result = node_mapper.geometrynodegroup(node_tree=node_group, *args, **kwargs)
             else:
-                result = group(node_tree=node_group, *args, **kwargs)
+                result = node_mapper.group(node_tree=node_group, *args, **kwargs)
             group_outputs = []
             for group_output in result._socket.node.outputs:
                 group_outputs.append(Type(group_output))
@@ -173,9 +198,10 @@ def tree(name):
                 return group_outputs[0]
             else:
                 return tuple(group_outputs)
+        group_reference.fingerprint = fingerprint
+        group_reference.report = build_reports[node_group.name]
         return group_reference
-    if isinstance(name, str):
+    if name is None or isinstance(name, str):
         return build_tree
     else:
-        tree_name = name.__name__
         return build_tree(name)
\ No newline at end of file
@@ -4,10 +4,13 @@ import nodeitems_utils
 import enum
 from .state import State
 from .static.sample_mode import SampleMode
+from .cse import node_key, lookup, store
+from .fold import fold_math, fold_compare, fold_boolean_math
 import geometry_script
 
 def map_case_name(i):
-    return ('_' if not i.identifier[0].isalpha() else '') + i.identifier.replace(' ', '_').upper()
+    identifier = i if isinstance(i, str) else i.identifier
+    return ('_' if not identifier[0].isalpha() else '') + identifier.replace(' ', '_').upper()
 
 def socket_type_to_data_type(socket_type):
     match socket_type:
@@ -55,22 +58,41 @@ class Type(metaclass=_TypeMeta):
                 print("Making an integer node?")
             if not type(value) in input_nodes:
                 raise Exception(f"'{value}' cannot be expressed as a node.")
-            input_node_info = input_nodes[type(value)]
-            value_node = State.current_node_tree.nodes.new(input_node_info[0])
-            if input_node_info[1] is None:
-                value_node.outputs[0].default_value = value
+            # Equal constants of the same kind share one input node per tree.
+            constant_key = (type(value), repr(value))
+            if constant_key in State.constants:
+                socket = State.constants[constant_key]
             else:
-                setattr(value_node, input_node_info[1], value)
-            socket = value_node.outputs[0]
+                input_node_info = input_nodes[type(value)]
+                value_node = State.current_node_tree.nodes.new(input_node_info[0])
+                if input_node_info[1] is None:
+                    value_node.outputs[0].default_value = value
+                else:
+                    setattr(value_node, input_node_info[1], value)
+                socket = value_node.outputs[0]
+                State.constants[constant_key] = socket
         self._socket = socket
+        self._constant = value
         self.socket_type = type(socket).__name__
     
+    def __getattr__(self, name):
+        # Node functions are registered lazily, so chained node methods are resolved on first use.
+        if not name.startswith('_'):
+            from . import node_mapper
+            if name in node_mapper.node_index()[0]:
+                node_mapper.__getattr__(name)
+                return getattr(self, name)
+        raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+
     def _math(self, other, operation, reverse=False):
         if other is None:
             vector_or_value = self
         else:
             vector_or_value =  (other, self) if reverse else (self, other)
 
+        folded = fold_math(operation, vector_or_value if other is not None else (self,), vector=self._socket.type == 'VECTOR')
+        if folded is not None:
+            return folded if isinstance(folded, Type) else Type(value=folded)
         if self._socket.type == 'VECTOR':
             return geometry_script.vector_math(operation=operation, vector=vector_or_value)
         else:
@@ -137,6 +159,9 @@ class Type(metaclass=_TypeMeta):
         return self._math(None,'ROUND')
     
     def _compare(self, other, operation):
+        folded = fold_compare(operation, self, other)
+        if folded is not None:
+            return Type(value=folded)
         return geometry_script.compare(operation=operation, a=self, b=other)
     
     def __eq__(self, other):
@@ -164,6 +189,14 @@ class Type(metaclass=_TypeMeta):
         return self._compare(other, 'GREATER_EQUAL')
     
     def _boolean_math(self, other, operation, reverse=False):
+        if operation == 'NOT' and getattr(self, '_inverse', None) is not None:
+            return self._inverse
+        folded = fold_boolean_math(operation, (self,) if other is None else (self, other))
+        if folded is not None:
+            return folded if isinstance(folded, Type) else Type(value=folded)
+        cse_key = node_key('FunctionNodeBooleanMath', self, other, operation=operation)
+        if lookup(cse_key) is not None:
+            return lookup(cse_key)
         boolean_math_node = State.current_node_tree.nodes.new('FunctionNodeBooleanMath')
         boolean_math_node.operation = operation
         a = None
@@ -181,7 +214,11 @@ class Type(metaclass=_TypeMeta):
                 State.current_node_tree.links.new(other._socket, b)
             else:
                 b.default_value = other
-        return Type(boolean_math_node.outputs[0])
+        result = Type(boolean_math_node.outputs[0])
+        if operation == 'NOT' and State.fold:
+            # Remember the operand so `~~x` folds back to `x`.
+            result._inverse = self
+        return store(cse_key, result)
     
     def __and__(self, other):
         return self._boolean_math(other, 'AND')
@@ -204,9 +241,13 @@ class Type(metaclass=_TypeMeta):
     def _get_xyz_component(self, component):
         if self._socket.type != 'VECTOR':
             raise Exception("`x`, `y`, `z` properties are not available on non-Vector types.")
-        separate_node = State.current_node_tree.nodes.new('ShaderNodeSeparateXYZ')
-        State.current_node_tree.links.new(self._socket, separate_node.inputs[0])
-        return Type(separate_node.outputs[component])
+        cse_key = node_key('ShaderNodeSeparateXYZ', self)
+        components = lookup(cse_key)
+        if components is None:
+            separate_node = State.current_node_tree.nodes.new('ShaderNodeSeparateXYZ')
+            State.current_node_tree.links.new(self._socket, separate_node.inputs[0])
+            components = store(cse_key, [Type(output) for output in separate_node.outputs])
+        return components[component]
     @property
     def x(self):
         return self._get_xyz_component(0)
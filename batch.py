@@ -0,0 +1,277 @@
+"""
+Build many Geometry Script files into `.blend` files with a pool of background Blender processes.
+
+```
+python batch.py manifest.json [--blender blender] [--workers 4] [--output report.json]
+python batch.py manifest.json --headless [--schema node_schema.json]
+```
+
+The manifest lists the jobs, each a script and the `.blend` file to save its trees to. Relative paths are relative to the manifest:
+
+```json
+[
+    { "script": "trees/rock.py", "output": "assets/rock.blend" },
+    { "script": "trees/tree.py", "output": "assets/tree.blend" }
+]
+```
+
+Each worker is started once and runs many jobs, so Blender's startup and Geometry Script's import are only paid once per worker.
+The file is reset to an empty file before each job. With `--headless`, scripts are built with the `bpy` stand-in and nothing is saved.
+
+A JSON report with the time, build phases, trees and error of every job is printed, or written to `--output`.
+The exit code is 1 if any job failed.
+"""
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import queue
+import runpy
+import subprocess
+import sys
+import threading
+import time
+import traceback
+
+ADDON_PATH = os.path.dirname(os.path.realpath(__file__))
+
+# Lines a worker writes to stdout that start with this are results, everything else is Blender's own output.
+RESULT_PREFIX = 'GEOMETRY_SCRIPT_BATCH '
+
+def load_manifest(path):
+    with open(path, 'r', encoding='utf-8') as file:
+        manifest = json.load(file)
+    if isinstance(manifest, dict):
+        manifest = manifest['jobs']
+    directory = os.path.dirname(os.path.abspath(path))
+    jobs = []
+    for job in manifest:
+        if 'script' not in job:
+            raise Exception(f"Job {job} has no script.")
+        jobs.append({
+            'script': os.path.join(directory, job['script']),
+            'output': None if job.get('output') is None else os.path.join(directory, job['output']),
+        })
+    return jobs
+
+def _load_geometry_script(headless=False, schema=None):
+    if headless:
+        sys.path.insert(0, os.path.join(ADDON_PATH, 'headless'))
+        from run import install
+        return install(schema)
+    try:
+        import geometry_script
+        return geometry_script
+    except ImportError:
+        spec = importlib.util.spec_from_file_location('geometry_script', os.path.join(ADDON_PATH, '__init__.py'), submodule_search_locations=[ADDON_PATH])
+        module = importlib.util.module_from_spec(spec)
+        sys.modules['geometry_script'] = module
+        spec.loader.exec_module(module)
+        return module
+
+def _reset():
+    """
+    Start the next job from an empty file, and forget the trees built by the previous one.
+    """
+    import bpy
+    from geometry_script.api.tree import build_reports
+    from geometry_script.api import dependencies
+    from geometry_script import external
+    if getattr(bpy, 'stand_in', False):
+        bpy.data.node_groups.clear()
+    else:
+        bpy.ops.wm.read_homefile(use_empty=True)
+    build_reports.clear()
+    dependencies.dependency_graph.clear()
+    dependencies._rebuilders.clear()
+    # Workers don't register the add-on, so its load handler doesn't clear the modules loaded by the previous job.
+    external.clear_cache()
+
+def run_job(job):
+    """
+    Run a script and save the trees it built. Returns the result of the job.
+    """
+    import bpy
+    from geometry_script.api.tree import build_reports
+    result = { 'script': job['script'], 'output': job['output'], 'status': 'ok', 'saved': False }
+    start = time.perf_counter()
+    log = io.StringIO()
+    try:
+        _reset()
+        with contextlib.redirect_stdout(log):
+            runpy.run_path(job['script'], run_name='__main__')
+        if job['output'] is not None and not getattr(bpy, 'stand_in', False):
+            # Node groups without users are not saved.
+            for name in build_reports.keys():
+                bpy.data.node_groups[name].use_fake_user = True
+            os.makedirs(os.path.dirname(os.path.abspath(job['output'])), exist_ok=True)
+            bpy.ops.wm.save_as_mainfile(filepath=job['output'], check_existing=False)
+            result['saved'] = True
+    except Exception as e:
+        result['status'] = 'failed'
+        result['error'] = f"{type(e).__name__}: {e}"
+        result['traceback'] = traceback.format_exc()
+    result['duration'] = time.perf_counter() - start
+    phases = {}
+    for report in build_reports.values():
+        for phase, duration in report.get('phases', {}).items():
+            phases[phase] = phases.get(phase, 0) + duration
+    result['phases'] = phases
+    result['trees'] = {
+        name: { 'cached': report['cached'], 'nodes': len(bpy.data.node_groups[name].nodes) }
+        for name, report in build_reports.items() if name in bpy.data.node_groups
+    }
+    result['log'] = log.getvalue()
+    return result
+
+def worker(headless=False, schema=None):
+    """
+    Run the jobs read from stdin, one JSON object per line, and write each result to stdout.
+    """
+    start = time.perf_counter()
+    _load_geometry_script(headless, schema)
+    startup = time.perf_counter() - start
+    for line in sys.stdin:
+        if len(line.strip()) == 0:
+            continue
+        result = run_job(json.loads(line))
+        result['worker_startup'] = startup
+        startup = 0
+        sys.stdout.write(RESULT_PREFIX + json.dumps(result) + '\n')
+        sys.stdout.flush()
+
+class _Worker:
+    """
+    A worker process, and a thread that collects its results.
+    """
+
+    def __init__(self, command):
+        self._process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, bufsize=1)
+        self._results = queue.Queue()
+        self.jobs = 0
+        threading.Thread(target=self._read, daemon=True).start()
+
+    def _read(self):
+        for line in self._process.stdout:
+            if line.startswith(RESULT_PREFIX):
+                self._results.put(json.loads(line[len(RESULT_PREFIX):]))
+        self._results.put(None)
+
+    def run(self, job, timeout=None):
+        self.jobs += 1
+        try:
+            self._process.stdin.write(json.dumps(job) + '\n')
+            self._process.stdin.flush()
+            result = self._results.get(timeout=timeout)
+        except queue.Empty:
+            self._process.kill()
+            error = f"Timed out after {timeout} seconds."
+        except OSError as e:
+            error = f"{type(e).__name__}: {e}"
+        else:
+            if result is not None:
+                return result
+            error = "Worker exited."
+        self.close()
+        return { **job, 'status': 'failed', 'saved': False, 'error': f"{error} Exit code {self._process.returncode}." }
+
+    @property
+    def alive(self):
+        return self._process.poll() is None
+
+    def close(self):
+        try:
+            self._process.stdin.close()
+        except OSError:
+            pass
+        try:
+            self._process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self._process.kill()
+            self._process.wait()
+
+def worker_command(blender='blender', headless=False, schema=None):
+    script = os.path.realpath(__file__)
+    if headless:
+        command = [sys.executable, script, '--worker', '--headless']
+    else:
+        command = [blender, '--background', '--factory-startup', '--python', script, '--', '--worker']
+    if schema is not None:
+        command.extend(['--schema', os.path.abspath(schema)])
+    return command
+
+def run_batch(jobs, command, workers=4, timeout=None, max_jobs_per_worker=None):
+    """
+    Run the jobs across a pool of worker processes. Returns the results in the order of the jobs.
+    A worker that crashes, times out or has run `max_jobs_per_worker` jobs is replaced.
+    """
+    pending = queue.Queue()
+    for i, job in enumerate(jobs):
+        pending.put((i, job))
+    results = [None] * len(jobs)
+
+    def serve():
+        process = None
+        while True:
+            try:
+                i, job = pending.get_nowait()
+            except queue.Empty:
+                break
+            if process is None or not process.alive or (max_jobs_per_worker is not None and process.jobs >= max_jobs_per_worker):
+                if process is not None:
+                    process.close()
+                process = _Worker(command)
+            results[i] = process.run(job, timeout)
+            duration = results[i].get('duration')
+            print(f"{job['script']}: {results[i]['status']}{'' if duration is None else f' in {duration * 1000:.1f} ms'}", file=sys.stderr)
+        if process is not None:
+            process.close()
+
+    threads = [threading.Thread(target=serve) for _ in range(max(1, min(workers, len(jobs))))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[sys.argv.index('--') + 1:] if '--' in sys.argv else sys.argv[1:]
+    parser = argparse.ArgumentParser(description="Build Geometry Script files into .blend files with a pool of background Blender processes.")
+    parser.add_argument('manifest', nargs='?', help="a JSON list of jobs, each with a 'script' and an 'output' .blend file")
+    parser.add_argument('--blender', default=os.environ.get('BLENDER', 'blender'), help="the Blender executable, defaults to $BLENDER or 'blender'")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="the number of worker processes")
+    parser.add_argument('--timeout', type=float, help="the seconds a job may take before its worker is killed")
+    parser.add_argument('--max-jobs-per-worker', type=int, help="replace each worker after it has run this many jobs")
+    parser.add_argument('--output', help="write the report to a JSON file instead of printing it")
+    parser.add_argument('--headless', action='store_true', help="build with the bpy stand-in instead of Blender, without saving")
+    parser.add_argument('--schema', help="the node schema to use with --headless")
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        worker(args.headless, args.schema)
+        return
+    if args.manifest is None:
+        parser.error("the manifest is required")
+
+    jobs = load_manifest(args.manifest)
+    start = time.perf_counter()
+    results = run_batch(jobs, worker_command(args.blender, args.headless, args.schema), args.workers, args.timeout, args.max_jobs_per_worker)
+    report = {
+        'duration': time.perf_counter() - start,
+        'workers': args.workers,
+        'failed': sum(1 for result in results if result['status'] != 'ok'),
+        'jobs': results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+    sys.exit(1 if report['failed'] > 0 else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+"""
+Measure how long Geometry Script takes to build trees.
+
+```
+blender --background --python benchmarks/run.py -- [--output results.json] [--compare baseline.json]
+python benchmarks/run.py --headless [--schema node_schema.json] [--output results.json] [--compare baseline.json]
+```
+
+Every bundled example and every generator in `synthetic.py` is built from scratch several times.
+The median wall time, the time spent in each build phase, the node and link count, and the peak memory of each case are printed and can be written to a JSON file.
+With `--compare`, the run fails if any case got slower than the baseline by more than `--threshold`.
+"""
+import argparse
+import gc
+import importlib.util
+import json
+import os
+import runpy
+import statistics
+import sys
+import time
+import tracemalloc
+
+BENCHMARKS_PATH = os.path.dirname(os.path.realpath(__file__))
+ADDON_PATH = os.path.dirname(BENCHMARKS_PATH)
+EXAMPLES_PATH = os.path.join(ADDON_PATH, 'examples')
+
+def load_geometry_script(headless=False, schema=None):
+    if headless:
+        sys.path.insert(0, os.path.join(ADDON_PATH, 'headless'))
+        from run import install
+        return install(schema)
+    try:
+        import geometry_script
+        return geometry_script
+    except ImportError:
+        spec = importlib.util.spec_from_file_location('geometry_script', os.path.join(ADDON_PATH, '__init__.py'), submodule_search_locations=[ADDON_PATH])
+        module = importlib.util.module_from_spec(spec)
+        sys.modules['geometry_script'] = module
+        spec.loader.exec_module(module)
+        return module
+
+def collect_cases(scale):
+    cases = {}
+    for file in sorted(os.listdir(EXAMPLES_PATH)):
+        if file.endswith('.py'):
+            path = os.path.join(EXAMPLES_PATH, file)
+            cases[f"examples/{file}"] = lambda path=path: runpy.run_path(path)
+    sys.path.insert(0, BENCHMARKS_PATH)
+    import synthetic
+    for name, generator in synthetic.generators.items():
+        cases[f"synthetic/{name}"] = lambda generator=generator: generator(scale)
+    return cases
+
+def run_case(build, iterations):
+    import bpy
+    from geometry_script.api.tree import build_reports
+
+    def build_cold():
+        # Remove the trees built by the previous iteration, so every build starts from an empty node group.
+        for name in list(build_reports.keys()):
+            node_group = bpy.data.node_groups.get(name)
+            if node_group is not None:
+                bpy.data.node_groups.remove(node_group)
+        build_reports.clear()
+        gc.collect()
+        start = time.perf_counter()
+        build()
+        return time.perf_counter() - start
+
+    times = []
+    phases = []
+    for _ in range(iterations):
+        times.append(build_cold())
+        iteration_phases = {}
+        for report in build_reports.values():
+            for phase, duration in report.get('phases', {}).items():
+                iteration_phases[phase] = iteration_phases.get(phase, 0) + duration
+        phases.append(iteration_phases)
+    node_groups = [bpy.data.node_groups[name] for name in build_reports.keys()]
+    result = {
+        'time': statistics.median(times),
+        'times': times,
+        'phases': { phase: statistics.median(p.get(phase, 0) for p in phases) for phase in phases[-1].keys() },
+        'trees': len(node_groups),
+        'nodes': sum(len(node_group.nodes) for node_group in node_groups),
+        'links': sum(len(node_group.links) for node_group in node_groups),
+    }
+
+    # Measure memory in a separate build, since tracing allocations slows the build down.
+    tracemalloc.start()
+    try:
+        build_cold()
+        result['peak_memory'] = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return result
+
+def compare(results, baseline, threshold):
+    """
+    Print the change of each case against the baseline, and return the cases that regressed.
+    """
+    regressions = []
+    for name, result in results['cases'].items():
+        previous = baseline['cases'].get(name)
+        if previous is None or 'time' not in previous or 'time' not in result:
+            continue
+        change = result['time'] / previous['time'] - 1 if previous['time'] > 0 else 0
+        regressed = change > threshold
+        if regressed:
+            regressions.append(name)
+        print(f"{name}: {previous['time'] * 1000:.1f} ms -> {result['time'] * 1000:.1f} ms ({change:+.1%}){' REGRESSION' if regressed else ''}")
+    return regressions
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[sys.argv.index('--') + 1:] if '--' in sys.argv else sys.argv[1:]
+    parser = argparse.ArgumentParser(description="Measure how long Geometry Script takes to build trees.")
+    parser.add_argument('--headless', action='store_true', help="build with the `bpy` stand-in instead of Blender")
+    parser.add_argument('--schema', help="the node schema to use with --headless")
+    parser.add_argument('--iterations', type=int, default=5, help="number of builds to take the median of")
+    parser.add_argument('--scale', type=int, default=1, help="multiplies the size of the synthetic trees")
+    parser.add_argument('--filter', help="only run cases whose name contains this")
+    parser.add_argument('--output', help="write the results to this JSON file")
+    parser.add_argument('--compare', help="a JSON file from a previous run to compare against")
+    parser.add_argument('--threshold', type=float, default=0.1, help="relative slowdown that counts as a regression, defaults to 0.1")
+    args = parser.parse_args(argv)
+
+    load_geometry_script(args.headless, args.schema)
+    import bpy
+
+    results = {
+        'blender': list(bpy.app.version),
+        'headless': getattr(bpy, 'stand_in', False),
+        'iterations': args.iterations,
+        'scale': args.scale,
+        'cases': {},
+    }
+    for name, build in collect_cases(args.scale).items():
+        if args.filter is not None and args.filter not in name:
+            continue
+        try:
+            result = run_case(build, args.iterations)
+        except Exception as e:
+            results['cases'][name] = { 'error': f"{type(e).__name__}: {e}" }
+            print(f"{name}: failed, {type(e).__name__}: {e}")
+            continue
+        results['cases'][name] = result
+        phases = ', '.join(f"{phase} {duration * 1000:.1f}" for phase, duration in result['phases'].items())
+        print(f"{name}: {result['time'] * 1000:.1f} ms ({phases}), {result['nodes']} nodes, {result['links']} links, {result['peak_memory'] / 1024 / 1024:.1f} MiB peak")
+
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare is not None:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if len(regressions) > 0:
+            print(f"{len(regressions)} case(s) regressed by more than {args.threshold:.0%}")
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Generated trees that stress one part of the build at a time.
+
+Each generator defines a single tree with `@tree` when called, and is sized by `scale`.
+"""
+from geometry_script import *
+
+def math_chain(scale=1):
+    """
+    A long chain of dependent math nodes.
+    """
+    @tree("Benchmark Math Chain", cache=False)
+    def math_chain_tree(value: Float):
+        for _ in range(250 * scale):
+            value = value * 1.001 + 0.5
+        return value
+
+def wide_input_group(scale=1):
+    """
+    An input group with many members, which exercises interface socket creation.
+    """
+    count = 100 * scale
+    WideInputs = type('WideInputs', (InputGroup,), { '__annotations__': { f"input_{i}": Float for i in range(count) } })
+
+    @tree("Benchmark Wide Input Group", cache=False)
+    def wide_input_group_tree(inputs: WideInputs):
+        result = inputs.input_0
+        for i in range(1, count):
+            result = result + getattr(inputs, f"input_{i}")
+        return result
+
+def nested_repeat_zones(scale=1):
+    """
+    Repeat zones nested inside each other.
+    """
+    depth = 4 * scale
+    def repeat(level):
+        @repeat_zone
+        def step(geometry: Geometry):
+            if level + 1 < depth:
+                geometry = repeat(level + 1)(2, geometry)
+            return geometry.transform(translation=(1, 0, 0))
+        return step
+
+    @tree("Benchmark Nested Repeat Zones", cache=False)
+    def nested_repeat_zones_tree(geometry: Geometry):
+        return repeat(0)(2, geometry)
+
+def large_tree(scale=1):
+    """
+    A tree with roughly 10,000 nodes.
+    """
+    @tree("Benchmark Large Tree", cache=False)
+    def large_tree_tree(geometry: Geometry):
+        for i in range(2500 * scale):
+            geometry = geometry.set_position(offset=position() * (1.0 + i / 1000))
+        return geometry
+
+def _vector_expressions(scale, compile):
+    @tree(f"Benchmark Vector Expressions{' Compiled' if compile else ''}", cache=False, compile=compile)
+    def vector_expressions_tree(offset: Vector, value: Float):
+        result = offset
+        mask = value > 0
+        for i in range(100 * scale):
+            result = (result * 1.001 + offset) * value - (offset - result) / 2.0
+            mask = mask & ((result.x * value + i) > (result.y - offset.z) * 0.5)
+        return {'result': result, 'mask': mask}
+
+def vector_expressions(scale=1):
+    """
+    Chains of vector math, comparisons and components, built with the `Type` operators.
+    """
+    _vector_expressions(scale, compile=False)
+
+def vector_expressions_compiled(scale=1):
+    """
+    The same expressions as `vector_expressions`, lowered to nodes by `compile=True`.
+    """
+    _vector_expressions(scale, compile=True)
+
+generators = {
+    'math_chain': math_chain,
+    'wide_input_group': wide_input_group,
+    'nested_repeat_zones': nested_repeat_zones,
+    'large_tree': large_tree,
+    'vector_expressions': vector_expressions,
+    'vector_expressions_compiled': vector_expressions_compiled,
+}
@@ -1,11 +1,100 @@
 import bpy
+import hashlib
+import importlib.util
+import marshal
 import os
+import types
+from .absolute_path import absolute_path
 
-def load(filename):
+BYTECODE_CACHE_PATH = absolute_path('cache/bytecode')
+
+# Compiled code for each file, keyed by path: `(stat signature, source hash, code)`.
+_code_cache = {}
+# Modules loaded with `load(..., module=True)`, keyed by path: `(source hash, module)`.
+_module_cache = {}
+
+def _signature(filepath):
+    stat = os.stat(filepath)
+    return (stat.st_mtime_ns, stat.st_size)
+
+def _bytecode_path(filepath):
+    return os.path.join(BYTECODE_CACHE_PATH, hashlib.sha1(filepath.encode()).hexdigest() + '.pyc')
+
+def _read_bytecode(filepath, source_hash):
+    try:
+        with open(_bytecode_path(filepath), 'rb') as file:
+            data = file.read()
+    except OSError:
+        return None
+    header = importlib.util.MAGIC_NUMBER + source_hash
+    if not data.startswith(header):
+        return None
+    try:
+        return marshal.loads(data[len(header):])
+    except (EOFError, ValueError, TypeError):
+        return None
+
+def _write_bytecode(filepath, source_hash, code):
+    path = _bytecode_path(filepath)
+    try:
+        os.makedirs(BYTECODE_CACHE_PATH, exist_ok=True)
+        temporary_path = f"{path}.{os.getpid()}.tmp"
+        with open(temporary_path, 'wb') as file:
+            file.write(importlib.util.MAGIC_NUMBER + source_hash + marshal.dumps(code))
+        os.replace(temporary_path, path)
+    except OSError:
+        pass
+
+def _compile(filepath, bytecode):
+    """
+    Compile a file, reusing the previous result if the file is unchanged. Returns the source hash and the code.
+    """
+    signature = _signature(filepath)
+    cached = _code_cache.get(filepath)
+    if cached is not None and cached[0] == signature:
+        return cached[1], cached[2]
+    with open(filepath, 'rb') as file:
+        source = file.read()
+    source_hash = hashlib.sha1(source).digest()
+    if cached is not None and cached[1] == source_hash:
+        # Only the modification time changed.
+        code = cached[2]
+    else:
+        code = _read_bytecode(filepath, source_hash) if bytecode else None
+        if code is None:
+            code = compile(source, filepath, 'exec')
+            if bytecode:
+                _write_bytecode(filepath, source_hash, code)
+    _code_cache[filepath] = (signature, source_hash, code)
+    return source_hash, code
+
+def clear_cache(*args):
+    """
+    Forget the modules loaded with `load(..., module=True)`, so they run again and build their trees in the current file.
+    Called when a file is loaded, and after undo and redo, which replace the node groups the modules' trees refer to.
+    """
+    _module_cache.clear()
+
+def load(filename, module=False, bytecode=False):
     """
     Execute an external script.
+
+    The compiled script is kept in memory until the file changes. Pass `bytecode=True` to also keep it on disk between sessions.
+
+    Pass `module=True` to load the file as a module and return it. The module is only executed again when the file changes,
+    so its trees are not rebuilt every time a script loads it.
     """
     filepath = os.path.join(os.path.dirname(bpy.data.filepath), filename)
+    source_hash, code = _compile(filepath, bytecode)
+    if module:
+        cached = _module_cache.get(filepath)
+        if cached is not None and cached[0] == source_hash:
+            return cached[1]
+        result = types.ModuleType(os.path.splitext(os.path.basename(filepath))[0])
+        result.__file__ = filepath
+        exec(code, result.__dict__)
+        _module_cache[filepath] = (source_hash, result)
+        return result
     global_namespace = {"__file__": filepath, "__name__": "__main__"}
-    with open(filepath, 'rb') as file:
-        exec(compile(file.read(), filepath, 'exec'), global_namespace)
\ No newline at end of file
+    exec(code, global_namespace)
+    return global_namespace
@@ -0,0 +1,77 @@
+"""
+A pure-Python stand-in for the parts of Blender's `bpy` module that Geometry Script uses to build node trees.
+
+Node and socket types are read from the node schema Geometry Script records in Blender,
+and node groups are in-memory `Graph`s, so `@tree` functions can run under plain CPython.
+"""
+from types import SimpleNamespace
+from . import types
+
+stand_in = True
+
+def _no_op(*args, **kwargs):
+    pass
+
+def _property(*args, **kwargs):
+    return (args, kwargs)
+
+class _NodeGroups:
+    def __init__(self):
+        self._node_groups = {}
+
+    def __iter__(self):
+        return iter(list(self._node_groups.values()))
+
+    def __len__(self):
+        return len(self._node_groups)
+
+    def __contains__(self, name):
+        return name in self._node_groups
+
+    def __getitem__(self, name):
+        return self._node_groups[name]
+
+    def get(self, name, default=None):
+        return self._node_groups.get(name, default)
+
+    def new(self, name, type):
+        from geometry_script.api.graph import Graph
+        unique_name = name
+        count = 0
+        while unique_name in self._node_groups:
+            count += 1
+            unique_name = f"{name}.{count:03}"
+        node_group = Graph(unique_name)
+        self._node_groups[unique_name] = node_group
+        return node_group
+
+    def remove(self, node_group):
+        del self._node_groups[node_group.name]
+
+    def clear(self):
+        self._node_groups.clear()
+
+app = SimpleNamespace(
+    version=tuple(types.schema()['key']['blender']),
+    background=True,
+    binary_path='',
+    timers=SimpleNamespace(register=_no_op, unregister=_no_op, is_registered=lambda function: False),
+)
+
+props = SimpleNamespace(**{
+    name: _property
+    for name in ('BoolProperty', 'IntProperty', 'FloatProperty', 'StringProperty', 'EnumProperty', 'PointerProperty', 'CollectionProperty', 'FloatVectorProperty', 'IntVectorProperty', 'BoolVectorProperty')
+})
+
+utils = SimpleNamespace(register_class=_no_op, unregister_class=_no_op)
+
+data = SimpleNamespace(node_groups=_NodeGroups(), filepath='')
+
+context = SimpleNamespace(
+    preferences=SimpleNamespace(view=SimpleNamespace(ui_scale=1.0)),
+    window_manager=SimpleNamespace(windows=[]),
+    scene=None,
+    screen=None,
+)
+
+ops = SimpleNamespace()
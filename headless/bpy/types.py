@@ -0,0 +1,113 @@
+import json
+import os
+
+def schema_path():
+    return os.environ.get('GEOMETRY_SCRIPT_SCHEMA') or os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', '..', 'cache', 'node_schema.json')
+
+_schema = None
+def schema():
+    """
+    The node schema recorded by Geometry Script in Blender, which describes every node and socket type.
+    """
+    global _schema
+    if _schema is None:
+        try:
+            with open(schema_path(), 'r') as f:
+                _schema = json.load(f)
+        except OSError:
+            raise Exception(f"No node schema at '{schema_path()}'. Run Blender with Geometry Script enabled to record it, or set GEOMETRY_SCRIPT_SCHEMA.")
+    return _schema
+
+class bpy_struct:
+    pass
+
+class _RNA:
+    def __init__(self, identifier, name):
+        self.identifier = identifier
+        self.name = name
+        self.properties = {}
+
+class ID(bpy_struct):
+    pass
+
+class NodeTree(ID):
+    pass
+
+class GeometryNodeTree(NodeTree):
+    pass
+
+class Scene(ID):
+    pass
+
+class Text(ID):
+    pass
+
+class Node(bpy_struct):
+    @classmethod
+    def is_registered_node_type(cls):
+        return True
+
+class NodeSocket(bpy_struct):
+    pass
+
+class NodeSocketStandard(NodeSocket):
+    pass
+
+class _UI(bpy_struct):
+    @classmethod
+    def append(cls, draw_func):
+        pass
+
+    @classmethod
+    def prepend(cls, draw_func):
+        pass
+
+    @classmethod
+    def remove(cls, draw_func):
+        pass
+
+class Menu(_UI):
+    def path_menu(self, *args, **kwargs):
+        pass
+
+class Header(_UI):
+    pass
+
+class Panel(_UI):
+    pass
+
+class Operator(bpy_struct):
+    pass
+
+class PropertyGroup(bpy_struct):
+    pass
+
+class AddonPreferences(bpy_struct):
+    pass
+
+class TEXT_HT_header(Header):
+    pass
+
+class TEXT_MT_templates(Menu):
+    pass
+
+def _socket_types():
+    socket_types = set(schema().get('interface', {}).keys())
+    for node in schema()['nodes'].values():
+        for socket in [*node.get('inputs', []), *node.get('outputs', [])]:
+            socket_types.add(socket['idname'])
+    return socket_types - set(globals())
+
+def __getattr__(name):
+    # Node and socket classes are created on first access from the schema.
+    if name in schema()['nodes']:
+        node_type = type(name, (Node,), { 'bl_rna': _RNA(name, schema()['nodes'][name]['name']), '__module__': __name__ })
+    elif name.startswith('NodeSocket') and name in _socket_types():
+        node_type = type(name, (NodeSocketStandard,), { 'bl_rna': _RNA(name, name), '__module__': __name__ })
+    else:
+        raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
+    globals()[name] = node_type
+    return node_type
+
+def __dir__():
+    return sorted(set(globals()) | set(schema()['nodes'].keys()) | _socket_types())
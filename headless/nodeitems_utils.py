@@ -0,0 +1,3 @@
+"""
+Stand-in for Blender's `nodeitems_utils` module, see `headless/bpy`.
+"""
@@ -0,0 +1,58 @@
+"""
+Build Geometry Script trees without Blender.
+
+```
+python headless/run.py [--schema node_schema.json] script.py [script.py ...]
+```
+
+Each script is run with the `bpy` stand-in from this folder, and the node and link count of every tree it builds is printed.
+The node schema is recorded to `cache/node_schema.json` when Geometry Script runs in Blender.
+"""
+import argparse
+import importlib.util
+import os
+import runpy
+import sys
+import time
+
+HEADLESS_PATH = os.path.dirname(os.path.realpath(__file__))
+ADDON_PATH = os.path.dirname(HEADLESS_PATH)
+
+def install(schema=None):
+    """
+    Import Geometry Script against the `bpy` stand-in, and return the `geometry_script` module.
+    """
+    if schema is not None:
+        os.environ['GEOMETRY_SCRIPT_SCHEMA'] = os.path.abspath(schema)
+    if 'geometry_script' in sys.modules:
+        return sys.modules['geometry_script']
+    if 'bpy' in sys.modules and not getattr(sys.modules['bpy'], 'stand_in', False):
+        raise Exception("Blender's `bpy` module is already loaded.")
+    sys.path.insert(0, HEADLESS_PATH)
+    spec = importlib.util.spec_from_file_location('geometry_script', os.path.join(ADDON_PATH, '__init__.py'), submodule_search_locations=[ADDON_PATH])
+    module = importlib.util.module_from_spec(spec)
+    sys.modules['geometry_script'] = module
+    spec.loader.exec_module(module)
+    return module
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build Geometry Script trees without Blender.")
+    parser.add_argument('scripts', nargs='+', help="scripts that define trees with @tree")
+    parser.add_argument('--schema', help="the node schema recorded by Blender, defaults to cache/node_schema.json")
+    args = parser.parse_args(argv)
+
+    install(args.schema)
+    import bpy
+    from geometry_script.api.tree import build_reports
+
+    for script in args.scripts:
+        start = time.perf_counter()
+        runpy.run_path(script, run_name='__main__')
+        duration = time.perf_counter() - start
+        print(f"{script}: {duration * 1000:.1f} ms")
+    for name, report in build_reports.items():
+        node_group = bpy.data.node_groups[name]
+        print(f"  {name}: {len(node_group.nodes)} nodes, {len(node_group.links)} links{' (cached)' if report['cached'] else ''}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,272 @@
+"""
+Reloads texts that are edited in an external editor, and re-runs them if live edit is on.
+
+Files are watched with inotify on Linux, and by comparing their modification time elsewhere.
+A burst of saves is collapsed into a single reload once the file has been quiet for `DEBOUNCE_INTERVAL`.
+
+Scripts that are re-run are read and compiled on a worker thread, and only executed on the main thread.
+A script with a syntax error is reloaded but not run, so the trees it built are left as they are.
+"""
+import bpy
+import concurrent.futures
+import ctypes
+import ctypes.util
+import os
+import struct
+import sys
+import time
+import traceback
+
+# Seconds a file must go without changes before it is reloaded.
+DEBOUNCE_INTERVAL = 0.2
+# Seconds between checks for changes when nothing is pending.
+POLL_INTERVAL = 0.5
+# Seconds between checks for finished compiles.
+COMPILE_INTERVAL = 0.05
+
+class _Inotify:
+    IN_MODIFY = 0x2
+    IN_CLOSE_WRITE = 0x8
+    IN_MOVED_TO = 0x80
+    IN_CREATE = 0x100
+    EVENT = struct.Struct('iIII')
+
+    def __init__(self):
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._directories = {}
+
+    def watch(self, directories):
+        for directory in set(self._directories.values()) - directories:
+            wd = next(wd for wd, d in self._directories.items() if d == directory)
+            self._libc.inotify_rm_watch(self._fd, wd)
+            del self._directories[wd]
+        for directory in directories - set(self._directories.values()):
+            # Watch the directory rather than the file, since many editors save by replacing the file.
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), self.IN_MODIFY | self.IN_CLOSE_WRITE | self.IN_MOVED_TO | self.IN_CREATE)
+            if wd >= 0:
+                self._directories[wd] = directory
+
+    def changed(self, paths):
+        changed = set()
+        while True:
+            try:
+                buffer = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(buffer):
+                wd, mask, cookie, length = self.EVENT.unpack_from(buffer, offset)
+                offset += self.EVENT.size
+                name = buffer[offset:offset + length].rstrip(b'\0')
+                offset += length
+                if wd in self._directories:
+                    changed.add(os.path.join(self._directories[wd], os.fsdecode(name)))
+        return changed & paths
+
+    def close(self):
+        os.close(self._fd)
+
+class _StatPoller:
+    def watch(self, directories):
+        pass
+
+    def changed(self, paths):
+        return paths
+
+    def close(self):
+        pass
+
+def _signature(path):
+    try:
+        stat = os.stat(path)
+        return (stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        return None
+
+class TextWatcher:
+    def __init__(self):
+        self._backend = None
+        self._signatures = {}
+        self._pending = {}
+        self._executor = None
+        # The latest save of each file, used to drop compiles that a newer save has made stale.
+        self._generations = {}
+        self._compiles = {}
+        # The syntax error in the latest save of each file, if any.
+        self.errors = {}
+
+    def _get_backend(self):
+        if self._backend is None:
+            try:
+                self._backend = _Inotify() if sys.platform.startswith('linux') else _StatPoller()
+            except (OSError, AttributeError):
+                self._backend = _StatPoller()
+        return self._backend
+
+    def _texts(self):
+        texts = {}
+        for text in bpy.data.texts:
+            if len(text.filepath) > 0 and not text.is_in_memory:
+                texts.setdefault(os.path.normpath(bpy.path.abspath(text.filepath)), []).append(text)
+        return texts
+
+    def update(self):
+        """
+        Check for changed files and reload the ones that have settled. Returns the seconds until the next check.
+        """
+        texts = self._texts()
+        paths = set(texts.keys())
+        backend = self._get_backend()
+        backend.watch({os.path.dirname(path) for path in paths})
+
+        now = time.monotonic()
+        for path in paths - set(self._signatures.keys()):
+            # Texts that were already modified when they started being watched are reloaded right away.
+            self._signatures[path] = _signature(path)
+            if any(text.is_modified for text in texts[path]):
+                self._pending[path] = now
+        for path in set(self._signatures.keys()) - paths:
+            del self._signatures[path]
+            self._pending.pop(path, None)
+        for path in backend.changed(paths):
+            signature = _signature(path)
+            if signature is not None and signature != self._signatures[path]:
+                self._signatures[path] = signature
+                self._pending[path] = now + DEBOUNCE_INTERVAL
+                self._cancel(path)
+
+        for path, deadline in list(self._pending.items()):
+            if deadline <= now:
+                del self._pending[path]
+                if any(space.use_live_edit for text in texts[path] for _, _, space in _text_editors(text)):
+                    self._compile(path)
+                else:
+                    self._reload(texts[path])
+
+        for path, (generation, future) in list(self._compiles.items()):
+            if future.done():
+                del self._compiles[path]
+                if generation == self._generations.get(path) and path in texts:
+                    self._run(path, texts[path], *future.result())
+
+        if len(self._compiles) > 0:
+            return COMPILE_INTERVAL
+        return DEBOUNCE_INTERVAL if len(self._pending) > 0 else POLL_INTERVAL
+
+    def _cancel(self, path):
+        self._generations[path] = self._generations.get(path, 0) + 1
+        compile = self._compiles.pop(path, None)
+        if compile is not None:
+            compile[1].cancel()
+
+    def _compile(self, path):
+        if self._executor is None:
+            self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix='geometry_script_compile')
+        self._cancel(path)
+        self._compiles[path] = (self._generations[path], self._executor.submit(compile_file, path))
+
+    def _reload(self, texts):
+        for text in texts:
+            try:
+                reload_text(text)
+            except Exception as e:
+                print(f"Geometry Script: failed to reload '{text.name}': {e}")
+
+    def _run(self, path, texts, code, error):
+        self._reload(texts)
+        if error is not None:
+            self.errors[path] = error
+            print(f"Geometry Script: not running '{path}': {error}")
+            return
+        self.errors.pop(path, None)
+        try:
+            exec(code, { '__name__': '__main__', '__file__': path })
+        except Exception:
+            traceback.print_exc()
+
+    def close(self):
+        if self._backend is not None:
+            self._backend.close()
+            self._backend = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        self._signatures.clear()
+        self._pending.clear()
+        self._compiles.clear()
+        self._generations.clear()
+        self.errors.clear()
+
+def _text_editors(text):
+    for window in bpy.context.window_manager.windows:
+        for area in window.screen.areas:
+            if area.type == 'TEXT_EDITOR' and area.spaces.active.text == text:
+                yield window, area, area.spaces.active
+
+def compile_file(path):
+    """
+    Read and compile a script, returning the code object and the syntax error, if any. Safe to call off the main thread.
+    """
+    try:
+        with open(path, 'rb') as file:
+            source = file.read()
+        return compile(source, path, 'exec'), None
+    except (SyntaxError, ValueError) as e:
+        return None, f"{type(e).__name__}: {e}"
+    except OSError as e:
+        return None, str(e)
+
+def reload_text(text):
+    """
+    Replace the contents of a text with its file.
+    """
+    editors = list(_text_editors(text))
+    if len(editors) == 0:
+        with open(bpy.path.abspath(text.filepath), 'r', encoding='utf-8') as file:
+            text.from_string(file.read())
+        return
+    window, area, space = editors[0]
+    with bpy.context.temp_override(window=window, area=area, space_data=space):
+        bpy.ops.text.resolve_conflict(resolution='RELOAD')
+
+watcher = TextWatcher()
+
+def _enabled():
+    try:
+        return bpy.context.scene.geometry_script_settings.auto_resolve
+    except AttributeError:
+        return False
+
+def schedule_watch(*args):
+    """
+    Start watching the texts if *Auto Resolve* is on in the current scene.
+    Called when the setting changes, when a window switches scenes and when a file is loaded.
+    """
+    if _enabled() and not bpy.app.timers.is_registered(watch_texts):
+        bpy.app.timers.register(watch_texts, persistent=True)
+
+# The owner of the subscription to scene changes, used to clear it.
+_scene_subscription_owner = object()
+
+def subscribe_scene_changes(*args):
+    """
+    Check the settings of the scene a window switches to. File loads clear the subscription, so this is also a `load_post` handler.
+    """
+    bpy.msgbus.clear_by_owner(_scene_subscription_owner)
+    bpy.msgbus.subscribe_rna(key=(bpy.types.Window, 'scene'), owner=_scene_subscription_owner, args=(), notify=schedule_watch)
+    schedule_watch()
+
+def unsubscribe_scene_changes():
+    bpy.msgbus.clear_by_owner(_scene_subscription_owner)
+
+def watch_texts():
+    """
+    Check the texts for changes. Registered as a timer while *Auto Resolve* is on.
+    """
+    if not _enabled():
+        watcher.close()
+        return None
+    return watcher.update()